@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Recipe'
+
+    def ready(self):
+        """Connects the signal handlers of the Recipe app, and checks the response cache"""
+        from . import signals  # noqa: F401
+        from .cache import check_cache
+        check_cache()
@@ -0,0 +1,162 @@
+"""
+Async (ASGI) views for reading recipes: list, search and detail,
+of both the 'recipes' and the 'my_recipes' routes, under /api/async/.
+
+Every view serves one read action of a recipe viewset, and reuses the
+viewset for everything that does not wait on the database: the queryset,
+search filter, permissions, serializer, pagination and rendering.
+The token is looked up, and the queries run, through Django's async ORM,
+and the blocking rest (the throttles' cache, the serializers' fields) in a
+thread, so that under ASGI (see app/asgi.py) a slow client waits in the event loop
+instead of holding a worker thread. Responses are the same as the ones of
+the sync viewsets, with the same ETag and Last-Modified (see Recipe.conditional),
+and are read from a replica too (see core.routers).
+Anonymous responses are not cached, see Recipe.cache.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core.routers import replica_reads
+from .conditional import get_not_modified_response, get_validators, get_versions, is_conditional, set_validators
+from .views import MyRecipesApiViewset, RecipeApiViewset
+
+
+def serialize(viewset, instance, **kwargs):
+    """
+    Helper function.
+    The data of the viewset's serializer, whose fields may read the database and the storage.
+    Run in a thread by the views.
+    """
+    return viewset.get_serializer(instance, **kwargs).data
+
+
+class AsyncRecipeView(View):
+    """
+    Base async view, that serves the 'action' of 'viewset_class' for GET requests.
+    Follows APIView.dispatch(), with the authentication and the queries awaited.
+    """
+    viewset_class = None
+    action = None
+
+    def get_viewset(self, request, *args, **kwargs):
+        """
+        Sets up the viewset, as the router would for the action.
+        The browsable API is not served, since its forms query the database.
+        """
+        viewset = self.viewset_class(
+            action_map={'get': self.action},
+            detail=self.action == 'retrieve',
+            args=args,
+            kwargs=kwargs,
+        )
+        viewset.get = viewset.head = getattr(viewset, self.action) #for the 'Allow' header
+        viewset.renderer_classes = [renderer for renderer in viewset.renderer_classes if renderer.format != 'api']
+        viewset.request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        return viewset
+
+    async def authenticate(self, viewset, request):
+        """
+        Authenticates the request with the async authenticators of the viewset
+        (see User.authentication.CachedTokenAuthentication.aauthenticate).
+        """
+        for authenticator in viewset.get_authenticators():
+            try:
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.get_viewset(request, *args, **kwargs)
+        request = viewset.request
+
+        with replica_reads():
+            try:
+                await self.authenticate(viewset, request)
+                #negotiation, permissions and throttles (in their cache), the user is already set
+                await sync_to_async(viewset.initial)(request, *args, **kwargs)
+                response = await getattr(self, self.action)(viewset, request, *args, **kwargs)
+            except Exception as exc:
+                response = viewset.handle_exception(exc)
+
+        return viewset.finalize_response(request, response, *args, **kwargs)
+
+    async def list(self, viewset, request, *args, **kwargs):
+        """
+        A page of recipes, or of search results with '?search=',
+        with the facet counts of '?facets='.
+        """
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        await sync_to_async(viewset.count_facets)(queryset)
+
+        if is_conditional(request):
+            rows = await viewset.paginator.apaginate_queryset(get_versions(queryset), request, view=viewset)
+            response = get_not_modified_response(request, *get_validators(request, rows, viewset.get_page_links()))
+            if response is not None:
+                return response
+
+        page = await viewset.paginator.apaginate_queryset(queryset, request, view=viewset)
+
+        response = viewset.get_paginated_response(await sync_to_async(serialize)(viewset, page, many=True))
+        return set_validators(response, *get_validators(request, page, viewset.get_page_links()))
+
+    async def retrieve(self, viewset, request, *args, **kwargs):
+        """
+        A recipe, by id.
+        """
+        queryset = viewset.filter_queryset(viewset.get_queryset())
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        lookup = {viewset.lookup_field: kwargs[lookup_url_kwarg]}
+
+        if is_conditional(request):
+            rows = [row async for row in get_versions(queryset.filter(**lookup))]
+            if rows:
+                response = get_not_modified_response(request, *get_validators(request, rows))
+                if response is not None:
+                    return response
+
+        try:
+            instance = await queryset.aget(**lookup)
+        except queryset.model.DoesNotExist:
+            raise Http404
+
+        viewset.check_object_permissions(request, instance)
+        response = Response(await sync_to_async(serialize)(viewset, instance))
+        return set_validators(response, *get_validators(request, [instance]))
+
+
+class AsyncRecipeListView(AsyncRecipeView):
+    """Async list and search of every recipe"""
+    viewset_class = RecipeApiViewset
+    action = 'list'
+
+
+class AsyncRecipeDetailView(AsyncRecipeView):
+    """Async detail of any recipe"""
+    viewset_class = RecipeApiViewset
+    action = 'retrieve'
+
+
+class AsyncMyRecipeListView(AsyncRecipeView):
+    """Async list and search of the recipes of the authenticated user"""
+    viewset_class = MyRecipesApiViewset
+    action = 'list'
+
+
+class AsyncMyRecipeDetailView(AsyncRecipeView):
+    """Async detail of a recipe of the authenticated user"""
+    viewset_class = MyRecipesApiViewset
+    action = 'retrieve'
@@ -0,0 +1,193 @@
+"""
+Shared response cache for anonymous reads of the Recipes API.
+
+Responses are cached under a key built from the normalized URL and the
+negotiated renderer, plus a version. List responses use a version shared
+by every recipe list, detail responses a version of their recipe.
+Changing a recipe (see Recipe.signals) moves the versions it affects,
+so the old responses are never read again and simply expire,
+without clearing the rest of the cache.
+
+The versions are only moved in the cache of the worker that made the
+change, so the cache must be shared by the workers: a process-local one
+is refused (see check_cache()). Without a cache, responses are not cached.
+"""
+
+from hashlib import sha1
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from core.cache import is_process_local
+
+from .conditional import get_not_modified_response
+
+
+KEY_PREFIX = 'recipes:response'
+LIST_VERSION_KEY = KEY_PREFIX + ':version:list'
+HITS_KEY = KEY_PREFIX + ':hits'
+MISSES_KEY = KEY_PREFIX + ':misses'
+VALIDATOR_HEADERS = ['ETag', 'Last-Modified'] #stored with the responses, see Recipe.conditional
+
+
+def get_cache():
+    """The Django cache the responses are stored in, or None if responses are not cached"""
+
+    alias = settings.RECIPE_RESPONSE_CACHE['CACHE']
+    return caches[alias] if alias else None
+
+
+def check_cache():
+    """
+    Refuses a RECIPE_RESPONSE_CACHE['CACHE'] that is local to each process:
+    the other workers would serve their responses until they expire.
+    Called when the Recipe app is ready.
+    """
+    alias = settings.RECIPE_RESPONSE_CACHE['CACHE']
+    if alias and is_process_local(alias):
+        raise ImproperlyConfigured(
+            "RECIPE_RESPONSE_CACHE['CACHE'] ({!r}) is a {} cache, which the worker processes do not share. "
+            "Point the RECIPE_RESPONSE_CACHE environment variable to a shared cache (e.g. memcached), "
+            "or leave it empty to not cache responses.".format(alias, settings.CACHES[alias]['BACKEND'])
+        )
+
+
+def recipe_version_key(pk):
+    return '{prefix}:version:recipe:{pk}'.format(prefix=KEY_PREFIX, pk=pk)
+
+
+def get_version(version_key):
+    """
+    Returns the current version stored in 'version_key'.
+    A missing version (never set, or evicted) gets a new one,
+    so that older responses can never be read again.
+    """
+    cache = get_cache()
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, None)
+        version = cache.get(version_key)
+
+    return version
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Moves the version of every recipe list, and of the given recipes.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    new_version = uuid4().hex
+    versions = {recipe_version_key(pk): new_version for pk in recipe_ids}
+    versions[LIST_VERSION_KEY] = new_version
+
+    cache.set_many(versions, None)
+
+
+def count(counter_key):
+    """Increments a hit/miss counter, shared by every worker"""
+
+    cache = get_cache()
+    try:
+        cache.incr(counter_key)
+    except ValueError:
+        cache.add(counter_key, 0, None)
+        cache.incr(counter_key)
+
+
+def get_stats():
+    """Returns the hit/miss counters of the response cache"""
+
+    cache = get_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY]) if cache is not None else {}
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Viewset mixin that caches the list and detail responses
+    of anonymous GET requests, and serves them from the cache.
+    Responses carry an 'X-Cache: HIT' or 'X-Cache: MISS' header.
+    Cached responses keep their ETag and Last-Modified, so that
+    conditional requests get a 304 from the cache too.
+    Without a response cache, requests are simply handled.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(LIST_VERSION_KEY, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        version_key = recipe_version_key(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return self.cached_response(version_key, super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request, version):
+        """
+        Builds the cache key of the request from its normalized URL
+        (query parameters sorted, empty ones dropped)
+        and the renderer the response is rendered with.
+        """
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values if value != ''
+        )
+        url = '{host}{path}?{query}'.format(host=request.get_host(), path=request.path, query=urlencode(params))
+        digest = sha1('{url}|{media_type}'.format(url=url, media_type=request.accepted_media_type).encode()).hexdigest()
+
+        return '{prefix}:{version}:{digest}'.format(prefix=KEY_PREFIX, version=version, digest=digest)
+
+    def cached_response(self, version_key, handler, request, *args, **kwargs):
+        """
+        Serves anonymous GET requests from the cache.
+        On a miss, the handler's response is cached once it is rendered.
+        """
+        if request.method != 'GET' or request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        if request.accepted_renderer.format == 'api':
+            return handler(request, *args, **kwargs) #the browsable API page holds a per-user CSRF token
+
+        cache = get_cache()
+        if cache is None:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request, get_version(version_key))
+
+        cached = cache.get(key)
+        if cached is not None:
+            count(HITS_KEY)
+            content, content_type, validators = cached
+            response = get_not_modified_response(request, validators['ETag'], parse_http_date_safe(validators.get('Last-Modified')))
+            if response is None:
+                response = HttpResponse(content, content_type=content_type)
+                for header, value in validators.items():
+                    response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        count(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+
+        if response.status_code == 200:
+            def store(rendered):
+                validators = {header: rendered[header] for header in VALIDATOR_HEADERS if rendered.has_header(header)}
+                cache.set(key, (rendered.content, rendered['Content-Type'], validators), settings.RECIPE_RESPONSE_CACHE['TIMEOUT'])
+
+            response.add_post_render_callback(store)
+
+        return response
@@ -0,0 +1,121 @@
+"""
+Conditional GET (ETag / Last-Modified) for the recipe list and detail.
+
+The validators of a response are built from the (id, updated_at) of the
+recipes it shows, plus the pagination links of a list, the URL and the
+negotiated media type. A recipe's 'updated_at' moves whenever the recipe,
+or its tags and ingredients, change (see core.signals), so the ETag
+changes with the content. The ETag also covers recipes added to or
+removed from a page. Last-Modified is the newest 'updated_at' shown:
+it does not see a recipe that left a list page, which only If-None-Match
+catches (clients that have an ETag send it).
+
+Requests with If-None-Match or If-Modified-Since are checked first
+with a query on the ids and timestamps only, and get a 304 response
+without loading or serializing the recipes when nothing changed.
+"""
+
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from rest_framework.response import Response
+
+
+CONDITIONAL_HEADERS = ['HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE']
+
+
+def is_conditional(request):
+    """Whether the request asks for a conditional response"""
+
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def get_versions(queryset):
+    """
+    The queryset reduced to the ids and timestamps of the recipes
+    (and the annotations the pagination orders by, e.g. the search rank).
+    """
+    return queryset.prefetch_related(None).values('id', 'updated_at', *queryset.query.annotations)
+
+
+def get_validators(request, recipes, links=()):
+    """
+    Returns the ETag and the Last-Modified timestamp (or None, if there are
+    no recipes) of a response showing 'recipes', as model instances
+    or as rows of get_versions().
+    """
+    versions = [
+        (recipe['id'], recipe['updated_at']) if isinstance(recipe, dict) else (recipe.id, recipe.updated_at)
+        for recipe in recipes
+    ]
+    representation = repr((request.build_absolute_uri(), request.accepted_media_type, list(links), versions))
+    etag = '"{}"'.format(sha1(representation.encode()).hexdigest())
+    last_modified = max((updated_at for pk, updated_at in versions), default=None)
+
+    return etag, last_modified and int(last_modified.timestamp())
+
+
+def set_validators(response, etag, last_modified):
+    """Adds the ETag and Last-Modified headers to the response"""
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412 for a failed If-Match) response, with the validators,
+    if the client already has the response. None otherwise.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        return None
+
+    return set_validators(response, etag, last_modified)
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin that adds an ETag and a Last-Modified header to the list
+    and detail responses, and answers conditional requests with a 304.
+    """
+
+    def get_page_links(self):
+        """The links of the page paginate_queryset() returned last"""
+        return [self.paginator.get_next_link(), self.paginator.get_previous_link()]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if is_conditional(request):
+            rows = self.paginate_queryset(get_versions(queryset))
+            response = get_not_modified_response(request, *get_validators(request, rows, self.get_page_links()))
+            if response is not None:
+                return response
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+
+        return set_validators(response, *get_validators(request, page, self.get_page_links()))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        if is_conditional(request):
+            queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            rows = list(get_versions(queryset))
+            if rows: #missing recipes get their 404 below. Safe requests pass the object permissions
+                response = get_not_modified_response(request, *get_validators(request, rows))
+                if response is not None:
+                    return response
+
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+
+        return set_validators(response, *get_validators(request, [instance]))
@@ -0,0 +1,94 @@
+"""
+Streaming export of recipes, as NDJSON (one JSON object per line) or CSV.
+
+Rows are read through a server-side cursor, in chunks of 'chunk_size'
+recipes, and the tags and ingredients are prefetched per chunk.
+Every row is encoded and sent as soon as it is read, so memory
+stays flat whatever the number of exported recipes.
+"""
+
+import csv
+
+from rest_framework.renderers import BaseRenderer
+
+from core.renderers import ORJSONRenderer
+
+
+CSV_COLUMNS = ['id', 'user', 'recipe_title', 'recipe_description', 'recipe_instructions', 'image', 'tags', 'ingredients']
+
+#separates the tag and ingredient names in a CSV cell
+CSV_LIST_SEPARATOR = '|'
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Base of the export formats, only used for content negotiation: the
+    export itself is streamed by the view. What DRF renders with them
+    (error responses such as 400, 401 or 429, OPTIONS) is JSON, and
+    labelled as such.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer = ORJSONRenderer()
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = renderer.media_type
+        return renderer.render(data, renderer.media_type, renderer_context)
+
+
+class NDJSONRenderer(ExportRenderer):
+    """
+    Only used for content negotiation ('Accept: application/x-ndjson' or '?format=ndjson').
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(ExportRenderer):
+    """
+    Only used for content negotiation ('Accept: text/csv' or '?format=csv').
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class _Echo:
+    """
+    File-like object for csv.writer, that returns the written line
+    instead of buffering it.
+    """
+    def write(self, value):
+        return value
+
+
+def ndjson_rows(serializer, recipes):
+    """
+    Yields every recipe as a line of JSON, rendered like the list endpoint.
+    """
+    renderer = ORJSONRenderer()
+    for recipe in recipes:
+        yield renderer.render(serializer.to_representation(recipe)) + b'\n'
+
+
+def csv_rows(serializer, recipes):
+    """
+    Yields the header and then every recipe as a line of CSV.
+    Tags and ingredients are flattened to their names.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS).encode()
+
+    for recipe in recipes:
+        data = serializer.to_representation(recipe)
+        data['tags'] = CSV_LIST_SEPARATOR.join(tag['tag_name'] for tag in data['tags'])
+        data['ingredients'] = CSV_LIST_SEPARATOR.join(
+            ingredient['ingredient_name'] for ingredient in data['ingredients']
+        )
+        yield writer.writerow([data[column] for column in CSV_COLUMNS]).encode()
+
+
+EXPORTERS = {
+    NDJSONRenderer.format: ndjson_rows,
+    CSVRenderer.format: csv_rows,
+}
@@ -0,0 +1,209 @@
+"""
+Facet counts of the recipe lists: the top tags and ingredients of the
+recipes a list shows (every page of it, not only the current one), with
+the number of those recipes that have them, e.g. for '?search=curry'
+"12 recipes with tag vegan". Asked for with '?facets=tags,ingredients'.
+
+Every facet asked for is counted in one grouped query (a UNION ALL of
+one GROUP BY per facet), over the link tables of the recipes matched by
+the list's filters, which walks their (recipe_id, tag_id/ingredient_id)
+unique index, and joins the names by primary key. Names are counted
+across users, since every user has their own tags and ingredients.
+The cost grows with the matches, so only the 'facet_sample' (1000) most
+recent matches of a search are counted: the counts of a broad search are
+those of its latest recipes, and the response says so ('facets_sampled'
+and 'facets_sample_size'). They are found walking the primary key
+backwards, which stops once enough recipes matched, instead of ranking
+every match. Lists without a search (e.g. every recipe of a user) are
+counted exactly.
+
+The list of every recipe is counted from the usage counts of the tags
+and ingredients instead (see core.models.UsageCountMixin), without
+reading the links, and cached until a recipe changes (see Recipe.cache).
+"""
+
+from django.conf import settings
+from django.db.models import CharField, Count, F, Sum, Value
+
+from rest_framework.exceptions import ValidationError
+
+from core.models import Ingredient, Recipe, Tag
+from core.pagination import positive_int
+from .cache import KEY_PREFIX, LIST_VERSION_KEY, get_cache, get_version
+from .filters import RecipeSearchFilter
+
+
+FACETS = {
+    'tags': (Tag, Recipe.tags.through, 'tag'),
+    'ingredients': (Ingredient, Recipe.ingredients.through, 'ingredient'),
+}
+SAMPLE_ROW = 'sample' #facet of the row of _sample_overflow()
+
+
+def _linked_counts(recipes, facet, size, sample=None):
+    """
+    Helper function.
+    The 'size' names of the facet linked to most of the recipes,
+    or of their first 'sample' recipes.
+    """
+    model, through, related = FACETS[facet]
+    ids = recipes.values('id')[:sample] if sample else recipes.values('id')
+    return (
+        through.objects.filter(recipe_id__in=ids)
+        .values(facet=Value(facet), name=F('{}__{}'.format(related, model.NAME_FIELD)))
+        .annotate(count=Count('*'))
+        .order_by('-count', 'name')[:size]
+    )
+
+
+def _sample_overflow(recipes, sample):
+    """
+    Helper function.
+    One row, counting the recipes up to one more than the 'sample':
+    more than 'sample' when only a sample of them is counted.
+    """
+    ids = recipes.values('id')[:sample + 1]
+    return (
+        Recipe.objects.filter(id__in=ids).order_by()
+        .values(facet=Value(SAMPLE_ROW), name=Value('', output_field=CharField()))
+        .annotate(count=Count('*'))
+    )
+
+
+def _usage_counts(facet, size):
+    """
+    Helper function.
+    The 'size' names of the facet used by most recipes, out of every recipe.
+    """
+    model = FACETS[facet][0]
+    return (
+        model.objects.filter(usage_count__gt=0).order_by()
+        .values(facet=Value(facet), name=F(model.NAME_FIELD))
+        .annotate(count=Sum('usage_count'))
+        .order_by('-count', 'name')[:size]
+    )
+
+
+def count_facets(recipes, facets, size, sample=None):
+    """
+    Counts the facets (names of FACETS) of the recipes, in one query.
+    Returns ({facet: [{<name field>: name, 'count': recipes}, ...]}, sampled):
+    the 'size' most common names of every facet, most common first, and
+    whether only a sample of the recipes was counted.
+    With a 'sample', filtered recipes are counted up to the first 'sample'
+    of them, in their order. Every recipe is counted from the usage counts.
+    """
+    every_recipe = not recipes.query.where
+    queries = [_usage_counts(facet, size) if every_recipe else _linked_counts(recipes, facet, size, sample) for facet in facets]
+    if sample and not every_recipe:
+        queries.append(_sample_overflow(recipes, sample))
+
+    counts = {facet: [] for facet in facets}
+    sampled = False
+    for row in queries[0].union(*queries[1:], all=True):
+        if row['facet'] == SAMPLE_ROW:
+            sampled = row['count'] > sample
+            continue
+        model = FACETS[row['facet']][0]
+        counts[row['facet']].append({model.NAME_FIELD: row['name'], 'count': row['count']})
+    return counts, sampled
+
+
+def get_facets(recipes, facets, size, sample=None):
+    """
+    count_facets(), with the counts of the list of every recipe cached
+    until any recipe changes (if responses are cached, see Recipe.cache).
+    """
+    cache = get_cache()
+    if recipes.query.where or cache is None:
+        return count_facets(recipes, facets, size, sample)
+
+    key = '{prefix}:facets:{version}:{facets}:{size}'.format(
+        prefix=KEY_PREFIX, version=get_version(LIST_VERSION_KEY), facets=','.join(facets), size=size,
+    )
+    counts = cache.get(key)
+    if counts is None:
+        counts, _ = count_facets(recipes, facets, size)
+        cache.set(key, counts, settings.RECIPE_RESPONSE_CACHE['TIMEOUT'])
+    return counts, False
+
+
+class FacetsMixin:
+    """
+    Viewset mixin that adds the facet counts asked for with '?facets='
+    to the list responses, under 'facets', and to their ETag.
+    '?facet_size=' sets the names per facet (10 by default).
+    Searches only count their 'facet_sample' most recent matches:
+    'facets_sampled' tells whether they had more, and
+    'facets_sample_size' how many were counted then.
+    """
+    facets_param = 'facets'
+    facet_size_param = 'facet_size'
+    facet_size = 10
+    max_facet_size = 50
+    facet_sample = 1000 #most recent matches of a search counted
+
+    facets = None #of the list, once counted
+    facets_sampled = False
+
+    def get_requested_facets(self):
+        """
+        The facets of '?facets=', in the order of FACETS.
+        Unknown facet names are a validation error.
+        """
+        if self.action != 'list':
+            return []
+
+        names = {name.strip() for name in self.request.query_params.get(self.facets_param, '').split(',') if name.strip()}
+        unknown = names - set(FACETS)
+        if unknown:
+            raise ValidationError({self.facets_param: [
+                'Unknown facet(s): {}. Available facets: {}.'.format(', '.join(sorted(unknown)), ', '.join(FACETS))
+            ]})
+        return [facet for facet in FACETS if facet in names]
+
+    def get_facet_size(self):
+        try:
+            return positive_int(self.request.query_params[self.facet_size_param], cutoff=self.max_facet_size)
+        except (KeyError, ValueError):
+            return self.facet_size
+
+    def get_facet_sample(self):
+        """
+        The most recent matches counted: 'facet_sample' for a search,
+        every recipe of the list otherwise.
+        """
+        if RecipeSearchFilter().get_search_query(self.request) is None:
+            return None
+        return self.facet_sample
+
+    def count_facets(self, queryset):
+        """
+        Counts the requested facets of the filtered queryset, once per request.
+        """
+        if self.facets is None:
+            facets = self.get_requested_facets()
+            if facets:
+                self.facets, self.facets_sampled = get_facets(
+                    queryset.order_by('-id'), facets, self.get_facet_size(), self.get_facet_sample(),
+                )
+        return self.facets
+
+    def paginate_queryset(self, queryset):
+        self.count_facets(queryset)
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.facets is not None:
+            response.data['facets'] = self.facets
+            response.data['facets_sampled'] = self.facets_sampled
+            if self.facets_sampled:
+                response.data['facets_sample_size'] = self.facet_sample
+        return response
+
+    def get_page_links(self):
+        """The counts change the response, so they are part of its ETag"""
+
+        links = super().get_page_links()
+        return links if self.facets is None else links + [self.facets, self.facets_sampled]
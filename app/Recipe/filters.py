@@ -0,0 +1,64 @@
+from django.contrib.postgres.search import SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from core.search import build_search_query
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """
+    Full-text search for recipes, through the '?search=' parameter.
+    Matches against the recipe's search vector (GIN indexed),
+    so there are no joins on tags and ingredients and no DISTINCT.
+    Results are ranked by relevance.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    search_description = _('Search recipes by title, tags, ingredients and description.')
+
+    def get_search_query(self, request):
+        """
+        Builds the tsquery of the request, if any.
+        """
+        return build_search_query(request.query_params.get(self.search_param, ''))
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Keeps the recipes that match every search term,
+        annotated with their relevance rank.
+        """
+        query = self.get_search_query(request)
+        if query is None:
+            return queryset
+
+        #the rank is cast to double precision, so the cursor position round-trips exactly
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+
+        return queryset.filter(search_vector=query).annotate(search_rank=rank)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Search results are ordered by relevance,
+        anything else by the ordering of the view.
+        Used by the cursor pagination.
+        """
+        if self.get_search_query(request) is None:
+            return getattr(view, 'ordering', 'id')
+
+        return ('-search_rank', 'id')
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': str(self.search_description),
+                'schema': {
+                    'type': 'string',
+                },
+            },
+        ]
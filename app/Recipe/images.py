@@ -0,0 +1,156 @@
+"""
+Background processing of uploaded recipe images.
+
+An upload only stores the original file. Once the upload is committed,
+the recipe is queued to a small thread pool, which generates the resized
+variants, records the dimensions and a tiny placeholder, off the request path.
+Run 'python manage.py process_recipe_images' to process existing images.
+
+The variants of a content-addressed image (see core.blobs) belong to its
+blob, and are shared by the recipes that use it: they are generated once,
+and deleted with the blob. The variants of the images stored before
+belong to their recipe.
+"""
+
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from PIL import Image, ImageOps
+
+from core.blobs import blob_digest, is_blob_file
+from core.models import ImageBlob, Recipe
+
+
+logger = logging.getLogger(__name__)
+
+#field: (name suffix, longest side in pixels, Pillow format, extension)
+VARIANTS = {
+    'image_thumbnail': ('thumb', 320, 'JPEG', 'jpg'),
+    'image_medium': ('medium', 960, 'JPEG', 'jpg'),
+    'image_webp': ('medium', 960, 'WEBP', 'webp'),
+}
+
+PLACEHOLDER_SIZE = 16
+
+#the image is always loaded with its dimension fields, or Django queries them on every instance
+IMAGE_FIELDS = ['id', 'image', 'image_width', 'image_height']
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PIPELINE['WORKERS'],
+    thread_name_prefix='recipe-images',
+)
+
+
+def _encode(image, longest_side, image_format, **options):
+    """
+    Helper function.
+    Resizes a copy of the image to fit in 'longest_side' and encodes it.
+    """
+    resized = image.copy()
+    resized.thumbnail((longest_side, longest_side))
+    if image_format == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+
+    buffer = BytesIO()
+    resized.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def process_recipe_image(recipe_id):
+    """
+    Generates the variants, dimensions and placeholder of a recipe's image.
+    If the image is replaced while it is processed, the result is discarded.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(*IMAGE_FIELDS).first()
+    if recipe is None or not recipe.image:
+        return
+
+    source_name = recipe.image.name
+    with recipe.image.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    storage = recipe.image.storage
+    digest = blob_digest(source_name)
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    variants = {}
+    for field, (suffix, longest_side, image_format, extension) in VARIANTS.items():
+        if digest:
+            name = '{digest}/{suffix}.{extension}'.format(digest=digest, suffix=suffix, extension=extension)
+        else:
+            name = '{stem}_{suffix}.{extension}'.format(stem=stem, suffix=suffix, extension=extension)
+        variants[field] = Recipe._meta.get_field(field).generate_filename(recipe, name)
+        if digest and storage.exists(variants[field]):
+            continue #generated for another recipe with the same image
+
+        content = _encode(image, longest_side, image_format, quality=82, optimize=True)
+        variants[field] = storage.save(variants[field], ContentFile(content))
+
+    placeholder = _encode(image, PLACEHOLDER_SIZE, 'JPEG', quality=40)
+
+    with transaction.atomic():
+        current = Recipe.objects.select_for_update().only(*IMAGE_FIELDS, *VARIANTS).filter(pk=recipe_id).first()
+        replaced = current is None or current.image.name != source_name
+        if replaced:
+            obsolete = list(variants.values()) #the recipe was deleted, or got a new image meanwhile
+        else:
+            obsolete = [getattr(current, field).name for field in VARIANTS if getattr(current, field)]
+            obsolete = [name for name in obsolete if name not in variants.values()]
+            for field, name in variants.items():
+                setattr(current, field, name)
+            current.image_width, current.image_height = image.size
+            current.image_placeholder = 'data:image/jpeg;base64,' + b64encode(placeholder).decode()
+            current.save(update_fields=[*VARIANTS, 'image_width', 'image_height', 'image_placeholder', 'updated_at'])
+
+    for name in obsolete:
+        if not is_blob_file(name): #a blob's variants are deleted with it
+            storage.delete(name)
+    if digest and replaced:
+        ImageBlob.objects.collect([digest]) #in case the blob was collected before its variants were written
+
+
+def clear_recipe_image_variants(recipe):
+    """
+    Clears the variants of the recipe's current image, before a new one is saved.
+    Their files are deleted once the new image is committed.
+    """
+    names = [getattr(recipe, field).name for field in VARIANTS if getattr(recipe, field)]
+    names = [name for name in names if not is_blob_file(name)] #a blob's variants are deleted with it
+    for field in VARIANTS:
+        setattr(recipe, field, None)
+    recipe.image_placeholder = ''
+
+    storage = recipe.image.storage
+    transaction.on_commit(lambda: [storage.delete(name) for name in names])
+
+
+def _process_in_background(recipe_id):
+    """
+    Runs in the thread pool. Uses (and then closes) its own database connection.
+    """
+    close_old_connections()
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Could not process the image of recipe %s', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_recipe_image_processing(recipe_id):
+    """
+    Queues the recipe's image for processing, once the upload is committed.
+    With settings.IMAGE_PIPELINE['ASYNC'] off, it is processed right after
+    the commit, in the same thread (used by the tests).
+    """
+    if settings.IMAGE_PIPELINE['ASYNC']:
+        transaction.on_commit(lambda: _executor.submit(_process_in_background, recipe_id))
+    else:
+        transaction.on_commit(lambda: process_recipe_image(recipe_id))
@@ -1,6 +1,9 @@
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 from core.models import Recipe, Tag, Ingredient
+from core.signals import recipes_relinked
+
+from django.db import transaction
 
 
 
@@ -31,15 +34,31 @@ class RecipeIngredientSerializer(ModelSerializer):
         read_only_fields = ['id']
 
 
+class RecipeImageVariantsSerializer(serializers.Serializer):
+    """
+    Serializer for the resized variants of a recipe image.
+    Variants are generated in the background after an upload,
+    until then they are null.
+    """
+    thumbnail = serializers.ImageField(source='image_thumbnail', read_only=True)
+    medium = serializers.ImageField(source='image_medium', read_only=True)
+    webp = serializers.ImageField(source='image_webp', read_only=True)
+    width = serializers.IntegerField(source='image_width', read_only=True)
+    height = serializers.IntegerField(source='image_height', read_only=True)
+    placeholder = serializers.CharField(source='image_placeholder', read_only=True)
+
+
 class RecipeImageSerializer(ModelSerializer):
     """
     Serializer for recipe image(s).
     Images can only be uploaded by authenticated users.
     Image upload requires recipe id (recipe detail).
     """
+    image_variants = RecipeImageVariantsSerializer(source='*', read_only=True)
+
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_variants']
         read_only_fields = ['id']
         extra_kwargs = {
             'image':{'required' : True}
@@ -48,6 +67,79 @@ class RecipeImageSerializer(ModelSerializer):
 ###########################################################################################
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Serializer for lists of Recipes, used for bulk create and bulk partial update.
+    Every list is written in one transaction, with bulk inserts/updates,
+    and the tags and ingredients of all the recipes are resolved and linked together.
+    The number of queries does not depend on the number of recipes.
+    """
+
+    def _link(self, recipes, items_per_recipe, model, name_field, through, target_field, clear=False):
+        """
+        Helper Function.
+        Gets or creates the tags/ingredients of every recipe in one go, and ADDS them
+        with one bulk insert in the many-to-many through table.
+        Recipes whose items are None are left alone. With 'clear',
+        the current links of the other recipes are removed first (one delete).
+        """
+        relinked = [(recipe, items) for recipe, items in zip(recipes, items_per_recipe) if items is not None]
+        if not relinked:
+            return
+
+        if clear:
+            through.objects.filter(recipe_id__in=[recipe.id for recipe, items in relinked]).delete()
+
+        objs = self.child._get_or_create_by_name(model, name_field, [item for recipe, items in relinked for item in items])
+        by_name = {getattr(obj, name_field): obj for obj in objs}
+
+        links = [
+            through(recipe_id=recipe.id, **{target_field: by_name[item[name_field]].id})
+            for recipe, items in relinked for item in items
+        ]
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """
+        Creates all the recipes with one bulk insert.
+        """
+        tags = [item.pop('tags', None) for item in validated_data]
+        ingredients = [item.pop('ingredients', None) for item in validated_data]
+        recipes = Recipe.objects.bulk_create([Recipe(**item) for item in validated_data])
+
+        self._link(recipes, tags, Tag, 'tag_name', Recipe.tags.through, 'tag_id')
+        self._link(recipes, ingredients, Ingredient, 'ingredient_name', Recipe.ingredients.through, 'ingredient_id')
+        recipes_relinked.send(sender=Recipe, recipe_ids=[recipe.id for recipe in recipes])
+
+        return recipes
+
+    @transaction.atomic
+    def update(self, instances, validated_data):
+        """
+        Partially updates every recipe with the item at the same position.
+        The edited fields of all the recipes are saved with one bulk update.
+        Tags and ingredients that are passed replace the current ones.
+        """
+        tags = [item.pop('tags', None) for item in validated_data]
+        ingredients = [item.pop('ingredients', None) for item in validated_data]
+
+        fields = set()
+        for instance, item in zip(instances, validated_data):
+            for attr, value in item.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+
+        if fields:
+            Recipe.objects.bulk_update(instances, sorted(fields))
+
+        self._link(instances, tags, Tag, 'tag_name', Recipe.tags.through, 'tag_id', clear=True)
+        self._link(instances, ingredients, Ingredient, 'ingredient_name', Recipe.ingredients.through, 'ingredient_id', clear=True)
+        recipes_relinked.send(sender=Recipe, recipe_ids=[instance.id for instance in instances])
+
+        return instances
+
+
 class RecipeSerializer(ModelSerializer):
     """
     Serializer for Recipes.
@@ -58,30 +150,86 @@ class RecipeSerializer(ModelSerializer):
     tags = RecipeTagSerializer(many=True, required = False) #use of nested serializer
     ingredients = RecipeIngredientSerializer(many=True, required=False) #use of nested serializer
     image = serializers.ImageField(required = False, read_only = True)
+    image_variants = RecipeImageVariantsSerializer(source='*', read_only=True)
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = [
+            'search_vector',
+            'image_width',
+            'image_height',
+            'image_thumbnail',
+            'image_medium',
+            'image_webp',
+            'image_placeholder',
+        ] #image details are nested in 'image_variants'
         extra_kwargs = {
             'user':{'read_only':True},
             'id':{'read_only':True}
         }
+        list_serializer_class = RecipeListSerializer #bulk create and bulk partial update
 
-    def _get_or_create_tags(self, tags, recipe):
+    def __init__(self, *args, fields=None, **kwargs):
+        """
+        'fields' limits the rendered fields to the given names (sparse fieldsets).
+        """
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_loaded_fields(self):
+        """
+        The model fields the rendered fields read, and the relations they prefetch.
+        Images bring their dimension fields, which Django reads when it loads an image.
+        """
+        model_fields = {'id'}
+        relations = set()
+
+        for field in self.fields.values():
+            for source in (field.fields.values() if field.source == '*' else [field]):
+                if isinstance(source, serializers.ListSerializer):
+                    relations.add(source.source)
+                else:
+                    model_fields.add(source.source)
+
+        for name in list(model_fields):
+            model_field = Recipe._meta.get_field(name)
+            model_fields.update(filter(None, [getattr(model_field, 'width_field', None), getattr(model_field, 'height_field', None)]))
+
+        return model_fields, relations
+
+    def _get_or_create_by_name(self, model, name_field, items):
         """
         Helper Function.
-        Get, or create tags, if non exist.
-        ADDS the new tags in the recipe.
+        Gets the user's existing tags/ingredients with the given names, and creates
+        the missing ones, with one upsert (see core.models.UserNamedManager).
+        Returns the objects in the order of the names, without duplicates.
         """
         authenticated_user = self.context['request'].user #gets the authenticated user that makes the post request.
+        names = list(dict.fromkeys(item[name_field] for item in items)) #removes duplicate names, keeps their order
 
-        for tag in tags:
-            """
-            for every tag, if it exists in the Tag objects already, get it and add it to the recipe as a relationship.
-            If it doesnt exist, create a Tag object (available in the Tag API) and add it to the recipe as a relationship.
-            """
-            tag_obj, created = Tag.objects.get_or_create(user=authenticated_user, **tag) #in case of creation, tag object will be created with 'user'=authenticated_user.
+        #in case of creation, objects are created with 'user'=authenticated_user and are available in the Tag/Ingredient API.
+        objs = {getattr(obj, name_field): obj for obj in model.objects.get_or_create_names(authenticated_user, names)}
 
-            recipe.tags.add(tag_obj) #adds the tag object in the recipe, instead of a direct post request, which is not allowed.
+        return [objs[name] for name in names]
+
+    def _link_to_recipe(self, recipe, through, target_field, objs):
+        """
+        Helper Function.
+        ADDS the objects to the recipe, with one bulk insert in the many-to-many through table.
+        """
+        links = [through(recipe_id=recipe.id, **{target_field: obj.id}) for obj in objs]
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+    def _get_or_create_tags(self, tags, recipe):
+        """
+        Helper Function.
+        Get, or create tags, if non exist.
+        ADDS the new tags in the recipe.
+        """
+        tag_objs = self._get_or_create_by_name(Tag, 'tag_name', tags)
+        self._link_to_recipe(recipe, Recipe.tags.through, 'tag_id', tag_objs)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """
@@ -89,13 +237,10 @@ class RecipeSerializer(ModelSerializer):
         Get, or create ingredients, if non exist.
         ADDS the new ingredients in the recipe.
         """
-        authenticated_user = self.context['request'].user
-
-        for ingredient in ingredients:
-            ingr_obj, created = Ingredient.objects.get_or_create(user=authenticated_user, **ingredient)
-            recipe.ingredients.add(ingr_obj)
-
+        ingr_objs = self._get_or_create_by_name(Ingredient, 'ingredient_name', ingredients)
+        self._link_to_recipe(recipe, Recipe.ingredients.through, 'ingredient_id', ingr_objs)
 
+    @transaction.atomic
     def create(self, validated_data):
         """
         Custom Method for Creating a recipe, with
@@ -103,16 +248,23 @@ class RecipeSerializer(ModelSerializer):
         with nested serializers/manytomany is not allowed.
         If a Tag/Ingredient doesnt exist in the appropriate table,
         it will be created, and will be available in the Tag/Ingredient API.
+        The number of queries does not depend on the number of tags/ingredients.
         """
 
         tags = validated_data.pop('tags', []) #if any tags are passed into the serializer, removes them and places them in tags variable. Else its an empty list.
         ingredients = validated_data.pop('ingredients', []) #if any ingredients are passed into the serializer, removes them and places them in tags variable. Else its an empty list.
         recipe = Recipe.objects.create(**validated_data) #creates a recipe with the rest of the validated data.
-        self._get_or_create_tags(tags, recipe)#calls helper function to get or create tags and ADD them to recipe.
-        self._get_or_create_ingredients(ingredients, recipe) #calls helper function to get or create ingredients and ADD them to recipe.
+
+        if tags:
+            self._get_or_create_tags(tags, recipe)#calls helper function to get or create tags and ADD them to recipe.
+        if ingredients:
+            self._get_or_create_ingredients(ingredients, recipe) #calls helper function to get or create ingredients and ADD them to recipe.
+        if tags or ingredients:
+            recipes_relinked.send(sender=Recipe, recipe_ids=[recipe.id])
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
         As with creation, custom method for updating recipe
@@ -122,19 +274,21 @@ class RecipeSerializer(ModelSerializer):
 
         if tags is not None:
             """
-            if tags exist, clears them.
+            if tags exist, clears them (one delete in the through table).
             Calls helper function to create tags and ADD them to instance(recipe)
             """
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            Recipe.tags.through.objects.filter(recipe_id=instance.id).delete()
+            if tags:
+                self._get_or_create_tags(tags, instance)
 
         if ingredients is not None:
             """
-            if ingredients exist, clears them.
+            if ingredients exist, clears them (one delete in the through table).
             Calls helper function to create ingredients and ADD them to instance(recipe)
             """
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            Recipe.ingredients.through.objects.filter(recipe_id=instance.id).delete()
+            if ingredients:
+                self._get_or_create_ingredients(ingredients, instance)
 
         for attr, value in validated_data.items():
             """
@@ -145,4 +299,7 @@ class RecipeSerializer(ModelSerializer):
 
         instance.save()
 
-        return instance
\ No newline at end of file
+        if tags is not None or ingredients is not None:
+            recipes_relinked.send(sender=Recipe, recipe_ids=[instance.id])
+
+        return instance
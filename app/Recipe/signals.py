@@ -0,0 +1,42 @@
+"""
+Signal handlers of the Recipe app.
+They are connected when the app is ready (see RecipeConfig.ready).
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe
+from core.signals import recipes_relinked
+
+from .cache import invalidate_recipes
+
+
+def invalidate(*recipe_ids):
+    """
+    Invalidates the recipes at once, so the change shows up in this transaction,
+    and again when the transaction commits, so that responses cached by
+    other requests that read the database before the commit are dropped too.
+    """
+    invalidate_recipes(recipe_ids)
+    transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_changed_recipe(sender, instance, **kwargs):
+    """
+    Invalidates the cached responses of a saved or deleted recipe,
+    and every cached recipe list.
+    """
+    invalidate(instance.pk)
+
+
+@receiver(recipes_relinked)
+def invalidate_relinked_recipes(sender, recipe_ids, **kwargs):
+    """
+    Invalidates the cached responses of recipes whose tags or ingredients
+    changed (linked, unlinked, renamed or deleted), and every cached recipe list.
+    """
+    invalidate(*recipe_ids)
@@ -81,4 +81,4 @@ class IngredientsApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
         response = self.client.get(INGR_LIST_URL)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
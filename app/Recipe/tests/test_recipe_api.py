@@ -3,9 +3,16 @@ from rest_framework.test import APITestCase
 
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from core.models import Ingredient, Recipe, Tag
+from Recipe.views import RecipeApiViewset
+
+from unittest.mock import patch
 
 from PIL import Image
+import os
 import tempfile
 
 
@@ -293,8 +300,8 @@ class PrivateRecipeApiTests(APITestCase):
 
         response = self.client.get(TAGS_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0]['tag_name'], 'Vegeterian')
-        self.assertEqual(response.data[1]['tag_name'], 'French')
+        self.assertEqual(response.data['results'][0]['tag_name'], 'Vegeterian')
+        self.assertEqual(response.data['results'][1]['tag_name'], 'French')
 
     def test_update_recipe_with_tags(self):
         """
@@ -347,7 +354,7 @@ class PrivateRecipeApiTests(APITestCase):
 
         response = self.client.get(INGREDIENT_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_update_recipe_with_ingredients(self):
         """
@@ -380,7 +387,7 @@ class PrivateRecipeApiTests(APITestCase):
 
         response = self.client.get(INGREDIENT_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(response.data['results']), 4)
 
 ################################################################################################################################################
 
@@ -490,8 +497,8 @@ class PrivateMyRecipeApiTests(APITestCase):
 
         response = self.client.get(TAGS_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0]['tag_name'], 'vegan')
-        self.assertEqual(response.data[1]['tag_name'], 'Chinese')
+        self.assertEqual(response.data['results'][0]['tag_name'], 'vegan')
+        self.assertEqual(response.data['results'][1]['tag_name'], 'Chinese')
 
 
     def test_update_my_recipe_with_tags(self):
@@ -547,7 +554,7 @@ class PrivateMyRecipeApiTests(APITestCase):
 
         response = self.client.get(INGREDIENT_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_update_recipe_with_ingredients(self):
         """
@@ -580,7 +587,7 @@ class PrivateMyRecipeApiTests(APITestCase):
 
         response = self.client.get(INGREDIENT_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 4)
+        self.assertEqual(len(response.data['results']), 4)
 
 ######################################################################################################
 
@@ -626,4 +633,340 @@ class TestImageUpload(APITestCase):
         self.recipe.refresh_from_db()
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('image', response.data)
\ No newline at end of file
+        self.assertIn('image', response.data)
+
+
+@override_settings(IMAGE_PIPELINE={'ASYNC': False, 'WORKERS': 1})
+class TestImagePipeline(APITestCase):
+    """
+    Tests the background processing of uploaded images
+    """
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = create_user(email='pipelineuser@example.com', name='user pipeline', password='testpass')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(
+            self.user,
+            recipe_title='Test Recipe for Image Pipeline',
+            recipe_description='Test description',
+            recipe_instructions='test instructions',
+        )
+
+    def upload_image(self, size):
+        """
+        Helper function.
+        Uploads an image of the given size and returns the response.
+        """
+        IMG_UPLOAD_URL = reverse('recipes-img_upload', kwargs={'pk':self.recipe.id})
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as temp_image_file:
+            Image.new('RGB', size).save(temp_image_file)
+            temp_image_file.seek(0)
+            return self.client.post(IMG_UPLOAD_URL, {'image': temp_image_file}, format='multipart')
+
+    def test_upload_returns_before_processing(self):
+        """
+        Tests that the upload responds before the variants are generated
+        """
+        with self.captureOnCommitCallbacks():
+            response = self.upload_image((2000, 1000))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['image_variants']['thumbnail'])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image_thumbnail)
+
+    def test_variants_are_generated(self):
+        """
+        Tests that the variants, dimensions and placeholder are recorded
+        and exposed in the recipe payload
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_image((2000, 1000))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.image_width, self.recipe.image_height), (2000, 1000))
+        self.assertEqual(Image.open(self.recipe.image_thumbnail.path).size, (320, 160))
+        self.assertEqual(Image.open(self.recipe.image_medium.path).size, (960, 480))
+        self.assertEqual(Image.open(self.recipe.image_webp.path).format, 'WEBP')
+        self.assertTrue(self.recipe.image_placeholder.startswith('data:image/jpeg;base64,'))
+
+        RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':self.recipe.id})
+        response = self.client.get(RECIPE_DETAIL_URL)
+        variants = response.data['image_variants']
+        self.assertTrue(variants['thumbnail'].endswith(self.recipe.image_thumbnail.url))
+        self.assertTrue(variants['webp'].endswith('.webp'))
+        self.assertEqual((variants['width'], variants['height']), (2000, 1000))
+
+    def test_new_upload_replaces_variants(self):
+        """
+        Tests that uploading a new image replaces the variants of the old one
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_image((400, 400))
+        self.recipe.refresh_from_db()
+        old_thumbnail = self.recipe.image_thumbnail.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_image((100, 50))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(Image.open(self.recipe.image_thumbnail.path).size, (100, 50))
+        self.assertFalse(os.path.exists(old_thumbnail))
+
+######################################################################################################
+
+class RecipeQueryCountTests(APITestCase):
+    """
+    Tests that listing recipes runs a constant number of queries,
+    no matter how many recipes, tags and ingredients are returned.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'queryuser@example.com',
+            'name' : 'user query',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+
+    def create_recipes(self, count):
+        """
+        Helper function.
+        Creates recipes, each with its own tags and ingredients.
+        Names are numbered after the existing recipes, as they are unique per user.
+        """
+        existing = Recipe.objects.filter(user=self.user).count()
+        for i in range(existing, existing + count):
+            recipe = create_recipe(
+                self.user,
+                recipe_title='Recipe {}'.format(i),
+                recipe_description='Test description',
+                recipe_instructions='test instructions',
+            )
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, tag_name='tag {}'.format(i)),
+                Tag.objects.create(user=self.user, tag_name='other tag {}'.format(i)),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, ingredient_name='ingredient {}'.format(i)),
+            )
+
+    def test_recipe_list_query_count(self):
+        """
+        Tests that the recipe list is fetched with one query
+        for recipes, one for tags and one for ingredients.
+        """
+        self.create_recipes(1)
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.create_recipes(10)
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'other tag 9')
+        self.assertContains(response, 'ingredient 9')
+
+    def test_my_recipe_list_query_count(self):
+        """
+        Tests that the my_recipes list runs a constant number of queries.
+        """
+        self.client.force_authenticate(self.user)
+
+        self.create_recipes(1)
+        with self.assertNumQueries(3):
+            self.client.get(MY_RECIPE_LIST_URL)
+
+        self.create_recipes(10)
+        with self.assertNumQueries(3):
+            response = self.client.get(MY_RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_recipe_detail_query_count(self):
+        """
+        Tests that a recipe detail runs a constant number of queries.
+        """
+        self.create_recipes(1)
+        recipe = Recipe.objects.get()
+        RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':recipe.id})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPE_DETAIL_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+######################################################################################################
+
+class RecipePaginationTests(APITestCase):
+    """
+    Tests cursor pagination on the recipe list endpoints.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'pageuser@example.com',
+            'name' : 'user page',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+
+        for i in range(30):
+            create_recipe(
+                self.user,
+                recipe_title='Recipe {}'.format(i),
+                recipe_description='Test description',
+                recipe_instructions='test instructions',
+            )
+
+    def test_recipe_list_is_paginated(self):
+        """
+        Tests that the recipe list returns one page of recipes,
+        ordered by id, with a cursor to the next page.
+        """
+        response = self.client.get(RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['recipe_title'], 'Recipe 0')
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_follow_next_cursor(self):
+        """
+        Tests that following the next cursor returns the rest
+        of the recipes, without repeating any of them.
+        """
+        response = self.client.get(RECIPE_LIST_URL)
+        first_page = [recipe['id'] for recipe in response.data['results']]
+
+        response = self.client.get(response.data['next'])
+        second_page = [recipe['id'] for recipe in response.data['results']]
+
+        self.assertEqual(len(second_page), 10)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            first_page + second_page,
+            list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        )
+
+    def test_page_size_query_param(self):
+        """
+        Tests that the client can request a page size,
+        but not one bigger than the maximum.
+        """
+        response = self.client.get(RECIPE_LIST_URL, {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+
+        with patch.object(RecipeApiViewset, 'max_page_size', 10):
+            response = self.client.get(RECIPE_LIST_URL, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_no_count_or_offset_queries(self):
+        """
+        Tests that paginating does not run COUNT(*) or OFFSET queries.
+        """
+        response = self.client.get(RECIPE_LIST_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+
+######################################################################################################
+
+class RecipeWriteQueryCountTests(APITestCase):
+    """
+    Tests that creating and updating a recipe runs a constant number
+    of queries, no matter how many tags and ingredients it has.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'writeuser@example.com',
+            'name' : 'user write',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+    def recipe_payload(self, count, prefix='name'):
+        """
+        Helper function.
+        A recipe payload with 'count' tags and ingredients.
+        """
+        return {
+            'recipe_title':'Recipe with {} tags'.format(count),
+            'recipe_description':'Test description',
+            'recipe_instructions':'test instructions',
+            'tags':[{'tag_name':'{} tag {}'.format(prefix, i)} for i in range(count)],
+            'ingredients':[{'ingredient_name':'{} ingredient {}'.format(prefix, i)} for i in range(count)],
+        }
+
+    def count_queries(self, method, url, payload):
+        """
+        Helper function.
+        Makes the request and returns the number of queries it ran.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = method(url, payload, format='json')
+        self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
+
+        return len(queries)
+
+    def test_create_recipe_query_count(self):
+        """
+        Tests that creating a recipe with 30 tags and ingredients
+        runs as many queries as creating one with 1.
+        """
+        small = self.count_queries(self.client.post, RECIPE_LIST_URL, self.recipe_payload(1, 'small'))
+        large = self.count_queries(self.client.post, RECIPE_LIST_URL, self.recipe_payload(30, 'large'))
+
+        self.assertEqual(small, large)
+        recipe = Recipe.objects.get(recipe_title='Recipe with 30 tags')
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_update_recipe_query_count(self):
+        """
+        Tests that updating the tags and ingredients of a recipe
+        runs a constant number of queries.
+        """
+        recipe = create_recipe(
+            self.user,
+            recipe_title='Test Recipe',
+            recipe_description='Test description',
+            recipe_instructions='test instructions',
+        )
+        RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':recipe.id})
+
+        small = self.count_queries(self.client.patch, RECIPE_DETAIL_URL, self.recipe_payload(1, 'small'))
+        large = self.count_queries(self.client.patch, RECIPE_DETAIL_URL, self.recipe_payload(30, 'large'))
+
+        self.assertEqual(small, large)
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertFalse(recipe.tags.filter(tag_name__startswith='small').exists())
+
+    def test_existing_tags_are_reused(self):
+        """
+        Tests that tags that already exist are linked, not created again,
+        and that duplicate names in the payload are linked once.
+        """
+        Tag.objects.create(user=self.user, tag_name='Vegan')
+        payload = self.recipe_payload(0)
+        payload['tags'] = [{'tag_name':'Vegan'}, {'tag_name':'Greek'}, {'tag_name':'Vegan'}]
+
+        response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['tag_name'] for tag in response.data['tags']], ['Vegan', 'Greek'])
+        self.assertEqual(Tag.objects.filter(tag_name='Vegan').count(), 1)
+        self.assertEqual(Tag.objects.count(), 2)
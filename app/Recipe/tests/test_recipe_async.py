@@ -0,0 +1,190 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.metrics import registry
+from core.models import Recipe
+from Recipe.views import RecipeApiViewset
+from User.authentication import token_cache
+
+
+ASYNC_RECIPE_LIST_URL = reverse('async-recipes-list')
+ASYNC_MY_RECIPE_LIST_URL = reverse('async-my_recipes-list')
+
+
+def on_event_loop():
+    """Helper function. Whether it is called from the thread of a running event loop"""
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+class AsyncRecipeApiTests(TestCase):
+    """
+    Tests the async read endpoints of the Recipes API,
+    against the responses of the sync endpoints.
+    """
+
+    def setUp(self):
+        #the test process is the only worker: its local memory cache stands in for a shared one
+        patcher = mock.patch.object(token_cache, 'shared_cache', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        token_cache.clear()
+
+        self.user = create_user(email='async@example.com', name='async user', password='testpass')
+        self.other_user = create_user(email='other@example.com', name='other user', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+
+        self.recipe = create_recipe(self.user, recipe_title='Chicken Curry')
+        create_recipe(self.user, recipe_title='Beef Stew')
+        self.other_recipe = create_recipe(self.other_user, recipe_title='Chicken Soup')
+
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.headers = {'authorization': 'Token ' + self.token.key}
+
+    async def sync_get(self, url):
+        """Helper function that GETs the url from the sync endpoints"""
+
+        return await sync_to_async(self.sync_client.get)(url)
+
+    async def test_list(self):
+        """Tests that the async list is the same as the sync list"""
+
+        response = await self.async_client.get(ASYNC_RECIPE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), (await self.sync_get(reverse('recipes-list'))).json())
+        self.assertEqual(len(response.json()['results']), 3)
+
+    async def test_search(self):
+        """Tests searching with the async list"""
+
+        response = await self.async_client.get(ASYNC_RECIPE_LIST_URL, {'search': 'chicken'})
+
+        titles = [recipe['recipe_title'] for recipe in response.json()['results']]
+        self.assertEqual(sorted(titles), ['Chicken Curry', 'Chicken Soup'])
+
+    async def test_pagination(self):
+        """Tests that the pages link to the next async page"""
+
+        response = await self.async_client.get(ASYNC_RECIPE_LIST_URL, {'page_size': 2})
+        next_url = response.json()['next']
+        self.assertIn(ASYNC_RECIPE_LIST_URL, next_url)
+
+        response = await self.async_client.get(next_url)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNone(response.json()['next'])
+
+    async def test_detail(self):
+        """Tests that the async detail is the same as the sync detail"""
+
+        response = await self.async_client.get(reverse('async-recipes-detail', args=[self.recipe.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), (await self.sync_get(reverse('recipes-detail', args=[self.recipe.id]))).json())
+
+    async def test_blocking_calls_run_in_threads(self):
+        """
+        Tests that the permissions and throttles, and the serializers,
+        run in a thread, not on the event loop.
+        """
+        loop_calls = []
+
+        def recorded(method):
+            def call(*args, **kwargs):
+                loop_calls.append(on_event_loop())
+                return method(*args, **kwargs)
+            return call
+
+        with mock.patch.object(RecipeApiViewset, 'initial', recorded(RecipeApiViewset.initial)), \
+                mock.patch.object(RecipeApiViewset, 'get_serializer', recorded(RecipeApiViewset.get_serializer)):
+            await self.async_client.get(ASYNC_RECIPE_LIST_URL)
+            await self.async_client.get(reverse('async-recipes-detail', args=[self.recipe.id]))
+
+        self.assertGreaterEqual(len(loop_calls), 4)
+        self.assertNotIn(True, loop_calls)
+
+    async def test_detail_not_found(self):
+        """Tests that a missing recipe is a 404"""
+
+        response = await self.async_client.get(reverse('async-recipes-detail', args=[self.recipe.id + 100]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_my_recipes_requires_authentication(self):
+        """Tests that an anonymous user cannot list my_recipes"""
+
+        response = await self.async_client.get(ASYNC_MY_RECIPE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    async def test_my_recipes(self):
+        """
+        Tests that my_recipes lists the recipes of the token's user only,
+        and that the token lookup is cached.
+        """
+        response = await self.async_client.get(ASYNC_MY_RECIPE_LIST_URL, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), (await self.sync_get(reverse('my_recipes-list'))).json())
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    async def test_my_recipe_detail_of_other_user(self):
+        """Tests that the recipes of other users are not found in my_recipes"""
+
+        response = await self.async_client.get(reverse('async-my_recipes-detail', args=[self.other_recipe.id]), **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_invalid_token(self):
+        """Tests that an invalid token is rejected"""
+
+        response = await self.async_client.get(ASYNC_RECIPE_LIST_URL, authorization='Token invalid')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_requests_are_recorded(self):
+        """Tests that the metrics record the async requests, with their queries"""
+
+        registry.clear()
+        await self.async_client.get(ASYNC_MY_RECIPE_LIST_URL, **self.headers)
+
+        metrics = registry._views[('async-my_recipes-list', 'GET')]
+        self.assertEqual(metrics.statuses, {200: 1})
+        self.assertGreater(metrics.queries.sum, 0)
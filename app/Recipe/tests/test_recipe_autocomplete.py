@@ -0,0 +1,229 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.functions import Lower
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from core.models import Recipe, Tag, Ingredient
+from core.signals import UsageCountFold
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+TAG_AUTOCOMPLETE_URL = reverse('tags-autocomplete')
+INGREDIENT_AUTOCOMPLETE_URL = reverse('ingredients-autocomplete')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def recipe_detail_url(recipe_id):
+    """Helper function to get the url of a recipe"""
+
+    return reverse('recipes-detail', args=[recipe_id])
+
+
+class AutocompleteTests(APITestCase):
+    """
+    Tests the autocomplete of the tags and ingredients.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email='autocomplete@example.com', name='autocomplete user', password='testpass')
+        self.client.force_authenticate(self.user)
+
+    def create_tags(self, **usage):
+        """
+        Helper function.
+        Creates a tag per name, linked to as many recipes as its usage.
+        The usage counts are folded in, as after a commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, (name, count) in enumerate(usage.items()):
+                tag = Tag.objects.create(user=self.user, tag_name=name)
+                for j in range(count):
+                    recipe = Recipe.objects.create(
+                        user=self.user, recipe_title='{} {} {}'.format(name, i, j), recipe_description='d', recipe_instructions='i',
+                    )
+                    recipe.tags.add(tag)
+
+    def suggest(self, url, query, **params):
+        """Helper function that returns the suggested names"""
+
+        response = self.client.get(url, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [suggestion[Tag.NAME_FIELD if url == TAG_AUTOCOMPLETE_URL else Ingredient.NAME_FIELD] for suggestion in response.data]
+
+    def test_prefix_ranked_by_usage(self):
+        """
+        Tests that names starting with the query come first, most used first,
+        then the names containing it.
+        """
+        self.create_tags(Spicy=1, spinach=3, sparkling=0, **{'not spicy': 5, 'sweet': 2})
+
+        response = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'SP'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['tag_name'] for tag in response.data], ['spinach', 'Spicy', 'sparkling', 'not spicy'])
+        self.assertEqual(response.data[0], {'id': Tag.objects.get(tag_name='spinach').id, 'tag_name': 'spinach', 'usage_count': 3})
+
+    def test_limit(self):
+        """Tests that there are at most '?limit=' suggestions, up to the maximum"""
+
+        Tag.objects.bulk_create([Tag(user=self.user, tag_name='tag {}'.format(i)) for i in range(60)])
+
+        self.assertEqual(len(self.suggest(TAG_AUTOCOMPLETE_URL, 'tag')), 10)
+        self.assertEqual(len(self.suggest(TAG_AUTOCOMPLETE_URL, 'tag', limit=3)), 3)
+        self.assertEqual(len(self.suggest(TAG_AUTOCOMPLETE_URL, 'tag', limit=1000)), 50)
+        self.assertEqual(len(self.suggest(TAG_AUTOCOMPLETE_URL, 'tag', limit='many')), 10)
+        self.assertEqual(len(self.suggest(TAG_AUTOCOMPLETE_URL, 'tag', limit=0)), 10)
+
+    def test_query_required(self):
+        """Tests that a query is required"""
+
+        response = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('q', response.data)
+
+    def test_like_wildcards(self):
+        """Tests that '%' and '_' in the query are matched literally by the prefix"""
+
+        self.create_tags(**{'100% vegan': 0, '1000 cakes': 1, 'low_fat': 0, 'lowest': 1})
+
+        self.assertEqual(self.suggest(TAG_AUTOCOMPLETE_URL, '100%', limit=1), ['100% vegan'])
+        self.assertEqual(self.suggest(TAG_AUTOCOMPLETE_URL, 'low_', limit=1), ['low_fat'])
+
+    def test_word_prefixes(self):
+        """Tests that the names with words starting with those of the query follow the prefixes"""
+
+        for name in ['pepper', 'red pepper', 'pepperoni pizza', 'bell-pepper', 'peppermint tea', 'sweet pea']:
+            Ingredient.objects.create(user=self.user, ingredient_name=name)
+
+        self.assertEqual(
+            self.suggest(INGREDIENT_AUTOCOMPLETE_URL, 'pepper'),
+            ['pepper', 'peppermint tea', 'pepperoni pizza', 'bell-pepper', 'red pepper'],
+        )
+        self.assertEqual(self.suggest(INGREDIENT_AUTOCOMPLETE_URL, 'Red Pep'), ['red pepper'])
+        self.assertEqual(self.suggest(INGREDIENT_AUTOCOMPLETE_URL, 'tea pepper'), ['peppermint tea'])
+        self.assertEqual(self.suggest(INGREDIENT_AUTOCOMPLETE_URL, "pea & | ! :*"), ['sweet pea'])
+
+    def test_only_own_names(self):
+        """Tests that the tags and ingredients of other users are not suggested"""
+
+        other = create_user(email='other@example.com', name='other user', password='testpass')
+        Tag.objects.create(user=other, tag_name='spicy')
+        Ingredient.objects.create(user=other, ingredient_name='salt')
+        Ingredient.objects.create(user=self.user, ingredient_name='sea salt')
+
+        self.assertEqual(self.suggest(TAG_AUTOCOMPLETE_URL, 'spi'), [])
+        self.assertEqual(self.suggest(INGREDIENT_AUTOCOMPLETE_URL, 'salt'), ['sea salt'])
+
+    def test_unauthenticated(self):
+        """Tests that the autocomplete needs an authenticated user"""
+
+        self.client.force_authenticate(None)
+        response = self.client.get(TAG_AUTOCOMPLETE_URL, {'q': 'sp'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_indexes(self):
+        """Tests that the prefix and word queries can use their indexes"""
+
+        Ingredient.objects.bulk_create([Ingredient(user=self.user, ingredient_name='ingredient {}'.format(i)) for i in range(1000)])
+        named = Ingredient.objects.filter(user=self.user).alias(lower_name=Lower('ingredient_name'))
+        words = Ingredient.objects.alias(words=SearchVector('ingredient_name', config='simple'))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_ingredient')
+            cursor.execute('SET LOCAL enable_seqscan = off') #the table is too small to be worth the indexes otherwise
+            prefix_plan = named.filter(lower_name__startswith='sal').explain()
+            words_plan = words.filter(words=SearchQuery('sal:*', config='simple', search_type='raw')).explain()
+
+        self.assertIn('ingredient_name_prefix_idx', prefix_plan)
+        self.assertIn('ingredient_name_words_idx', words_plan)
+
+
+class UsageCountTests(APITestCase):
+    """
+    Tests that the usage counts of the tags and ingredients follow their recipes.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email='usage@example.com', name='usage user', password='testpass')
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title, tags, ingredients):
+        """Helper function that creates a recipe through the API, and folds the usage counts as after its commit"""
+
+        payload = {
+            'recipe_title': title,
+            'recipe_description': 'd',
+            'recipe_instructions': 'i',
+            'tags': [{'tag_name': name} for name in tags],
+            'ingredients': [{'ingredient_name': name} for name in ingredients],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def usage(self, model):
+        """Helper function that returns the usage counts by name"""
+
+        return dict(model.objects.filter(user=self.user).values_list(model.NAME_FIELD, 'usage_count'))
+
+    def test_usage_counts(self):
+        """Tests the counts when recipes are created, updated and deleted"""
+
+        first = self.create_recipe('first', ['spicy', 'quick'], ['salt'])
+        second = self.create_recipe('second', ['spicy'], ['salt', 'pepper'])
+        self.assertEqual(self.usage(Tag), {'spicy': 2, 'quick': 1})
+        self.assertEqual(self.usage(Ingredient), {'salt': 2, 'pepper': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(recipe_detail_url(first), {'tags': [{'tag_name': 'quick'}, {'tag_name': 'vegan'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.usage(Tag), {'spicy': 1, 'quick': 1, 'vegan': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(recipe_detail_url(second))
+        self.assertEqual(self.usage(Tag), {'spicy': 0, 'quick': 1, 'vegan': 1})
+        self.assertEqual(self.usage(Ingredient), {'salt': 1, 'pepper': 0})
+
+    def test_save_keeps_count(self):
+        """Tests that saving a tag with an outdated count does not overwrite it"""
+
+        self.create_recipe('first', ['spicy'], [])
+        tag = Tag.objects.get(user=self.user, tag_name='spicy')
+        self.create_recipe('second', ['spicy'], [])
+
+        tag.tag_name = 'hot'
+        tag.save()
+
+        self.assertEqual(self.usage(Tag), {'hot': 2})
+
+    def test_counted_after_commit(self):
+        """
+        Tests that a recipe write does not update the counts of its tags and ingredients
+        (nor lock them), which are folded in once, after it commits.
+        """
+        self.create_recipe('first', ['spicy'], ['salt'])
+        payload = {
+            'recipe_title': 'second', 'recipe_description': 'd', 'recipe_instructions': 'i',
+            'tags': [{'tag_name': 'spicy'}], 'ingredients': [{'ingredient_name': 'salt'}],
+        }
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(RECIPE_LIST_URL, payload, format='json')
+        self.assertEqual(self.usage(Tag), {'spicy': 1})
+
+        folds = [callback for callback in callbacks if isinstance(callback, UsageCountFold)]
+        self.assertEqual(len(folds), 1)
+        folds[0]()
+        self.assertEqual(self.usage(Tag), {'spicy': 2})
+        self.assertEqual(self.usage(Ingredient), {'salt': 2})
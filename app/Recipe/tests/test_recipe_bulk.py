@@ -0,0 +1,222 @@
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from core.models import Recipe, Tag, Ingredient
+from Recipe.views import RecipeApiViewset
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+RECIPE_BULK_URL = reverse('recipes-bulk_update')
+MY_RECIPES_LIST_URL = reverse('my_recipes-list')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+def recipe_payload(i, tags=(), ingredients=()):
+    """Helper function to build the payload of a recipe"""
+
+    return {
+        'recipe_title':'Bulk Recipe {}'.format(i),
+        'recipe_description':'bulk description',
+        'recipe_instructions':'bulk instructions',
+        'tags':[{'tag_name':name} for name in tags],
+        'ingredients':[{'ingredient_name':name} for name in ingredients],
+    }
+
+
+class RecipeBulkCreateTests(APITestCase):
+    """
+    Tests creating recipes in bulk through the Recipes API.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'bulkuser@example.com',
+            'name' : 'user bulk',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        """
+        Tests that a list of recipes is created, with their tags and ingredients
+        resolved together, and returned in the order of the list.
+        """
+        Tag.objects.create(user=self.user, tag_name='spicy')
+        payload = [
+            recipe_payload(0, tags=['spicy', 'quick'], ingredients=['rice']),
+            recipe_payload(1, tags=['quick'], ingredients=['rice', 'chicken']),
+            recipe_payload(2),
+        ]
+
+        response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([recipe['recipe_title'] for recipe in response.data], ['Bulk Recipe 0', 'Bulk Recipe 1', 'Bulk Recipe 2'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+        recipe = Recipe.objects.get(id=response.data[1]['id'])
+        self.assertEqual(sorted(recipe.ingredients.values_list('ingredient_name', flat=True)), ['chicken', 'rice'])
+        self.assertEqual(sorted(tag['tag_name'] for tag in response.data[0]['tags']), ['quick', 'spicy'])
+
+    def test_bulk_created_recipes_are_searchable(self):
+        """
+        Tests that the search vectors of bulk created recipes are built.
+        """
+        self.client.post(MY_RECIPES_LIST_URL, [recipe_payload(0, tags=['vegan'])], format='json')
+
+        response = self.client.get(RECIPE_LIST_URL, {'search':'vegan'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_bulk_create_errors_per_item(self):
+        """
+        Tests that an invalid item fails the whole list,
+        with the errors reported at its position.
+        """
+        invalid = recipe_payload(1)
+        del invalid['recipe_title']
+
+        response = self.client.post(RECIPE_LIST_URL, [recipe_payload(0), invalid], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('recipe_title', response.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_size_limit(self):
+        """
+        Tests that lists longer than the viewset's maximum are rejected.
+        """
+        with patch.object(RecipeApiViewset, 'max_bulk_size', 2):
+            response = self.client.post(RECIPE_LIST_URL, [recipe_payload(i) for i in range(3)], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_query_count(self):
+        """
+        Tests that the number of queries does not depend on the number of recipes.
+        """
+        def count_queries(payload):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        few = count_queries([recipe_payload(i, tags=['a'], ingredients=['b']) for i in range(2)])
+        many = count_queries([recipe_payload(i, tags=['c', 'd'], ingredients=['e']) for i in range(40)])
+        self.assertEqual(few, many)
+
+    def test_bulk_create_requires_authentication(self):
+        """
+        Tests that anonymous users cannot create recipes in bulk.
+        """
+        self.client.force_authenticate()
+        response = self.client.post(RECIPE_LIST_URL, [recipe_payload(0)], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class RecipeBulkUpdateTests(APITestCase):
+    """
+    Tests partially updating recipes in bulk through the Recipes API.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'bulkuser@example.com',
+            'name' : 'user bulk',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.other_user = create_user(email='other@example.com', name='other', password='testpass')
+        self.client.force_authenticate(self.user)
+
+        self.recipe = create_recipe(self.user, recipe_title='Chicken Curry')
+        self.recipe.tags.add(Tag.objects.create(user=self.user, tag_name='spicy'))
+        self.other_recipe = create_recipe(self.user, recipe_title='Beef Stew')
+
+    def test_bulk_update(self):
+        """
+        Tests that only the passed fields are updated,
+        and passed tags replace the current ones.
+        """
+        payload = [
+            {'id':self.recipe.id, 'recipe_title':'Chicken Tikka', 'tags':[{'tag_name':'mild'}]},
+            {'id':self.other_recipe.id, 'recipe_description':'slow cooked'},
+        ]
+
+        response = self.client.patch(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in response.data], [self.recipe.id, self.other_recipe.id])
+        self.recipe.refresh_from_db()
+        self.other_recipe.refresh_from_db()
+        self.assertEqual(self.recipe.recipe_title, 'Chicken Tikka')
+        self.assertEqual(self.recipe.recipe_description, 'Test description')
+        self.assertEqual(list(self.recipe.tags.values_list('tag_name', flat=True)), ['mild'])
+        self.assertEqual(self.other_recipe.recipe_title, 'Beef Stew')
+        self.assertEqual(self.other_recipe.recipe_description, 'slow cooked')
+
+        response = self.client.get(RECIPE_LIST_URL, {'search':'tikka mild'})
+        self.assertEqual([recipe['id'] for recipe in response.data['results']], [self.recipe.id])
+
+    def test_bulk_update_errors_per_item(self):
+        """
+        Tests that items without an id, with the id of another user's recipe
+        or with a duplicate id fail the whole list, and nothing is updated.
+        """
+        foreign_recipe = create_recipe(self.other_user)
+        payload = [
+            {'id':self.recipe.id, 'recipe_title':'Chicken Tikka'},
+            {'recipe_title':'No id'},
+            {'id':foreign_recipe.id, 'recipe_title':'Not mine'},
+            {'id':self.recipe.id, 'recipe_title':'x' * 101},
+        ]
+
+        response = self.client.patch(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('id', response.data[2])
+        self.assertIn('id', response.data[3])
+        self.assertIn('recipe_title', response.data[3])
+        self.recipe.refresh_from_db()
+        foreign_recipe.refresh_from_db()
+        self.assertEqual(self.recipe.recipe_title, 'Chicken Curry')
+        self.assertEqual(foreign_recipe.recipe_title, 'Test Recipe')
+
+    def test_bulk_update_requires_a_list(self):
+        """
+        Tests that a payload that is not a list is rejected.
+        """
+        response = self.client.patch(RECIPE_BULK_URL, {'id':self.recipe.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
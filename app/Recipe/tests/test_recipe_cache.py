@@ -0,0 +1,170 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from core.models import Recipe, Tag
+from Recipe.cache import check_cache
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+CACHE_STATS_URL = reverse('recipes-cache_stats')
+
+#the test process is the only worker: its local memory cache stands in for a shared one
+SHARED_RESPONSE_CACHE = {'CACHE': 'default', 'TIMEOUT': 300}
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=SHARED_RESPONSE_CACHE)
+class RecipeResponseCacheTests(APITestCase):
+    """
+    Tests caching anonymous reads of the Recipes API.
+    """
+    def setUp(self):
+        cache.clear()
+
+        user_details = {
+            'email' : 'cacheuser@example.com',
+            'name' : 'user cache',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.recipe = create_recipe(self.user, recipe_title='Chicken Curry')
+        self.other_recipe = create_recipe(self.user, recipe_title='Beef Stew')
+
+    def test_anonymous_list_is_cached(self):
+        """
+        Tests that the second anonymous request is served from the cache,
+        without any query.
+        """
+        response = self.client.get(RECIPE_LIST_URL, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(RECIPE_LIST_URL, format='json')
+        self.assertEqual(cached_response['X-Cache'], 'HIT')
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_query_string_is_normalized(self):
+        """
+        Tests that the order of the query parameters does not matter.
+        """
+        self.client.get(RECIPE_LIST_URL + '?search=chicken&page_size=5', format='json')
+        response = self.client.get(RECIPE_LIST_URL + '?page_size=5&search=chicken&cursor=', format='json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        response = self.client.get(RECIPE_LIST_URL + '?search=beef', format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_authenticated_requests_are_not_cached(self):
+        """
+        Tests that authenticated users always get a fresh response.
+        """
+        self.client.force_authenticate(self.user)
+        self.client.get(RECIPE_LIST_URL, format='json')
+        response = self.client.get(RECIPE_LIST_URL, format='json')
+        self.assertNotIn('X-Cache', response)
+
+    def test_edit_invalidates_list_and_detail(self):
+        """
+        Tests that editing a recipe shows up at once in the cached
+        list and detail responses.
+        """
+        RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':self.recipe.id})
+        self.client.get(RECIPE_LIST_URL, format='json')
+        self.client.get(RECIPE_DETAIL_URL, format='json')
+
+        self.client.force_authenticate(self.user)
+        self.client.patch(RECIPE_DETAIL_URL, {'recipe_title':'Chicken Tikka'})
+        self.client.force_authenticate()
+
+        response = self.client.get(RECIPE_LIST_URL, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Chicken Tikka')
+
+        response = self.client.get(RECIPE_DETAIL_URL, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Chicken Tikka')
+
+    def test_tag_rename_invalidates_only_its_recipes(self):
+        """
+        Tests that renaming a tag invalidates the recipes that use it,
+        but not the other cached recipes.
+        """
+        tag = Tag.objects.create(user=self.user, tag_name='spicy')
+        self.recipe.tags.add(tag)
+        RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':self.recipe.id})
+        OTHER_RECIPE_DETAIL_URL = reverse('recipes-detail', kwargs={'pk':self.other_recipe.id})
+        self.client.get(RECIPE_DETAIL_URL, format='json')
+        self.client.get(OTHER_RECIPE_DETAIL_URL, format='json')
+
+        tag.tag_name = 'mild'
+        tag.save()
+
+        response = self.client.get(RECIPE_DETAIL_URL, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'mild')
+
+        response = self.client.get(OTHER_RECIPE_DETAIL_URL, format='json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_cache_stats(self):
+        """
+        Tests that the hit/miss counters are available to admin users only.
+        """
+        self.client.get(RECIPE_LIST_URL, format='json')
+        self.client.get(RECIPE_LIST_URL, format='json')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', name='admin', password='testpass')
+        self.client.force_authenticate(admin)
+        response = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    @override_settings(RECIPE_RESPONSE_CACHE={'CACHE': '', 'TIMEOUT': 300})
+    def test_not_cached_without_cache(self):
+        """
+        Tests that without a response cache, anonymous requests are simply handled.
+        """
+        self.client.get(RECIPE_LIST_URL, format='json')
+        response = self.client.get(RECIPE_LIST_URL, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', response)
+
+    def test_process_local_cache_refused(self):
+        """
+        Tests that a response cache that is local to each process is refused.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            check_cache()
+
+        with override_settings(RECIPE_RESPONSE_CACHE={**settings.RECIPE_RESPONSE_CACHE, 'CACHE': ''}):
+            check_cache()
@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from core.models import Recipe, Tag
+from User.authentication import token_cache
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+MY_RECIPE_LIST_URL = reverse('my_recipes-list')
+
+
+def detail_url(recipe_id):
+    """Helper function to get the detail url of a recipe"""
+
+    return reverse('recipes-detail', args=[recipe_id])
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+class RecipeTimestampTests(APITestCase):
+    """Tests the created_at/updated_at of the recipes"""
+
+    def setUp(self):
+        self.user = create_user(email='timestamps@example.com', name='user timestamps', password='testpass')
+        self.recipe = create_recipe(self.user)
+        self.client.force_authenticate(self.user)
+
+    def test_relink_bumps_updated_at(self):
+        """Tests that changing the tags of a recipe bumps its updated_at"""
+
+        before = self.recipe.updated_at
+        self.client.patch(detail_url(self.recipe.id), {'tags': [{'tag_name': 'spicy'}]}, format='json')
+
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+    def test_tag_rename_bumps_updated_at(self):
+        """Tests that renaming a tag bumps the updated_at of its recipes"""
+
+        tag = Tag.objects.create(user=self.user, tag_name='spicy')
+        self.recipe.tags.add(tag)
+        self.recipe.refresh_from_db()
+        before = self.recipe.updated_at
+
+        self.client.patch(reverse('tags-detail', args=[tag.id]), {'tag_name': 'hot'})
+
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+
+class ConditionalGetTests(APITestCase):
+    """
+    Tests the ETag/Last-Modified of the recipe list and detail,
+    and the 304 responses to conditional requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email='conditional@example.com', name='user conditional', password='testpass')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user, recipe_title='Chicken Curry')
+        create_recipe(self.user, recipe_title='Beef Stew')
+
+    def test_detail_not_modified(self):
+        """
+        Tests that a detail request with the current ETag gets a 304,
+        with one query on the timestamps only.
+        """
+        response = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(response['Last-Modified'], http_date(self.recipe.updated_at.timestamp()))
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('recipe_description', queries[0]['sql'])
+
+    def test_detail_modified(self):
+        """Tests that an updated recipe gets a new ETag"""
+
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        self.client.patch(detail_url(self.recipe.id), {'recipe_title': 'Lamb Curry'})
+
+        response = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipe_title'], 'Lamb Curry')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Tests If-Modified-Since on the detail"""
+
+        last_hour = timezone.now() - timedelta(hours=1)
+        Recipe.objects.filter(pk=self.recipe.id).update(updated_at=last_hour)
+
+        not_modified = self.client.get(detail_url(self.recipe.id), HTTP_IF_MODIFIED_SINCE=http_date(last_hour.timestamp()))
+        modified = self.client.get(detail_url(self.recipe.id), HTTP_IF_MODIFIED_SINCE=http_date(last_hour.timestamp() - 60))
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+
+    def test_missing_recipe(self):
+        """Tests that a conditional request for a missing recipe is a 404"""
+
+        response = self.client.get(detail_url(self.recipe.id + 100), HTTP_IF_NONE_MATCH='"anything"')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_not_modified(self):
+        """Tests that a list page with the current ETag gets a 304, with one query"""
+
+        response = self.client.get(MY_RECIPE_LIST_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(MY_RECIPE_LIST_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+    def test_list_modified(self):
+        """Tests that adding, removing or relinking a recipe of a page changes its ETag"""
+
+        etags = {self.client.get(RECIPE_LIST_URL)['ETag']}
+
+        recipe = create_recipe(self.user, recipe_title='Lamb Stew')
+        etags.add(self.client.get(RECIPE_LIST_URL)['ETag'])
+        recipe.tags.add(Tag.objects.create(user=self.user, tag_name='spicy'))
+        etags.add(self.client.get(RECIPE_LIST_URL)['ETag'])
+        recipe.delete()
+        response = self.client.get(RECIPE_LIST_URL, HTTP_IF_NONE_MATCH=', '.join(etags))
+
+        self.assertEqual(len(etags), 3)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED) #back to the first page
+        self.assertIn(response['ETag'], etags)
+
+    def test_list_etag_varies(self):
+        """Tests that pages, searches and fieldsets have their own ETag"""
+
+        urls = [
+            RECIPE_LIST_URL,
+            RECIPE_LIST_URL + '?page_size=1',
+            RECIPE_LIST_URL + '?search=chicken',
+            RECIPE_LIST_URL + '?fields=id',
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        self.assertEqual(len(set(etags.values())), len(urls))
+        for url, etag in etags.items():
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(RECIPE_RESPONSE_CACHE={'CACHE': 'default', 'TIMEOUT': 300}) #the only worker: its local memory cache is shared
+    def test_cached_anonymous_not_modified(self):
+        """Tests that cached anonymous responses answer conditional requests"""
+
+        self.client.force_authenticate(None)
+        etag = self.client.get(RECIPE_LIST_URL)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPE_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(queries), 0)
+
+    async def test_async_not_modified(self):
+        """Tests that the async detail has the ETag of the sync detail"""
+
+        token = await Token.objects.acreate(user=self.user)
+        token_cache.clear()
+        headers = {'authorization': 'Token ' + token.key}
+        url = reverse('async-recipes-detail', args=[self.recipe.id])
+
+        response = await self.async_client.get(url, **headers)
+        not_modified = await self.async_client.get(url, if_none_match=response['ETag'], **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
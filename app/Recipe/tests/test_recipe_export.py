@@ -0,0 +1,127 @@
+import csv
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from core.models import Recipe, Tag, Ingredient
+from Recipe.views import RecipeApiViewset
+
+
+RECIPE_EXPORT_URL = reverse('recipes-export')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+class RecipeExportTests(APITestCase):
+    """
+    Tests the streaming export of the Recipes API.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'exportuser@example.com',
+            'name' : 'user export',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        spicy = Tag.objects.create(user=self.user, tag_name='spicy')
+        chicken = Ingredient.objects.create(user=self.user, ingredient_name='chicken')
+        rice = Ingredient.objects.create(user=self.user, ingredient_name='rice')
+
+        self.recipes = []
+        for i in range(5):
+            recipe = create_recipe(self.user, recipe_title='Recipe {}'.format(i))
+            recipe.tags.add(spicy)
+            recipe.ingredients.add(chicken, rice)
+            self.recipes.append(recipe)
+
+        self.curry = create_recipe(self.user, recipe_title='Chicken Curry')
+
+    def test_export_ndjson(self):
+        """
+        Tests that the export streams one JSON object per recipe, by default.
+        """
+        response = self.client.get(RECIPE_EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [recipe.id for recipe in self.recipes + [self.curry]])
+        self.assertEqual(rows[0]['tags'], [{'id':self.recipes[0].tags.get().id, 'tag_name':'spicy'}])
+        self.assertEqual(len(rows[0]['ingredients']), 2)
+
+    def test_export_csv(self):
+        """
+        Tests that the export streams CSV, with tags and ingredients flattened.
+        """
+        response = self.client.get(RECIPE_EXPORT_URL, HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['recipe_title'], 'Recipe 0')
+        self.assertEqual(rows[0]['tags'], 'spicy')
+        self.assertEqual(sorted(rows[0]['ingredients'].split('|')), ['chicken', 'rice'])
+        self.assertEqual(rows[5]['tags'], '')
+
+    def test_export_applies_list_filters(self):
+        """
+        Tests that the export takes the same search filter as the list.
+        """
+        response = self.client.get(RECIPE_EXPORT_URL, {'search':'curry', 'format':'ndjson'})
+
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(row)['id'] for row in rows], [self.curry.id])
+
+    def test_export_prefetches_per_chunk(self):
+        """
+        Tests that the tags and ingredients are prefetched per chunk of recipes,
+        so the number of queries depends on the chunks, not on the recipes.
+        """
+        with patch.object(RecipeApiViewset, 'export_chunk_size', 2):
+            response = self.client.get(RECIPE_EXPORT_URL)
+
+            #one cursor, and a tags and an ingredients query for each of the 3 chunks
+            with self.assertNumQueries(7):
+                rows = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(rows), 6)
+
+    def test_errors_rendered_as_json(self):
+        """
+        Tests that error responses of the export are JSON, whatever format was asked for.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        for accept in ['text/csv', 'application/x-ndjson']:
+            response = self.client.get(RECIPE_EXPORT_URL, HTTP_ACCEPT=accept)
+
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('detail', json.loads(response.content))
@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.models import Recipe, Tag, Ingredient
+from Recipe.views import MyRecipesApiViewset, RecipeApiViewset
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+MY_RECIPE_LIST_URL = reverse('my_recipes-list')
+ASYNC_RECIPE_LIST_URL = reverse('async-recipes-list')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    """
+    Helper function to create a recipe with the named tags and ingredients.
+    The usage counts are folded in, as after a commit.
+    """
+    with APITestCase.captureOnCommitCallbacks(execute=True):
+        recipe = Recipe.objects.create(user=user, recipe_title=title, recipe_description='d', recipe_instructions='i')
+        recipe.tags.set(Tag.objects.get_or_create_names(user, tags))
+        recipe.ingredients.set(Ingredient.objects.get_or_create_names(user, ingredients))
+    return recipe
+
+
+class RecipeFacetsTests(APITestCase):
+    """
+    Tests the tag and ingredient counts of '?facets=' on the recipe lists.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email='facets@example.com', name='facets user', password='testpass')
+        self.other = create_user(email='other@example.com', name='other user', password='testpass')
+        self.client.force_authenticate(self.user)
+
+        create_recipe(self.user, 'Chicken curry', ['spicy', 'quick'], ['chicken', 'rice'])
+        create_recipe(self.user, 'Tofu curry', ['spicy', 'vegan'], ['tofu', 'rice'])
+        create_recipe(self.user, 'Apple cake', ['sweet'], ['apple'])
+        create_recipe(self.other, 'Beef curry', ['spicy'], ['beef', 'rice'])
+
+    def test_search_facets(self):
+        """
+        Tests that the facets count the names of every recipe matched,
+        across users, most common first.
+        """
+        response = self.client.get(RECIPE_LIST_URL, {'search': 'curry', 'facets': 'tags,ingredients', 'page_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['facets'], {
+            'tags': [{'tag_name': 'spicy', 'count': 3}, {'tag_name': 'quick', 'count': 1}, {'tag_name': 'vegan', 'count': 1}],
+            'ingredients': [
+                {'ingredient_name': 'rice', 'count': 3},
+                {'ingredient_name': 'beef', 'count': 1},
+                {'ingredient_name': 'chicken', 'count': 1},
+                {'ingredient_name': 'tofu', 'count': 1},
+            ],
+        })
+
+    def test_one_query(self):
+        """Tests that every facet is counted with one query"""
+
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(RECIPE_LIST_URL, {'search': 'curry'})
+        with CaptureQueriesContext(connection) as faceted:
+            self.client.get(RECIPE_LIST_URL, {'search': 'curry', 'facets': 'tags,ingredients'})
+
+        self.assertEqual(len(faceted), len(plain) + 1)
+
+    def test_facets_asked_for(self):
+        """Tests that only the facets asked for are counted, and none by default"""
+
+        response = self.client.get(RECIPE_LIST_URL)
+        self.assertNotIn('facets', response.data)
+
+        response = self.client.get(RECIPE_LIST_URL, {'facets': 'ingredients', 'facet_size': 1})
+        self.assertEqual(response.data['facets'], {'ingredients': [{'ingredient_name': 'rice', 'count': 3}]})
+
+    def test_facets_sampled(self):
+        """
+        Tests that only the 'facet_sample' most recent matches of a search
+        are counted, and that the response says so.
+        """
+        with patch.object(RecipeApiViewset, 'facet_sample', 2):
+            response = self.client.get(RECIPE_LIST_URL, {'search': 'curry', 'facets': 'tags'})
+
+        self.assertEqual(response.data['facets'], {
+            'tags': [{'tag_name': 'spicy', 'count': 2}, {'tag_name': 'vegan', 'count': 1}],
+        })
+        self.assertIs(response.data['facets_sampled'], True)
+        self.assertEqual(response.data['facets_sample_size'], 2)
+
+        with patch.object(RecipeApiViewset, 'facet_sample', 3):
+            response = self.client.get(RECIPE_LIST_URL, {'search': 'curry', 'facets': 'tags'})
+
+        self.assertIs(response.data['facets_sampled'], False)
+        self.assertNotIn('facets_sample_size', response.data)
+
+    def test_list_without_search_not_sampled(self):
+        """Tests that the recipes of a list without a search are all counted"""
+
+        with patch.object(MyRecipesApiViewset, 'facet_sample', 2):
+            response = self.client.get(MY_RECIPE_LIST_URL, {'facets': 'tags'})
+
+        self.assertEqual(response.data['facets']['tags'][0], {'tag_name': 'spicy', 'count': 2})
+        self.assertEqual(len(response.data['facets']['tags']), 4)
+        self.assertIs(response.data['facets_sampled'], False)
+
+    def test_unknown_facet(self):
+        """Tests that unknown facets are a validation error"""
+
+        response = self.client.get(RECIPE_LIST_URL, {'facets': 'tags,cuisine'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cuisine', response.data['facets'][0])
+
+    def test_my_recipes_facets(self):
+        """Tests that the facets of my_recipes only count the user's recipes"""
+
+        response = self.client.get(MY_RECIPE_LIST_URL, {'facets': 'tags'})
+
+        self.assertEqual(response.data['facets']['tags'][0], {'tag_name': 'spicy', 'count': 2})
+
+    @override_settings(RECIPE_RESPONSE_CACHE={'CACHE': 'default', 'TIMEOUT': 300}) #the only worker: its local memory cache is shared
+    def test_every_recipe_cached(self):
+        """
+        Tests that the facets of every recipe are counted from the usage
+        counts, cached, and counted again once a recipe changes.
+        """
+        response = self.client.get(RECIPE_LIST_URL, {'facets': 'tags'})
+        self.assertEqual(response.data['facets']['tags'][0], {'tag_name': 'spicy', 'count': 3})
+
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(RECIPE_LIST_URL, {'facets': 'tags', 'page_size': 1})
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(RECIPE_LIST_URL, {'page_size': 1})
+        self.assertEqual(len(cached), len(plain))
+
+        create_recipe(self.other, 'Hot wings', ['spicy'])
+        response = self.client.get(RECIPE_LIST_URL, {'facets': 'tags'})
+        self.assertEqual(response.data['facets']['tags'][0], {'tag_name': 'spicy', 'count': 4})
+
+    def test_etag_covers_facets(self):
+        """Tests that the ETag of a page changes with the facets, even if the page does not"""
+
+        params = {'search': 'curry', 'facets': 'tags', 'page_size': 1}
+        response = self.client.get(RECIPE_LIST_URL, params)
+
+        create_recipe(self.other, 'Lamb curry', ['spicy'])
+        changed = self.client.get(RECIPE_LIST_URL, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['results'], response.data['results'])
+        self.assertEqual(changed.data['facets']['tags'][0], {'tag_name': 'spicy', 'count': 4})
+
+    async def test_async_facets(self):
+        """Tests that the async list counts the facets too"""
+
+        response = await self.async_client.get(ASYNC_RECIPE_LIST_URL, {'search': 'curry', 'facets': 'tags', 'facet_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['facets'], {'tags': [{'tag_name': 'spicy', 'count': 3}]})
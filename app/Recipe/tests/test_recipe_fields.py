@@ -0,0 +1,133 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+MY_RECIPE_LIST_URL = reverse('my_recipes-list')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+class SparseFieldsetTests(APITestCase):
+    """
+    Tests '?fields=' and '?exclude=' on the recipe endpoints.
+    """
+    def setUp(self):
+        cache.clear()
+        user_details = {
+            'email' : 'fieldsuser@example.com',
+            'name' : 'user fields',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+        spicy = Tag.objects.create(user=self.user, tag_name='spicy')
+        chicken = Ingredient.objects.create(user=self.user, ingredient_name='chicken')
+        for i in range(3):
+            recipe = create_recipe(self.user, recipe_title='Chicken {}'.format(i))
+            recipe.tags.add(spicy)
+            recipe.ingredients.add(chicken)
+        self.recipe = recipe
+
+    def test_fields(self):
+        """
+        Tests that only the requested fields are rendered, and queried,
+        with no prefetch of the tags and ingredients.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPE_LIST_URL, {'fields': 'id,recipe_title,image'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        for recipe in response.data['results']:
+            self.assertEqual(set(recipe), {'id', 'recipe_title', 'image'})
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('recipe_description', queries[0]['sql'])
+        self.assertNotIn('recipe_instructions', queries[0]['sql'])
+
+    def test_exclude(self):
+        """Tests that excluded fields are neither rendered nor queried"""
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(MY_RECIPE_LIST_URL, {'exclude': 'recipe_instructions,ingredients'})
+
+        recipe = response.data['results'][0]
+        self.assertNotIn('recipe_instructions', recipe)
+        self.assertNotIn('ingredients', recipe)
+        self.assertEqual(recipe['tags'], [{'id': recipe['tags'][0]['id'], 'tag_name': 'spicy'}])
+
+        self.assertEqual(len(queries), 2) #recipes and tags
+        self.assertNotIn('recipe_instructions', queries[0]['sql'])
+
+    def test_detail(self):
+        """Tests sparse fieldsets on the recipe detail"""
+
+        response = self.client.get(reverse('recipes-detail', args=[self.recipe.id]), {'fields': 'recipe_title,image_variants'})
+
+        self.assertEqual(set(response.data), {'recipe_title', 'image_variants'})
+
+    def test_search(self):
+        """Tests sparse fieldsets with a search"""
+
+        create_recipe(self.user, recipe_title='Beef Stew')
+        response = self.client.get(RECIPE_LIST_URL, {'search': 'beef', 'fields': 'recipe_title'})
+
+        self.assertEqual(response.data['results'], [{'recipe_title': 'Beef Stew'}])
+
+    def test_unknown_field(self):
+        """Tests that unknown fields are a validation error"""
+
+        response = self.client.get(RECIPE_LIST_URL, {'fields': 'recipe_title,calories'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('calories', response.data['fields'][0])
+
+    def test_writes_render_every_field(self):
+        """Tests that '?fields=' does not apply to creations"""
+
+        payload = {
+            'recipe_title':'Sparse Recipe',
+            'recipe_description':'Test description',
+            'recipe_instructions':'test instructions',
+        }
+        response = self.client.post(RECIPE_LIST_URL + '?fields=id', payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('recipe_instructions', response.data)
+
+    def test_cached_anonymous_responses(self):
+        """Tests that the response cache keeps the fieldsets apart"""
+
+        self.client.force_authenticate(None)
+        sparse = self.client.get(RECIPE_LIST_URL, {'fields': 'id'})
+        full = self.client.get(RECIPE_LIST_URL)
+
+        self.assertEqual(set(sparse.json()['results'][0]), {'id'})
+        self.assertIn('recipe_title', full.json()['results'][0])
@@ -0,0 +1,153 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from core.models import Recipe, Tag
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe with default details"""
+
+    recipe_details = {
+        'recipe_title':'Test Recipe',
+        'recipe_description':'Test description',
+        'recipe_instructions':'test instructions',
+    }
+    recipe_details.update(params)
+
+    return Recipe.objects.create(user=user, **recipe_details)
+
+
+def search(client, text, **params):
+    """Helper function that searches recipes and returns the titles found"""
+
+    response = client.get(RECIPE_LIST_URL, {'search': text, **params})
+    return [recipe['recipe_title'] for recipe in response.data['results']]
+
+
+class RecipeSearchTests(APITestCase):
+    """
+    Tests full-text search on the Recipes API.
+    """
+    def setUp(self):
+        user_details = {
+            'email' : 'searchuser@example.com',
+            'name' : 'user search',
+            'password' : 'testpass'
+        }
+
+        self.user = create_user(**user_details)
+        self.client.force_authenticate(self.user)
+
+    def test_search_by_title(self):
+        """
+        Tests searching recipes by (part of) their title.
+        """
+        create_recipe(self.user, recipe_title='Chicken Curry')
+        create_recipe(self.user, recipe_title='Beef Stew')
+
+        self.assertEqual(search(self.client, 'chicken'), ['Chicken Curry'])
+        self.assertEqual(search(self.client, 'chick'), ['Chicken Curry'])
+
+    def test_search_by_tags_and_ingredients(self):
+        """
+        Tests that recipes are found by the tags and ingredients
+        they were created with, through the API.
+        """
+        payload = {
+            'recipe_title':'Weeknight Dinner',
+            'recipe_description':'Test description',
+            'recipe_instructions':'test instructions',
+            'tags':[{'tag_name':'Vegetarian'}],
+            'ingredients':[{'ingredient_name':'Tomatoes'}]
+        }
+        response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        create_recipe(self.user, recipe_title='Something else')
+
+        self.assertEqual(search(self.client, 'vegetarian'), ['Weeknight Dinner'])
+        self.assertEqual(search(self.client, 'tomato'), ['Weeknight Dinner'])
+
+    def test_every_term_must_match(self):
+        """
+        Tests that a recipe must match all of the search terms.
+        """
+        create_recipe(self.user, recipe_title='Chicken Curry')
+        create_recipe(self.user, recipe_title='Chicken Soup')
+
+        self.assertEqual(search(self.client, 'chicken soup'), ['Chicken Soup'])
+
+    def test_search_results_ranked_by_relevance(self):
+        """
+        Tests that a title match ranks above a description match.
+        """
+        create_recipe(self.user, recipe_title='Pasta Salad', recipe_description='Cold and fresh lemon dressing')
+        create_recipe(self.user, recipe_title='Lemon Tart', recipe_description='A sweet dessert')
+
+        self.assertEqual(search(self.client, 'lemon'), ['Lemon Tart', 'Pasta Salad'])
+
+    def test_search_without_duplicates(self):
+        """
+        Tests that a recipe matching through several tags is returned once.
+        """
+        recipe = create_recipe(self.user, recipe_title='Green Bowl')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, tag_name='green'),
+            Tag.objects.create(user=self.user, tag_name='green salad'),
+        )
+
+        self.assertEqual(search(self.client, 'green'), ['Green Bowl'])
+
+    def test_search_follows_renamed_and_removed_tags(self):
+        """
+        Tests that the search vector is refreshed when a tag
+        is renamed, or removed from a recipe.
+        """
+        recipe = create_recipe(self.user, recipe_title='Noodles')
+        tag = Tag.objects.create(user=self.user, tag_name='spicy')
+        recipe.tags.add(tag)
+        self.assertEqual(search(self.client, 'spicy'), ['Noodles'])
+
+        tag.tag_name = 'mild'
+        tag.save()
+        self.assertEqual(search(self.client, 'spicy'), [])
+        self.assertEqual(search(self.client, 'mild'), ['Noodles'])
+
+        tag.delete()
+        self.assertEqual(search(self.client, 'mild'), [])
+
+    def test_search_results_are_paginated(self):
+        """
+        Tests walking through ranked search results with the cursor.
+        """
+        for i in range(5):
+            create_recipe(self.user, recipe_title='Soup {}'.format(i))
+        create_recipe(self.user, recipe_title='Soup soup', recipe_description='soup')
+
+        response = self.client.get(RECIPE_LIST_URL, {'search': 'soup', 'page_size': 2})
+        titles = [recipe['recipe_title'] for recipe in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [recipe['recipe_title'] for recipe in response.data['results']]
+
+        self.assertEqual(titles[0], 'Soup soup')
+        self.assertEqual(sorted(titles), sorted(Recipe.objects.values_list('recipe_title', flat=True)))
+
+    def test_empty_search_returns_everything(self):
+        """
+        Tests that a search without any words does not filter recipes.
+        """
+        create_recipe(self.user, recipe_title='Chicken Curry')
+        create_recipe(self.user, recipe_title='Beef Stew')
+
+        self.assertEqual(len(search(self.client, ' _- ')), 2)
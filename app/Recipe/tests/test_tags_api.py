@@ -98,3 +98,31 @@ class PrivateTagApiTests(APITestCase):
         response = self.client.delete(TAG_DETAIL_URL)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Tag.objects.filter(tag_name='delete this tag').exists())
+
+    def test_create_duplicate_tag(self):
+        """
+        Tests that a user cannot create two tags with the same name,
+        while other users can use the name.
+        """
+        create_tag(user=self.user, tag_name='Vegan')
+        other_user = create_user(email='other@example.com', name='other name', password='testpass')
+        create_tag(user=other_user, tag_name='Dessert')
+
+        response = self.client.post(TAG_LIST_URL, {'tag_name': 'Vegan'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag_name', response.data)
+
+        response = self.client.post(TAG_LIST_URL, {'tag_name': 'Dessert'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_rename_to_existing_tag(self):
+        """
+        Tests that renaming a tag to the name of another tag of the user fails.
+        """
+        create_tag(user=self.user, tag_name='Vegan')
+        tag = create_tag(user=self.user, tag_name='Vegetarian')
+
+        response = self.client.patch(reverse('tags-detail', kwargs={'pk':tag.id}), {'tag_name': 'Vegan'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.tag_name, 'Vegetarian')
@@ -1,39 +1,127 @@
 
-from core.models import Ingredient, Recipe, Tag
+from core.models import ImageBlob, Ingredient, Recipe, Tag
 from .serializers import RecipeSerializer, RecipeTagSerializer, RecipeIngredientSerializer, RecipeImageSerializer
 from .permissions import UpdateMyRecipesPermissions
+from .filters import RecipeSearchFilter
+from .cache import AnonymousResponseCacheMixin, get_stats
+from .conditional import ConditionalGetMixin
+from .facets import FacetsMixin
+from .images import clear_recipe_image_variants, schedule_recipe_image_processing
+from .export import CSVRenderer, EXPORTERS, NDJSONRenderer
+from User.authentication import CachedTokenAuthentication
+from core.pagination import positive_int
+from core.routers import ReplicaReadsMixin, replica_reads_iterator
+from core.pages import cached_page
+from core.throttling import ImageUploadRateThrottle
+from core.staticfiles import static_version
 
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from rest_framework.filters import SearchFilter
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework import status
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.views.generic import TemplateView
+from django.views.decorators.cache import cache_control
+from django.utils.decorators import method_decorator
 
 # Create your views here.
 
+@method_decorator([cached_page, cache_control(public=True)], name='dispatch')
 class HomeTemplateView(TemplateView):
+    """
+    The homepage, the same for every visitor: cached whole, see core.pages.
+    Its cards are cached as a fragment too, for the requests the page cache misses.
+    """
     template_name = 'Recipe/index.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_cache_timeout'] = settings.PAGE_CACHE['TIMEOUT']
+        context['static_version'] = static_version()
+        return context
+
 ##################################################################
 
-class BaseRecipeViewSet(ModelViewSet):
+class BaseRecipeViewSet(ReplicaReadsMixin, FacetsMixin, ConditionalGetMixin, ModelViewSet):
     """
     Base Viewset for Recipe and My_Recipe API.
+    Safe requests read from a replica, see core.routers.
+    List and detail responses carry an ETag and a Last-Modified header,
+    and conditional requests get a 304, see Recipe.conditional.
+    Lists count the tags and ingredients of their recipes with '?facets=', see Recipe.facets.
     """
     queryset = Recipe.objects.all()#Users can GET all recipes
-    authentication_classes = [TokenAuthentication]
-    filter_backends = [SearchFilter]
+    authentication_classes = [CachedTokenAuthentication]
+    filter_backends = [RecipeSearchFilter] #full-text search by title, tags, ingredients and description
+    ordering = 'id'
+    page_size = 20
+    max_page_size = 100
+    max_bulk_size = 1000 #most recipes in one bulk request
+
+    sparse_actions = {'list', 'retrieve'} #actions that take '?fields=' and '?exclude='
+
+    def get_queryset(self):
+        """
+        Prefetches the nested tags and ingredients, so that listing
+        any number of recipes costs a constant number of queries.
+        Only the columns the serializers render are loaded: with '?fields='
+        or '?exclude=', only those of the requested fields (and 'updated_at',
+        for the ETag), and the relations that are not rendered are not prefetched.
+        """
+        prefetches = {
+            'tags': Prefetch('tags', queryset=Tag.objects.only('id', 'tag_name')),
+            'ingredients': Prefetch('ingredients', queryset=Ingredient.objects.only('id', 'ingredient_name')),
+        }
+        queryset = super().get_queryset()
+
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset.defer('search_vector').prefetch_related(*prefetches.values())
+
+        model_fields, relations = self.get_serializer_class()(fields=fields).get_loaded_fields()
+        return queryset.only('updated_at', *model_fields).prefetch_related(*[prefetches[relation] for relation in relations])
+
+    def get_sparse_fields(self):
+        """
+        The fields to render, from the comma separated '?fields=' (default: all)
+        minus those of '?exclude='. None when every field is rendered.
+        Unknown field names are a validation error.
+        """
+        if self.action not in self.sparse_actions:
+            return None
+
+        params = {
+            param: [name.strip() for name in self.request.query_params.get(param, '').split(',') if name.strip()]
+            for param in ['fields', 'exclude']
+        }
+        if not params['fields'] and not params['exclude']:
+            return None
+
+        available = list(self.get_serializer_class()().fields)
+        errors = {}
+        for param, names in params.items():
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = ['Unknown field(s): {}. Available fields: {}.'.format(', '.join(unknown), ', '.join(available))]
+        if errors:
+            raise ValidationError(errors)
 
-    search_fields = [
-        'recipe_title',
-        'recipe_description',
-        'tags__tag_name',
-        'ingredients__ingredient_name'
-        ]
+        return [name for name in params['fields'] or available if name not in params['exclude']]
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Renders only the requested fields, see get_sparse_fields().
+        """
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         """
@@ -63,34 +151,149 @@ class BaseRecipeViewSet(ModelViewSet):
             serializer = RecipeSerializer
         return serializer
 
-    @action(methods = ['POST'], detail = True, url_path = 'upload-image', url_name='img_upload')
+    def create(self, request, *args, **kwargs):
+        """
+        POSTing a list of recipes creates them in bulk.
+        """
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        """
+        Creates a list of recipes in one transaction, with bulk inserts.
+        All or nothing: if any recipe is invalid, none is created, and the errors
+        are returned per item, in the order of the list (empty for valid items).
+        """
+        serializer = self.get_serializer(data=request.data, many=True, max_length=self.max_bulk_size)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = serializer.save(user=self.request.user)
+        return Response(self.get_bulk_response_data(recipes), status=status.HTTP_201_CREATED)
+
+    @action(methods = ['PATCH'], detail = False, url_path = 'bulk', url_name = 'bulk_update')
+    def bulk_update(self, request):
+        """
+        Custom 'PATCH' endpoint for partially updating a list of recipes,
+        in one transaction, with bulk updates. Every item needs the 'id'
+        of a recipe the user has created.
+        All or nothing, with the errors per item, as in bulk_create.
+        """
+        items = request.data if isinstance(request.data, list) else []
+        ids = [self._get_bulk_item_id(item) for item in items]
+        instances = self.get_queryset().filter(user=request.user).in_bulk([pk for pk in ids if pk is not None])
+
+        serializer = self.get_serializer(
+            [instances.get(pk) for pk in ids], data=request.data, many=True, partial=True, max_length=self.max_bulk_size
+        )
+        serializer.is_valid()
+        if serializer.errors and isinstance(serializer.errors, dict):
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST) #not a list, or too long
+
+        errors = list(serializer.errors) or [{} for item in items]
+        seen = set()
+        for index, pk in enumerate(ids):
+            if pk is None:
+                errors[index] = {**errors[index], 'id': ['This field is required.']}
+            elif pk not in instances:
+                errors[index] = {**errors[index], 'id': ['You have no recipe with this id.']}
+            elif pk in seen:
+                errors[index] = {**errors[index], 'id': ['Duplicate id.']}
+            seen.add(pk)
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = serializer.save()
+        return Response(self.get_bulk_response_data(recipes), status=status.HTTP_200_OK)
+
+    def _get_bulk_item_id(self, item):
+        """
+        Helper function.
+        Returns the recipe id of a bulk update item, or None if it has no valid id.
+        """
+        try:
+            return int(item['id'])
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    def get_bulk_response_data(self, recipes):
+        """
+        Serializes recipes written in bulk, reloaded with their tags
+        and ingredients in a constant number of queries.
+        """
+        reloaded = self.get_queryset().in_bulk([recipe.id for recipe in recipes])
+        return self.get_serializer([reloaded[recipe.id] for recipe in recipes], many=True).data
+
+    @action(methods = ['POST'], detail = True, url_path = 'upload-image', url_name='img_upload', throttle_classes = [ImageUploadRateThrottle])
     def upload_recipe_image(self, request, pk=None):
         """
         Custom 'POST' endpoint with custom url, for uploading a recipe image.
         This action requires recipe id and a token authenticated user.
         The only way to upload an image is through this action.
+        Returns as soon as the original is stored. The resized variants
+        are generated in the background, see Recipe.images.
+        Images are stored once per content, see core.blobs.
+        Uploads have a rate limit of their own, see core.throttling.
 
         """
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            old_image = recipe.image.name
+            with transaction.atomic():
+                clear_recipe_image_variants(recipe) #the variants of the old image are outdated
+                serializer.save()
+                if old_image:
+                    ImageBlob.objects.release(old_image)
+            schedule_recipe_image_processing(recipe.id)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RecipeApiViewset(BaseRecipeViewSet):
+class RecipeApiViewset(AnonymousResponseCacheMixin, BaseRecipeViewSet):
     """
     Handles All-Recipe API requests.
     User has to be authenticated to create update and delete, but not to retrieve.
     User can only update and delete the recipes they have created.
     Image field is read only. Go to '/api/recipes/{id}/image-upload,
     to upload a recipe image.
+    Anonymous list and detail responses are served from a shared cache.
     """
     #User has to be authenticated to create. They can only update their own recipes
     permission_classes = [IsAuthenticatedOrReadOnly, UpdateMyRecipesPermissions]
+    export_chunk_size = 500
+
+    @action(methods = ['GET'], detail = False, url_path = 'export', url_name = 'export', renderer_classes = [NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        Custom 'GET' endpoint that streams every recipe, for partners
+        that mirror the catalogue. Takes the same filters as the list.
+        NDJSON by default, CSV with '?format=csv' or 'Accept: text/csv'.
+        Recipes are read through a server-side cursor with their tags and
+        ingredients prefetched per chunk, see Recipe.export.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.paginator.get_ordering(request, queryset, self) #same order as the list pages
+
+        recipes = queryset.order_by(*ordering).iterator(chunk_size=self.export_chunk_size)
+        serializer = self.get_serializer()
+        rows = replica_reads_iterator(EXPORTERS[request.accepted_renderer.format](serializer, recipes)) #streamed after dispatch() left replica_reads()
+
+        response = StreamingHttpResponse(rows, content_type=request.accepted_media_type)
+        response['Content-Disposition'] = 'attachment; filename="recipes.{format}"'.format(format=request.accepted_renderer.format)
+        return response
+
+    @action(methods = ['GET'], detail = False, url_path = 'cache-stats', url_name = 'cache_stats', permission_classes = [IsAdminUser])
+    def cache_stats(self, request):
+        """
+        Custom 'GET' endpoint for monitoring the response cache.
+        Returns the hits and misses of every worker. Admin users only.
+        """
+        return Response(get_stats(), status=status.HTTP_200_OK)
 
 class MyRecipesApiViewset(BaseRecipeViewSet):
     """
@@ -109,33 +312,69 @@ class MyRecipesApiViewset(BaseRecipeViewSet):
         The queryset is modified to only look for the recipes
         the user has created
         """
-        query = Recipe.objects.filter(user=self.request.user)
+        query = super().get_queryset().filter(user=self.request.user)
         return query
 
 ##################################################################################
 
-class BaseRecipeAttrsViewSet(ModelViewSet):
+class BaseRecipeAttrsViewSet(ReplicaReadsMixin, ModelViewSet):
     """
     Base viewset for Tag and Ingredient APIs.
+    Safe requests read from a replica, see core.routers.
     """
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    page_size = 50
+    max_page_size = 200
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
+
+    def save_unique_name(self, serializer):
+        """
+        Saves the instance with 'user'= the user that makes the request.
+        Names are unique per user: a name the user already has is a
+        validation error, instead of the database's IntegrityError.
+        """
+        try:
+            with transaction.atomic():
+                return serializer.save(user=self.request.user)
+        except IntegrityError:
+            model = self.queryset.model
+            raise ValidationError({
+                model.NAME_FIELD: ['You already have a {} with this name.'.format(model._meta.verbose_name)]
+            })
 
     def perform_create(self, serializer):
         """
         Creates a tag instance with 'user'= the user that makes the request.
         Automatically GETS the token authenticated user.
         """
-        serializer.save(user=self.request.user)
-        return super().perform_create(serializer)
+        return self.save_unique_name(serializer)
 
     def perform_update(self, serializer):
         """
         Updates a tag instance with 'user'= the user that makes the request.
         Automatically GETS the token authenticated user.
         """
-        instance = serializer.save(user=self.request.user)
-        return instance
+        return self.save_unique_name(serializer)
+
+    @action(methods = ['GET'], detail = False, url_path = 'autocomplete', url_name = 'autocomplete')
+    def autocomplete(self, request):
+        """
+        Custom 'GET' endpoint that suggests the user's tags/ingredients
+        while they type a name: '?q=' is what they typed so far.
+        At most '?limit=' suggestions (10 by default, 50 at most),
+        the most used ones first, see UserNamedManager.autocomplete.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This query parameter is required.']})
+        try:
+            limit = positive_int(request.query_params['limit'], cutoff=self.max_autocomplete_limit)
+        except (KeyError, ValueError):
+            limit = self.autocomplete_limit
+
+        return Response(self.queryset.model.objects.autocomplete(request.user, query, limit))
 
 
 class TagsModelViewset(BaseRecipeAttrsViewSet):
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'User'
+
+    def ready(self):
+        """Connects the signal handlers of the User app, and checks the shared cache of the tokens"""
+        from . import signals  # noqa: F401
+        from .authentication import check_shared_cache
+        check_shared_cache()
@@ -0,0 +1,64 @@
+"""
+Async (ASGI) login, under /api/async/login/.
+
+Same requests and responses as the login view (User.views.UserLoginApiView),
+but the password hashing is awaited (see User.hashing), so under ASGI
+(see app/asgi.py) a login holds no thread while its password is hashed.
+"""
+
+from asgiref.sync import sync_to_async
+from django.views import View
+
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+
+from .hashing import aauthenticate_login
+from .views import UserLoginApiView
+
+
+class AsyncUserLoginView(View):
+    """
+    Async view, that serves POST requests as UserLoginApiView does.
+    Follows APIView.dispatch(), with the authentication and the queries awaited.
+    """
+    api_view_class = UserLoginApiView
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Logins send no CSRF token, as for every API view"""
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    def get_api_view(self, request, *args, **kwargs):
+        """
+        Sets up the login view, for its parsers, serializer and renderers.
+        Logins are not authenticated, so that the session is never read.
+        The browsable API is not served, since its forms are rendered synchronously.
+        """
+        api_view = self.api_view_class(args=args, kwargs=kwargs)
+        api_view.authentication_classes = []
+        api_view.renderer_classes = [renderer for renderer in api_view.renderer_classes if renderer.format != 'api']
+        api_view.request = api_view.initialize_request(request, *args, **kwargs)
+        api_view.headers = api_view.default_response_headers
+        return api_view
+
+    async def post(self, request, *args, **kwargs):
+        api_view = self.get_api_view(request, *args, **kwargs)
+        request = api_view.request
+
+        try:
+            #negotiation and the login throttle (in its cache), in a thread
+            await sync_to_async(api_view.initial)(request, *args, **kwargs)
+            serializer = api_view.get_serializer(data=request.data)
+
+            data = serializer.to_internal_value(serializer.initial_data) #the fields only, validate() would hash synchronously
+            user = await aauthenticate_login(data['email'], data['password'])
+            serializer.validate_user(data, user)
+
+            token, created = await Token.objects.aget_or_create(user=user)
+            response = Response({'token': token.key})
+        except Exception as exc:
+            response = api_view.handle_exception(exc)
+
+        return api_view.finalize_response(request, response, *args, **kwargs)
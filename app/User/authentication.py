@@ -0,0 +1,269 @@
+import copy
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+from core.cache import LRUCache, is_process_local
+
+
+class TokenCache:
+    """
+    Caches token -> user lookups, so that token authentication
+    does not query the database on every request.
+    Tokens are cached in a bounded in-process LRU with a TTL, and in the
+    Django cache settings.TOKEN_AUTH_CACHE['SHARED_CACHE'], shared by
+    the workers. Each entry is stamped with the version of the token it
+    was read at, which lives in the shared cache: invalidating a token
+    replaces its version, and every read (in-process hits included)
+    checks it, so a token invalidated in any worker stops authenticating
+    in all of them at once. The in-process LRU saves fetching and
+    unpickling the token and its user, not that check.
+    Without a shared cache, tokens are not cached at all: an in-process
+    entry could not be invalidated from the other workers.
+    Reads return copies of the token and its user: the cached instances
+    are never handed to a request.
+    """
+    key_prefix = 'authtoken:'
+    version_prefix = 'authtoken-version:'
+
+    def __init__(self, max_size, ttl, shared_cache=None):
+        self.ttl = ttl
+        self.local = LRUCache(max_size, ttl)
+        self.shared_cache = shared_cache
+
+    @property
+    def shared(self):
+        """The shared Django cache, if one is configured"""
+        return caches[self.shared_cache] if self.shared_cache else None
+
+    @staticmethod
+    def copy_token(token):
+        """A copy of the token and of its user"""
+
+        user = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = user
+        return token
+
+    def lookup(self, key):
+        """
+        Returns the cached token (a copy, with its user) or None, and the
+        current version of the token. After a miss, pass that version to
+        set(): a token invalidated during the database lookup is then
+        cached with a version that is already outdated.
+        """
+        if self.shared is None:
+            return None, None
+
+        entry = self.local.get(key)
+        version_key = self.version_prefix + key
+        if entry is not None:
+            version = self.shared.get(version_key)
+            if version is not None and version == entry[1]:
+                return self.copy_token(entry[0]), version
+            self.local.delete(key) #invalidated in some worker
+
+        found = self.shared.get_many([self.key_prefix + key, version_key])
+        version = found.get(version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not self.shared.add(version_key, version, self.ttl): #another worker added it meanwhile
+                version = self.shared.get(version_key)
+
+        entry = found.get(self.key_prefix + key)
+        if entry is not None and version is not None and version == entry[1]:
+            self.local.set(key, entry)
+            return self.copy_token(entry[0]), version
+
+        return None, version
+
+    async def alookup(self, key):
+        """Async version of lookup(), the shared cache is read without blocking the event loop"""
+
+        if self.shared is None:
+            return None, None
+
+        entry = self.local.get(key)
+        version_key = self.version_prefix + key
+        if entry is not None:
+            version = await self.shared.aget(version_key)
+            if version is not None and version == entry[1]:
+                return self.copy_token(entry[0]), version
+            self.local.delete(key)
+
+        found = await self.shared.aget_many([self.key_prefix + key, version_key])
+        version = found.get(version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not await self.shared.aadd(version_key, version, self.ttl):
+                version = await self.shared.aget(version_key)
+
+        entry = found.get(self.key_prefix + key)
+        if entry is not None and version is not None and version == entry[1]:
+            self.local.set(key, entry)
+            return self.copy_token(entry[0]), version
+
+        return None, version
+
+    def get(self, key):
+        """Returns the cached token (a copy, with its user), or None"""
+        return self.lookup(key)[0]
+
+    async def aget(self, key):
+        """Async version of get()"""
+        return (await self.alookup(key))[0]
+
+    def set(self, key, token, version=None):
+        """
+        Caches a copy of the token (with its user), at the version
+        returned by lookup(), by default the current one.
+        """
+        if self.shared is None:
+            return
+        if version is None:
+            version = self.lookup(key)[1]
+
+        entry = (self.copy_token(token), version)
+        self.local.set(key, entry)
+        self.shared.set(self.key_prefix + key, entry, self.ttl)
+
+    async def aset(self, key, token, version=None):
+        """Async version of set()"""
+
+        if self.shared is None:
+            return
+        if version is None:
+            version = (await self.alookup(key))[1]
+
+        entry = (self.copy_token(token), version)
+        self.local.set(key, entry)
+        await self.shared.aset(self.key_prefix + key, entry, self.ttl)
+
+    def delete(self, *keys):
+        """Invalidates the tokens, in every worker"""
+
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None and keys:
+            #entries stamped with a version that expired are outdated as well
+            self.shared.set_many({self.version_prefix + key: uuid.uuid4().hex for key in keys}, self.ttl)
+            self.shared.delete_many([self.key_prefix + key for key in keys])
+
+    def delete_user(self, user):
+        """Invalidates the tokens of the user"""
+
+        self.delete(*Token.objects.filter(user_id=user.pk).values_list('key', flat=True))
+
+    def clear(self):
+        """Drops every token of the in-process cache"""
+
+        self.local.clear()
+
+
+def check_shared_cache():
+    """
+    Refuses a TOKEN_AUTH_CACHE['SHARED_CACHE'] that is local to each process:
+    a token invalidated in one worker would still authenticate in the others.
+    Called when the User app is ready.
+    """
+    alias = settings.TOKEN_AUTH_CACHE['SHARED_CACHE']
+    if alias and is_process_local(alias):
+        raise ImproperlyConfigured(
+            "TOKEN_AUTH_CACHE['SHARED_CACHE'] ({!r}) is a {} cache, which the worker processes do not share. "
+            "Point TOKEN_AUTH_SHARED_CACHE to a shared cache (e.g. memcached), or leave it empty "
+            "to not cache tokens.".format(alias, settings.CACHES[alias]['BACKEND'])
+        )
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE['MAX_SIZE'],
+    ttl=settings.TOKEN_AUTH_CACHE['TTL'],
+    shared_cache=settings.TOKEN_AUTH_CACHE['SHARED_CACHE'],
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that looks the token up in the token cache first.
+    Only tokens of active users are cached. Cached tokens are invalidated
+    when the token is deleted, or its user is saved (deactivated,
+    password changed...) or deleted. See User.signals.
+    Async views authenticate with aauthenticate(), see Recipe.async_views.
+    """
+
+    def get_key(self, request):
+        """
+        Returns the token key of the 'Authorization: Token <key>' header,
+        or None if the request has no token.
+        """
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """
+        Async version of authenticate().
+        Returns (user, token), or None if the request has no token.
+        """
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        """
+        Async version of authenticate_credentials().
+        On a cache miss, the token is fetched with the async ORM.
+        """
+        token, version = await token_cache.alookup(key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if token.user.is_active:
+                await token_cache.aset(key, token, version) #only tokens of active users are cached
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+    def authenticate_credentials(self, key):
+        token, version = token_cache.lookup(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, version)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
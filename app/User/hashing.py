@@ -0,0 +1,138 @@
+"""
+Login authentication, with the password hashing off the request threads.
+
+Checking a password runs PBKDF2 (hundreds of milliseconds of CPU), which
+authenticate() does on the request thread: a burst of logins takes every
+worker thread, and starves the other endpoints. Here the user is read on
+the request thread, as ModelBackend does, but the password is hashed on a
+bounded pool (see core.pools), sized by settings.LOGIN_HASHING.
+When the pool is full, logins get a 429 at once, instead of queueing behind
+each other. The async login view awaits the hashing, without holding a thread.
+"""
+
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import Throttled
+
+from core.pools import BoundedPool, PoolFull
+
+
+POOL_NAME = 'login_hashing'
+BUSY_DETAIL = 'Too many logins at once.'
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """
+    The pool of the current settings, created on first use.
+    None when settings.LOGIN_HASHING['WORKERS'] is 0: passwords are then
+    hashed on the request thread.
+    """
+    config = settings.LOGIN_HASHING
+    if not config['WORKERS']:
+        return None
+
+    key = (config['WORKERS'], config['MAX_WAITING'])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = BoundedPool(POOL_NAME, *key)
+        return _pools[key]
+
+
+def get_login_user(email):
+    """The user with this email, or None"""
+
+    user_model = get_user_model()
+    try:
+        return user_model._default_manager.get_by_natural_key(email)
+    except user_model.DoesNotExist:
+        return None
+
+
+def check_login_password(user, password):
+    """
+    Checks the password of the user. Only hashes, so it can run on the pool.
+    A missing user gets a password hashed anyway, so that the response
+    takes as long (as ModelBackend does). Returns whether the password
+    is valid, and whether the user got an upgraded password hash to save.
+    """
+    if user is None:
+        make_password(password)
+        return False, False
+
+    upgraded = []
+    def setter(raw_password):
+        user.set_password(raw_password) #hashes again, still on the pool
+        upgraded.append(True)
+
+    return check_password(password, user.password, setter), bool(upgraded)
+
+
+def _hash(pool, user, password):
+    """
+    Helper function.
+    Checks the password on the pool, or on this thread without one.
+    """
+    if pool is None:
+        return check_login_password(user, password)
+    try:
+        return pool.run(check_login_password, user, password)
+    except PoolFull:
+        raise Throttled(wait=1, detail=BUSY_DETAIL)
+
+
+def _login_failed(email):
+    """
+    Helper function.
+    Sends user_login_failed, as authenticate() does.
+    """
+    user_login_failed.send(sender=__name__, credentials={'username': email, 'password': '********************'})
+
+
+def authenticate_login(email, password):
+    """
+    Returns the active user with these credentials, or None.
+    Raises Throttled (429) if the hashing pool is full.
+    """
+    user = get_login_user(email)
+    valid, upgraded = _hash(get_hashing_pool(), user, password)
+
+    if upgraded:
+        user.save(update_fields=['password'])
+    if valid and user.is_active:
+        return user
+
+    _login_failed(email)
+    return None
+
+
+async def aauthenticate_login(email, password):
+    """
+    Async version of authenticate_login, that awaits the hashing pool.
+    """
+    user = await sync_to_async(get_login_user)(email)
+
+    pool = get_hashing_pool()
+    if pool is None:
+        valid, upgraded = await sync_to_async(check_login_password)(user, password)
+    else:
+        try:
+            valid, upgraded = await pool.arun(check_login_password, user, password)
+        except PoolFull:
+            raise Throttled(wait=1, detail=BUSY_DETAIL)
+
+    if upgraded:
+        await sync_to_async(user.save)(update_fields=['password'])
+    if valid and user.is_active:
+        return user
+
+    _login_failed(email)
+    return None
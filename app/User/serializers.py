@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth import authenticate
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 
+from .hashing import authenticate_login
+
 class UserSerializer(ModelSerializer):
     """Serializer for Custom User"""
 
@@ -38,16 +39,18 @@ class UserLoginSerializer(serializers.Serializer):
     def validate(self, data):
         """
         with given data(credentials), attempts to authenticate user.
-
+        The password is hashed on the login hashing pool (see User.hashing).
         """
         email = data.get('email')
         password = data.get('password')
 
-        user = authenticate(
-            username = email,
-            password = password
-        )
+        user = authenticate_login(email, password)
+        return self.validate_user(data, user)
 
+    def validate_user(self, data, user):
+        """
+        Adds the authenticated user to the data, or fails the validation.
+        """
         if user is not None:
             data['user'] = user
             return data
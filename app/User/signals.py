@@ -0,0 +1,33 @@
+"""
+Signal handlers of the User app.
+They are connected when the app is ready (see UserConfig.ready).
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Invalidates a deleted token, so it stops authenticating at once.
+    """
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user_tokens(sender, instance, created, **kwargs):
+    """
+    Invalidates the tokens of a saved user, so that deactivating them,
+    changing their password (UserSerializer.update) or their details
+    takes effect at once.
+    """
+    if created:
+        return #a new user has no tokens yet
+
+    token_cache.delete_user(instance)
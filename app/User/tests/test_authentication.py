@@ -0,0 +1,193 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from User.authentication import TokenCache, check_shared_cache, token_cache
+
+
+MY_RECIPE_LIST_URL = reverse('my_recipes-list')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """
+    Tests that token lookups are cached, and invalidated
+    when the token or its user changes.
+    """
+
+    def setUp(self):
+        #the test process is the only worker: its local memory cache stands in for a shared one
+        patcher = mock.patch.object(token_cache, 'shared_cache', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        token_cache.clear()
+
+        user_details = {
+            'email':'user@example.com',
+            'name':'test name',
+            'password':'testpassword'
+            }
+
+        self.user = create_user(**user_details)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def token_queries(self):
+        """
+        Helper function.
+        Makes an authenticated request and returns the queries on the token table.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(MY_RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [query for query in queries.captured_queries if 'authtoken_token' in query['sql']]
+
+    def test_token_lookup_is_cached(self):
+        """
+        Tests that only the first request looks the token up in the database.
+        """
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(len(self.token_queries()), 0)
+
+    def test_deleted_token_is_invalidated(self):
+        """
+        Tests that a deleted token stops authenticating at once.
+        """
+        self.token_queries()
+        self.token.delete()
+
+        response = self.client.get(MY_RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_invalidated(self):
+        """
+        Tests that the token of a deactivated user stops authenticating at once.
+        """
+        self.token_queries()
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(MY_RECIPE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_is_invalidated(self):
+        """
+        Tests that changing the password through the Users API
+        invalidates the cached token.
+        """
+        self.token_queries()
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        USER_DETAIL_URL = reverse('users-detail', kwargs={'pk':self.user.id})
+        response = self.client.patch(USER_DETAIL_URL, {'password':'newpassword'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(len(self.token_queries()), 1)
+
+
+class TokenCacheTests(TestCase):
+    """
+    Tests the token cache with a shared cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email='user@example.com', name='test name', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_shared_cache(self):
+        """
+        Tests that tokens are shared through the Django cache,
+        and invalidated in it as well.
+        """
+        worker_1 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+        worker_2 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+
+        worker_1.set(self.token.key, self.token)
+        self.assertEqual(worker_2.get(self.token.key).user, self.user)
+
+        worker_1.delete_user(self.user)
+        self.assertIsNone(cache.get(TokenCache.key_prefix + self.token.key))
+
+    def test_invalidated_in_every_worker(self):
+        """
+        Tests that a token invalidated in one worker stops authenticating
+        in the others, even though they hold it in their in-process cache.
+        """
+        worker_1 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+        worker_2 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+        worker_1.set(self.token.key, self.token)
+        self.assertIsNotNone(worker_2.get(self.token.key))
+
+        worker_1.delete(self.token.key)
+
+        self.assertIsNone(worker_2.get(self.token.key))
+
+    def test_invalidated_during_lookup(self):
+        """
+        Tests that a token invalidated while it was looked up in the
+        database is not cached as valid.
+        """
+        worker_1 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+        worker_2 = TokenCache(max_size=10, ttl=60, shared_cache='default')
+
+        token, version = worker_1.lookup(self.token.key) #miss, then the database lookup
+        worker_2.delete_user(self.user)
+        worker_1.set(self.token.key, self.token, version)
+
+        self.assertIsNone(token)
+        self.assertIsNone(worker_1.get(self.token.key))
+
+    def test_copies_returned(self):
+        """
+        Tests that every read returns its own copy of the token and its user.
+        """
+        token_cache = TokenCache(max_size=10, ttl=60, shared_cache='default')
+        token_cache.set(self.token.key, self.token)
+
+        first = token_cache.get(self.token.key)
+        first.user.name = 'changed'
+        second = token_cache.get(self.token.key)
+
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.user, second.user)
+        self.assertEqual(second.user.name, 'test name')
+
+    def test_not_cached_without_shared_cache(self):
+        """
+        Tests that without a shared cache, tokens are not cached at all.
+        """
+        token_cache = TokenCache(max_size=10, ttl=60, shared_cache='')
+        token_cache.set(self.token.key, self.token)
+
+        self.assertEqual(token_cache.lookup(self.token.key), (None, None))
+        self.assertEqual(len(token_cache.local), 0)
+
+    def test_process_local_shared_cache_refused(self):
+        """
+        Tests that a shared cache that is local to each process is refused.
+        """
+        with override_settings(TOKEN_AUTH_CACHE={**settings.TOKEN_AUTH_CACHE, 'SHARED_CACHE': 'default'}):
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache()
+
+        with override_settings(TOKEN_AUTH_CACHE={**settings.TOKEN_AUTH_CACHE, 'SHARED_CACHE': ''}):
+            check_shared_cache()
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.metrics import registry
+from core.throttling import LoginRateThrottle
+from User.hashing import POOL_NAME, get_hashing_pool
+
+
+LOGIN_URL = reverse('User:login')
+ASYNC_LOGIN_URL = reverse('async-login')
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def pool_metric(name):
+    """Helper function to read a metric of the login hashing pool"""
+
+    line = '{name}{{pid="{pid}",pool="{pool}"}} '.format(name=name, pid=os.getpid(), pool=POOL_NAME)
+    for metric in registry.render().splitlines():
+        if metric.startswith(line):
+            return float(metric[len(line):])
+    return 0
+
+
+@override_settings(LOGIN_HASHING={'WORKERS': 1, 'MAX_WAITING': 0})
+class LoginHashingTests(APITestCase):
+    """
+    Tests the logins, whose passwords are hashed on a bounded pool.
+    """
+
+    def setUp(self):
+        self.user = create_user(email='login@example.com', name='login user', password='testpass')
+        self.payload = {'email': 'login@example.com', 'password': 'testpass'}
+
+    def fill_pool(self):
+        """Holds the only thread of the pool, until the end of the test"""
+
+        release = threading.Event()
+        task = get_hashing_pool().submit(release.wait)
+        self.addCleanup(task.result) #the pool is free again for the next test
+        self.addCleanup(release.set)
+
+    def test_login_on_the_pool(self):
+        """Tests that the password is hashed on the pool"""
+
+        hashed = pool_metric('pool_task_duration_seconds_count')
+        response = self.client.post(LOGIN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(pool_metric('pool_task_duration_seconds_count'), hashed + 1)
+
+    def test_wrong_credentials(self):
+        """Tests that a wrong password, or email, does not log in"""
+
+        for payload in [{**self.payload, 'password': 'wrong'}, {**self.payload, 'email': 'nobody@example.com'}]:
+            response = self.client.post(LOGIN_URL, payload)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertNotIn('token', response.data)
+
+    def test_inactive_user(self):
+        """Tests that an inactive user can not log in"""
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.post(LOGIN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_full_pool(self):
+        """Tests that logins get a 429 at once when the pool is full"""
+
+        self.fill_pool()
+        rejected = pool_metric('pool_tasks_rejected_total')
+
+        response = self.client.post(LOGIN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(pool_metric('pool_tasks_rejected_total'), rejected + 1)
+        self.assertEqual(pool_metric('pool_tasks_running') + pool_metric('pool_tasks_waiting'), 1)
+
+    def test_password_upgrade(self):
+        """Tests that an outdated password hash is upgraded at login"""
+
+        self.user.password = make_password('testpass', hasher='pbkdf2_sha1')
+        self.user.save()
+
+        response = self.client.post(LOGIN_URL, self.payload)
+
+        self.user.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.user.check_password('testpass'))
+
+    @override_settings(LOGIN_HASHING={'WORKERS': 0, 'MAX_WAITING': 0})
+    def test_without_pool(self):
+        """Tests hashing on the request thread"""
+
+        response = self.client.post(LOGIN_URL, self.payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_async_login(self):
+        """Tests that the async login returns the token of the sync login"""
+
+        response = await self.async_client.post(ASYNC_LOGIN_URL, self.payload, content_type='application/json')
+        wrong = await self.async_client.post(ASYNC_LOGIN_URL, {**self.payload, 'password': 'wrong'}, content_type='application/json')
+        invalid = await self.async_client.post(ASYNC_LOGIN_URL, {'email': 'not an email'}, content_type='application/json')
+
+        token = await Token.objects.aget(user=self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'token': token.key})
+        self.assertEqual(wrong.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(invalid.json()), {'email', 'password'})
+
+    async def test_async_login_throttled_in_a_thread(self):
+        """Tests that the login throttle, which reads and writes its cache, does not run on the event loop"""
+
+        on_loop = []
+
+        def allow_request(throttle, request, view):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return True
+
+        with mock.patch.object(LoginRateThrottle, 'allow_request', allow_request):
+            response = await self.async_client.post(ASYNC_LOGIN_URL, self.payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(on_loop, [False])
+
+    async def test_async_full_pool(self):
+        """Tests that async logins get a 429 when the pool is full"""
+
+        self.fill_pool()
+        response = await self.async_client.post(ASYNC_LOGIN_URL, self.payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
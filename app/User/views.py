@@ -2,34 +2,44 @@ from django.shortcuts import render
 from django.contrib.auth import get_user_model
 
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from rest_framework.filters import SearchFilter
 
 from .serializers import UserSerializer, UserLoginSerializer
 from .permissions import UpdateSelfUserPermissions
+from .authentication import CachedTokenAuthentication
+from core.routers import ReplicaReadsMixin
+from core.throttling import LoginRateThrottle
 
 # Create your views here.
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(ReplicaReadsMixin, ModelViewSet):
     """
     Handles User requests
     User has to be authenticated with token
     to update or delete their account.
     Everyone can retrieve and create users
+    Safe requests read from a replica, see core.routers.
     """
 
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
     permission_classes = [UpdateSelfUserPermissions]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     filter_backends = [SearchFilter]
     search_fields = ['id', 'email', 'name']
+    page_size = 20
+    max_page_size = 100
 
 
 class UserLoginApiView(ObtainAuthToken):
-    """Handles User Login (token retrieval)"""
+    """
+    Handles User Login (token retrieval)
+    Logins are throttled per address and per email, see core.throttling.
+    """
 
     serializer_class = UserLoginSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES #ObtainAuthToken pins DRF's parsers
+    throttle_classes = [LoginRateThrottle]
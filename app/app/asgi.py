@@ -3,6 +3,13 @@ ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serves the whole site, and the async recipe views under /api/async/
+(see Recipe.async_views) without a thread per request. Run it with uvicorn:
+
+    gunicorn app.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+
+or, with a single process, 'uvicorn app.asgi:application --host 0.0.0.0 --port 8000'.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
@@ -12,5 +19,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+#every request runs on a thread of its own, so a persistent connection would never be reused
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+#render the cached pages before the first request (see core.pages)
+from core.pages import warm_page_cache
+warm_page_cache()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 
 
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core.apps.CoreConfig',
     'User.apps.UserConfig',
     'rest_framework',
@@ -49,7 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware', #first, so it times the whole request. Served on /api/metrics/
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware', #serves STATIC_ROOT before the rest of the stack, see core.staticfiles
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +64,8 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'app.urls'
 
+TEST_RUNNER = 'core.runner.TestRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -89,9 +95,48 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)), #seconds a connection is reused for, 0 closes it after every request
+        'CONN_HEALTH_CHECKS': True, #a reused connection is checked before the first query of a request
     }
 }
 
+# Read replicas, as a comma separated list of hosts in DB_REPLICA_HOSTS.
+# Each one gets an alias 'replica_<n>', with the settings of 'default'.
+# To try it locally, point DB_REPLICA_HOSTS to the DB_HOST: the alias stands in for a replica.
+# Safe requests of the API read from them, see core.routers.
+# Run the test suite without replicas: a replica connection can not see the data of a TestCase.
+
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES['replica_{}'.format(number)] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Point CACHE_BACKEND/CACHE_LOCATION to a cache server (e.g. memcached),
+# so that every worker shares the cache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    #counters of the rate limits (core.throttling) without a cache server: files, shared by the workers of the host.
+    #Slower than a cache server, and its increments are not atomic: point THROTTLE_CACHE to one in production.
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'recipe-app-throttle')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -133,6 +178,27 @@ MEDIA_URL = 'static/media/'
 STATIC_ROOT= 'vol/web/static'
 MEDIA_ROOT = 'vol/web/media'
 
+#collectstatic writes hashed names, precompressed .br/.gz copies, and re-encoded images (core.staticfiles)
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_PIPELINE = {
+    'IMAGE_MAX_SIZE': 1280, #longest side of the bundled images, in pixels
+    'JPEG_QUALITY': 80,
+}
+
+#Serving of the media files (core.media). With a front-end server, the view checks the request and hands
+#the transfer to it: 'x-accel-redirect' (nginx, to INTERNAL_URL + the file name, an internal location aliased
+#to MEDIA_ROOT) or 'x-sendfile' (Apache mod_xsendfile, lighttpd). Empty: the worker streams the file.
+MEDIA_SERVING = {
+    'SENDFILE': os.environ.get('MEDIA_SENDFILE', ''),
+    'INTERNAL_URL': os.environ.get('MEDIA_INTERNAL_URL', '/internal-media/'),
+}
+
+#the uploads are hashed as they stream in, for the content-addressed image storage (see core.blobs)
+FILE_UPLOAD_HANDLERS = [
+    'core.blobs.HashingMemoryFileUploadHandler',
+    'core.blobs.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -145,7 +211,84 @@ AUTH_USER_MODEL = 'core.CustomUserModel'
 REST_FRAMEWORK = {
 
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    #orjson, with the same output as DRF's JSONRenderer/JSONParser (see core.renderers, core.parsers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    #searches and writes, each with a budget of its own (core.throttling, THROTTLING). Logins and uploads set their own
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.SearchRateThrottle',
+        'core.throttling.WriteRateThrottle',
+    ],
+
+}
+
+#Cached token authentication (User.authentication.CachedTokenAuthentication)
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000, #tokens kept in every worker's in-process LRU
+    'TTL': 60, #seconds a token stays cached
+    #alias of the cache in CACHES shared by all workers, which holds the tokens' versions checked on every read
+    #(a process-local cache is refused at start): the default cache when it is a cache server (CACHE_BACKEND).
+    #Empty: tokens are not cached, every request reads its token from the database.
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE', 'default' if os.environ.get('CACHE_BACKEND') else ''),
+}
+
+#Response cache for anonymous reads of the Recipes API (Recipe.cache)
+RECIPE_RESPONSE_CACHE = {
+    #alias of the cache in CACHES, shared by every worker process, as it holds the versions that changes move
+    #(a process-local cache is refused at start): the default cache when it is a cache server (CACHE_BACKEND).
+    #Empty: responses are not cached.
+    'CACHE': os.environ.get('RECIPE_RESPONSE_CACHE', 'default' if os.environ.get('CACHE_BACKEND') else ''),
+    'TIMEOUT': 300, #seconds. Changes invalidate cached responses at once, this only bounds memory use.
+}
+
+#Rate limits per scope and identity ('user', 'token', 'ip'), as DRF's rates (core.throttling)
+THROTTLING = {
+    #alias of the cache in CACHES, shared by every worker process (a process-local cache is refused at start):
+    #the default cache when it is a cache server (CACHE_BACKEND), else the files of 'throttle'
+    'CACHE': os.environ.get('THROTTLE_CACHE', 'default' if os.environ.get('CACHE_BACKEND') else 'throttle'),
+    'RATES': {
+        'search': {'user': '60/min', 'token': '60/min', 'ip': '120/min'},
+        'write': {'user': '60/min', 'token': '60/min', 'ip': '120/min'}, #addresses may be shared by many users (NAT)
+        'login': {'user': '10/min', 'ip': '30/min'}, #'user' is the email that logs in
+        'upload': {'user': '10/min', 'token': '10/min', 'ip': '20/min'},
+    },
+}
+
+#Full-page cache of the homepage and the API root (core.pages), warmed when a worker starts
+PAGE_CACHE = {
+    'CACHE': 'default', #alias of the cache in CACHES
+    'TIMEOUT': int(os.environ.get('PAGE_CACHE_TIMEOUT', 600)), #seconds, also the max-age sent to clients
+    #origins the pages are warmed for, e.g. 'https://recipes.example.com'. Default: the ALLOWED_HOSTS, or localhost
+    'WARM_ORIGINS': [origin for origin in os.environ.get('PAGE_CACHE_WARM_ORIGINS', '').split(',') if origin],
+}
+
+#Background processing of uploaded recipe images (Recipe.images)
+IMAGE_PIPELINE = {
+    'ASYNC': True, #process in a thread pool. If False, images are processed in the request, after it commits.
+    'WORKERS': 2, #threads of the pool, per worker process
+}
+
+#Password hashing of the logins (User.hashing), on a bounded thread pool per worker process
+LOGIN_HASHING = {
+    'WORKERS': int(os.environ.get('LOGIN_HASHING_WORKERS', 2)), #threads hashing at once. PBKDF2 releases the GIL: up to one per CPU core. 0 hashes on the request thread
+    'MAX_WAITING': int(os.environ.get('LOGIN_HASHING_MAX_WAITING', 2)), #logins queued for a thread, more get a 429 at once. Keep WORKERS + MAX_WAITING below the request threads
+}
 
+#Request metrics (core.metrics). With several worker processes, each one writes its metrics to MULTIPROCESS_DIR,
+#a directory of their own, emptied before the server starts, and /api/metrics/ serves their sum.
+#Unset: every process serves its own metrics, labelled with its pid.
+METRICS = {
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROCESS_DIR'),
+    'FLUSH_INTERVAL': 1, #seconds before the new metrics of a process are written, and seen by the others' scrapes
 }
 
 #DRF-SPECTACULAR settings
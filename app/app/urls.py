@@ -16,16 +16,19 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
 from django.conf import settings
 
 
-from rest_framework import routers
 from User.views import UserViewSet
 from Recipe.views import RecipeApiViewset, MyRecipesApiViewset, TagsModelViewset, IngredientsModelViewset
+from Recipe.async_views import AsyncRecipeListView, AsyncRecipeDetailView, AsyncMyRecipeListView, AsyncMyRecipeDetailView
+from User.async_views import AsyncUserLoginView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from core.media import MediaView
+from core.views import MetricsView
+from core.pages import CachedDefaultRouter
 
-router = routers.DefaultRouter()
+router = CachedDefaultRouter() #DefaultRouter with a cached API root, see core.pages
 router.register('users', UserViewSet, basename = 'users')
 router.register('recipes',RecipeApiViewset, basename = 'recipes' )
 router.register('my_recipes', MyRecipesApiViewset, basename='my_recipes')
@@ -36,17 +39,17 @@ urlpatterns = [
     path('', include('Recipe.urls')),
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/metrics/', MetricsView.as_view(), name = 'metrics'),
+    #recipe images, handed to the front-end server when there is one (see core.media)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', MediaView.as_view(), name = 'media'),
+    #async reads and login, served without a thread per request under ASGI (see app/asgi.py)
+    path('api/async/recipes/', AsyncRecipeListView.as_view(), name = 'async-recipes-list'),
+    path('api/async/recipes/<int:pk>/', AsyncRecipeDetailView.as_view(), name = 'async-recipes-detail'),
+    path('api/async/my_recipes/', AsyncMyRecipeListView.as_view(), name = 'async-my_recipes-list'),
+    path('api/async/my_recipes/<int:pk>/', AsyncMyRecipeDetailView.as_view(), name = 'async-my_recipes-detail'),
+    path('api/async/login/', AsyncUserLoginView.as_view(), name = 'async-login'),
     path('', include('User.urls')),
     path('api/schema/', SpectacularAPIView.as_view(), name = 'api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
 
 ]
-
-if settings.DEBUG:
-    """
-    Only in dev mode - Serve media files
-    """
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root = settings.MEDIA_ROOT,
-    )
\ No newline at end of file
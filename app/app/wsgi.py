@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+#render the cached pages before the first request (see core.pages)
+from core.pages import warm_page_cache
+warm_page_cache()
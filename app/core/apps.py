@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        """Connects the signal handlers of the core app, and checks the cache of the rate limits"""
+        from . import signals  # noqa: F401
+        from .throttling import check_cache
+        check_cache()
@@ -0,0 +1,117 @@
+"""
+Content-addressed storage of the uploaded images.
+
+An image is stored once, under the SHA-256 of its content:
+'images/blobs/<2 first hex digits>/<sha256>.<extension>', however many
+recipes use it, and whatever it was called when uploaded (see
+core.models.ImageBlob). Its resized variants are stored under
+'images/variants/<sha256>/', so they are shared too.
+A name never points to another content, so these URLs are served with
+far-future, immutable cache headers (see core.media.MediaView).
+
+The hash is computed while the upload streams in, by the upload handlers
+of this module (see settings.FILE_UPLOAD_HANDLERS), so a duplicate upload
+is recognised without reading the file again.
+"""
+
+import hashlib
+import os
+import re
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+BLOB_DIRECTORY = 'images/blobs'
+VARIANT_DIRECTORY = 'images/variants'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+#Pillow format: extension, so that the same content always gets the same name
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp', 'BMP': 'bmp', 'TIFF': 'tif'}
+
+_BLOB_NAME = re.compile(r'^{}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})\.\w+$'.format(BLOB_DIRECTORY))
+_VARIANT_NAME = re.compile(r'^{}/(?P<digest>[0-9a-f]{{64}})/[^/]+$'.format(VARIANT_DIRECTORY))
+
+
+def content_digest(content):
+    """
+    The SHA-256 of the file, as hex digits. Uploads bring it (see
+    HashingUploadHandlerMixin), other files are read, chunk by chunk.
+    """
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def blob_name(digest, filename, content=None):
+    """
+    The storage name of the content with the digest. The extension is the
+    one of the image format that Pillow found while validating the upload,
+    else the one of the filename.
+    """
+    image = getattr(content, 'image', None)
+    extension = EXTENSIONS.get(getattr(image, 'format', None))
+    if extension is None:
+        extension = os.path.splitext(filename)[1].lstrip('.').lower() or 'bin'
+
+    return '{directory}/{shard}/{digest}.{extension}'.format(
+        directory=BLOB_DIRECTORY, shard=digest[:2], digest=digest, extension=extension,
+    )
+
+
+def blob_digest(name):
+    """The digest of a blob's name, None for images stored before content addressing"""
+
+    match = _BLOB_NAME.match(name or '')
+    return match['digest'] if match else None
+
+
+def variant_directory(digest):
+    """The directory of the variants of a blob"""
+
+    return '{}/{}'.format(VARIANT_DIRECTORY, digest)
+
+
+def is_blob_file(name):
+    """
+    Whether the name is a blob's or one of its variants', which belong
+    to the blob, and whose content never changes.
+    """
+
+    return bool(_BLOB_NAME.match(name) or _VARIANT_NAME.match(name))
+
+
+class HashingUploadHandlerMixin:
+    """
+    Mixin for the upload handlers, that hashes the chunks the handler keeps,
+    as they stream in, and sets the hex digest on the file, as 'sha256'.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256() #first: the memory handler stops the others by raising
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None: #this handler kept the chunk
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    """Keeps small uploads in memory, and hashes them"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    """Streams large uploads to a temporary file, and hashes them"""
@@ -0,0 +1,76 @@
+"""
+In-process caches shared by the apps of the project.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+
+
+#Django cache backends whose entries only the process that set them sees
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_process_local(alias):
+    """Whether the Django cache 'alias' is not shared by the worker processes"""
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe, in-process cache.
+    Once it holds 'max_size' entries, the least recently used one is dropped.
+    Entries expire 'ttl' seconds after they were set.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value of the key, if it is cached and has not expired"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key) #marks the entry as the most recently used
+            return value
+
+    def set(self, key, value):
+        """Caches the value, dropping the least recently used entry if the cache is full"""
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Drops the key from the cache, if it is cached"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drops every entry"""
+
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
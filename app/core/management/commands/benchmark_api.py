@@ -0,0 +1,207 @@
+"""
+Django custom command that benchmarks the Recipes API in-process.
+Seeds a dataset (see core.seed), then times list, detail, search, create,
+update and image upload requests through the Django test client, with
+token authentication and the full middleware stack. Reports ops/sec,
+latency, SQL queries and response size per request.
+
+Results can be saved, and compared against saved results, to catch
+regressions: the command fails when a scenario runs more queries, or is
+slower than the tolerance allows.
+Everything runs inside a transaction that is rolled back at the end,
+and uploaded images go to a temporary directory, so nothing is left behind.
+The rate limits (core.throttling) are lifted, since every request is
+sent by the same user.
+
+usage: python manage.py benchmark_api --recipes 10000 --repeat 200 --save before.json
+       python manage.py benchmark_api --recipes 10000 --repeat 200 --compare before.json
+"""
+
+from io import BytesIO
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import QueryTimer
+from core.models import Recipe
+from core.seed import WORDS, seed_dataset
+from core.throttling import unlimited_rates
+
+
+SCENARIOS = ['list', 'list_sparse', 'list_not_modified', 'list_anonymous', 'detail', 'search', 'create', 'update', 'image_upload']
+
+
+class Command(BaseCommand):
+    """django command to benchmark the Recipes API"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000, help='Number of recipes to seed.')
+        parser.add_argument('--repeat', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--only', nargs='+', choices=SCENARIOS, default=SCENARIOS, help='Scenarios to run.')
+        parser.add_argument('--save', help='Saves the results to this JSON file.')
+        parser.add_argument('--compare', help='Compares the results with those saved in this JSON file.')
+        parser.add_argument('--tolerance', type=float, default=20, help='Slowdown in %% reported as a regression.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset and requests.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        results = {}
+
+        unthrottled = {**settings.THROTTLING, 'RATES': unlimited_rates()}
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['localhost'], THROTTLING=unthrottled), \
+                transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+            seed_dataset(options['recipes'], seed=options['seed'])
+            self.set_up()
+
+            for scenario in options['only']:
+                results[scenario] = self.run(getattr(self, 'request_' + scenario), options['repeat'])
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        regressions = self.report(results, baseline, options['tolerance'])
+
+        if options['save']:
+            with open(options['save'], 'w') as results_file:
+                json.dump(results, results_file, indent=2)
+
+        if regressions:
+            raise CommandError('{} regression(s): {}'.format(len(regressions), ', '.join(regressions)))
+
+    def set_up(self):
+        """
+        Creates the benchmark user, its clients, and a recipe of theirs to update.
+        """
+        self.user = get_user_model().objects.create_user(email='apibench@example.com', name='api bench', password='bench')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.anonymous_client = APIClient(SERVER_NAME='localhost')
+
+        self.recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        self.list_etag = None
+        self.own_recipe = Recipe.objects.create(
+            user=self.user, recipe_title='Benchmark Recipe', recipe_description='bench', recipe_instructions='bench',
+        )
+
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'orange').save(buffer, format='JPEG')
+        self.image = buffer.getvalue()
+
+    def payload(self):
+        """A recipe with 3 tags and 6 ingredients"""
+
+        return {
+            'recipe_title': ' '.join(self.rng.sample(WORDS, 3)).title(),
+            'recipe_description': ' '.join(self.rng.choices(WORDS, k=30)),
+            'recipe_instructions': ' '.join(self.rng.choices(WORDS, k=60)),
+            'tags': [{'tag_name': word} for word in self.rng.sample(WORDS, 3)],
+            'ingredients': [{'ingredient_name': word} for word in self.rng.sample(WORDS, 6)],
+        }
+
+    def request_list(self):
+        return self.client.get(reverse('recipes-list'))
+
+    def request_list_sparse(self):
+        return self.client.get(reverse('recipes-list'), {'fields': 'id,recipe_title,image'}) #what a mobile list screen needs
+
+    def request_list_not_modified(self):
+        if self.list_etag is None:
+            self.list_etag = self.client.get(reverse('recipes-list'))['ETag']
+        return self.client.get(reverse('recipes-list'), HTTP_IF_NONE_MATCH=self.list_etag) #a client revalidating its copy
+
+    def request_list_anonymous(self):
+        return self.anonymous_client.get(reverse('recipes-list')) #served from the response cache, if there is one
+
+    def request_detail(self):
+        return self.client.get(reverse('recipes-detail', args=[self.rng.choice(self.recipe_ids)]))
+
+    def request_search(self):
+        return self.client.get(reverse('recipes-list'), {'search': ' '.join(self.rng.sample(WORDS, 2))})
+
+    def request_create(self):
+        return self.client.post(reverse('recipes-list'), self.payload(), format='json')
+
+    def request_update(self):
+        payload = self.payload()
+        return self.client.patch(
+            reverse('recipes-detail', args=[self.own_recipe.id]),
+            {'recipe_title': payload['recipe_title'], 'tags': payload['tags']},
+            format='json',
+        )
+
+    def request_image_upload(self):
+        image = SimpleUploadedFile('bench.jpg', self.image, content_type='image/jpeg')
+        return self.client.post(reverse('recipes-img_upload', args=[self.own_recipe.id]), {'image': image}, format='multipart')
+
+    def run(self, request, repeat):
+        """
+        Sends the request 'repeat' times, after a few warm-up requests.
+        Returns ops/sec, median and 95th percentile latency, queries and KB per request.
+        """
+        for i in range(min(5, repeat)):
+            request()
+
+        timer = QueryTimer()
+        timings = []
+        size = 0
+        for i in range(repeat):
+            with connections['default'].execute_wrapper(timer):
+                start = time.perf_counter()
+                response = request()
+                timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise CommandError('{} returned {}: {}'.format(request.__name__, response.status_code, response.content[:200]))
+            size += len(response.content)
+
+        timings.sort()
+        return {
+            'ops_per_sec': repeat / sum(timings),
+            'median_ms': statistics.median(timings) * 1000,
+            'p95_ms': timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000,
+            'queries': timer.count / repeat,
+            'kb': size / repeat / 1024,
+        }
+
+    def report(self, results, baseline, tolerance):
+        """
+        Prints the results, compared with the baseline if any.
+        Returns the scenarios that regressed.
+        """
+        regressions = []
+        self.stdout.write('{:<16} {:>10} {:>10} {:>10} {:>9} {:>8}  {}'.format('scenario', 'ops/s', 'median ms', 'p95 ms', 'queries', 'KB', 'vs baseline'))
+
+        for scenario, result in results.items():
+            comparison = ''
+            before = baseline.get(scenario)
+            if before:
+                change = (result['ops_per_sec'] - before['ops_per_sec']) / before['ops_per_sec'] * 100
+                comparison = '{:+.1f}% ops/s, {:+.2f} queries'.format(change, result['queries'] - before['queries'])
+                if change < -tolerance or result['queries'] > before['queries']:
+                    regressions.append(scenario)
+                    comparison += '  REGRESSION'
+
+            self.stdout.write('{:<16} {:>10.1f} {:>10.2f} {:>10.2f} {:>9.2f} {:>8.1f}  {}'.format(
+                scenario, result['ops_per_sec'], result['median_ms'], result['p95_ms'], result['queries'], result.get('kb', 0), comparison,
+            ))
+
+        return regressions
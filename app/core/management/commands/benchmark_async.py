@@ -0,0 +1,212 @@
+"""
+Django custom command that compares the sync (WSGI) and async (ASGI)
+recipe read endpoints under many concurrent connections.
+
+Every connection is a client that sends its requests one after the other,
+and reads the responses slowly ('--client-delay', as a mobile client would).
+The sync endpoints are served by WSGIHandler on a fixed pool of worker
+threads, like a threaded WSGI server: a worker is held until its slow
+client has read the response. The async endpoints are served by ASGIHandler
+on one event loop, where a slow client only holds a coroutine.
+Reports requests/sec and latency percentiles per number of connections.
+
+The requests run on their own database connections, so the dataset is
+committed, and deleted at the end. Run it against a development database.
+Under ASGI, Django runs the queries of every in-flight request on their own
+thread and connection: keep --connections below the max_connections of PostgreSQL.
+
+usage: python manage.py benchmark_async --connections 8 32 64 --threads 8 --client-delay 20
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import random
+import statistics
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as databases, transaction
+from django.test import RequestFactory, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from core.seed import WORDS, seed_dataset
+
+
+SCENARIOS = ['list', 'search', 'detail']
+
+
+class Command(BaseCommand):
+    """django command to benchmark the sync and async recipe endpoints under concurrency"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=2000, help='Number of recipes to seed.')
+        parser.add_argument('--connections', type=int, nargs='+', default=[8, 32, 64], help='Numbers of concurrent connections.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per connection.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the sync server.')
+        parser.add_argument('--client-delay', type=float, default=20, help='Milliseconds a client takes to read a response.')
+        parser.add_argument('--scenario', choices=SCENARIOS, default='list', help='Requests to send.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset and requests.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        delay = options['client_delay'] / 1000
+        last_user = get_user_model().objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        try:
+            with transaction.atomic():
+                self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+                seed_dataset(options['recipes'], seed=options['seed'])
+                user = get_user_model().objects.create_user(email='asyncbench@example.com', name='async bench')
+                self.token = Token.objects.create(user=user).key
+            recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+
+            self.stdout.write('{:>11} {:>6} {:>10} {:>10} {:>10}'.format('connections', 'server', 'req/s', 'p50 ms', 'p99 ms'))
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for connections in options['connections']:
+                    paths = [
+                        [self.path(options['scenario'], rng, recipe_ids) for i in range(options['requests'])]
+                        for connection in range(connections)
+                    ]
+                    self.report(connections, 'wsgi', self.run_sync(paths, options['threads'], delay))
+                    with self.closing_connections():
+                        self.report(connections, 'asgi', asyncio.run(self.run_async(paths, delay)))
+        finally:
+            get_user_model().objects.filter(pk__gt=last_user).delete() #the seeded users, with their recipes
+
+    def path(self, scenario, rng, recipe_ids):
+        """
+        The path of a request, without the '/api' or '/api/async' prefix.
+        """
+        if scenario == 'detail':
+            return '/recipes/{}/'.format(rng.choice(recipe_ids))
+        if scenario == 'search':
+            return '/recipes/?search={}'.format(rng.choice(WORDS))
+        return '/recipes/'
+
+    @contextmanager
+    def closing_connections(self):
+        """
+        Closes the database connections at the end of every request, as app/asgi.py does:
+        under ASGI, every request runs on a thread of its own, that can not reuse them.
+        """
+        max_ages = {alias: databases.settings[alias]['CONN_MAX_AGE'] for alias in databases}
+        for alias in databases:
+            databases.settings[alias]['CONN_MAX_AGE'] = 0
+        try:
+            yield
+        finally:
+            for alias, max_age in max_ages.items():
+                databases.settings[alias]['CONN_MAX_AGE'] = max_age
+
+    def run_sync(self, paths, threads, delay):
+        """
+        Serves the sync endpoints with 'threads' worker threads.
+        Returns the elapsed time, and the latency and status of every request.
+        """
+        handler = WSGIHandler()
+        factory = RequestFactory()
+
+        def serve(path):
+            #runs on a worker thread, like a request of a threaded WSGI server
+            environ = factory.get('/api' + path, HTTP_AUTHORIZATION='Token ' + self.token).environ
+            statuses = []
+            response = handler(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+            b''.join(response)
+            time.sleep(delay) #the slow client reads the response, while the worker waits
+            response.close() #sends request_finished, which closes the database connection
+            return statuses[0]
+
+        with ThreadPoolExecutor(threads) as workers:
+            def connect(connection_paths):
+                results = []
+                for path in connection_paths:
+                    start = time.perf_counter()
+                    status = workers.submit(serve, path).result()
+                    results.append((time.perf_counter() - start, status))
+                return results
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(len(paths)) as clients:
+                results = [result for connection in clients.map(connect, paths) for result in connection]
+            elapsed = time.perf_counter() - start
+
+            #every worker closes its persistent connections
+            barrier = threading.Barrier(threads)
+            def close():
+                barrier.wait()
+                databases.close_all()
+            for future in [workers.submit(close) for thread in range(threads)]:
+                future.result()
+
+        return elapsed, results
+
+    async def run_async(self, paths, delay):
+        """
+        Serves the async endpoints on the event loop.
+        Returns the elapsed time, and the latency and status of every request.
+        """
+        handler = ASGIHandler()
+
+        async def serve(path):
+            path, _, query = ('/api/async' + path).partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'query_string': query.encode(),
+                'headers': [(b'host', b'testserver'), (b'authorization', ('Token ' + self.token).encode())],
+                'client': ('127.0.0.1', 0),
+                'server': ('testserver', 80),
+            }
+            statuses = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(delay) #the slow client reads the response
+
+            await handler(scope, receive, send)
+            return statuses[0]
+
+        async def connect(connection_paths):
+            results = []
+            for path in connection_paths:
+                start = time.perf_counter()
+                status = await serve(path)
+                results.append((time.perf_counter() - start, status))
+            return results
+
+        start = time.perf_counter()
+        connections = await asyncio.gather(*[connect(connection_paths) for connection_paths in paths])
+        return time.perf_counter() - start, [result for connection in connections for result in connection]
+
+    def report(self, connections, server, run):
+        """Prints the requests/sec and latency percentiles of a run"""
+
+        elapsed, results = run
+        errors = [status for latency, status in results if status != 200]
+        if errors:
+            raise CommandError('{} of the {} requests failed, with {}'.format(len(errors), server, sorted(set(errors))))
+
+        latencies = sorted(latency for latency, status in results)
+        self.stdout.write('{:>11} {:>6} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+            connections,
+            server,
+            len(latencies) / elapsed,
+            statistics.median(latencies) * 1000,
+            latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+        ))
@@ -0,0 +1,97 @@
+"""
+Django custom command that benchmarks the autocomplete of the tags.
+Creates a user with tens of thousands of tags, used as unevenly as on a
+recipe site (a few tags on most recipes), then times the queries of
+UserNamedManager.autocomplete and the '/api/tags/autocomplete/' endpoint,
+for short and long prefixes, a word found after the first one, and one
+that matches nothing. For comparison, times fetching the whole tag list,
+page after page, as the clients did before.
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_autocomplete --entries 50000
+"""
+
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Tag
+from core.seed import FILLER, WORDS
+
+
+QUERIES = ['c', 'ch', 'chick', 'chicken', 'mamble', 'zzz']
+
+
+class Command(BaseCommand):
+    """django command to benchmark the autocomplete of the tags"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=50000, help='Number of tags of the user.')
+        parser.add_argument('--repeat', type=int, default=50, help='Times to run every query.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the tag names.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            self.stdout.write('Creating {} tags...'.format(options['entries']))
+            user = get_user_model().objects.create_user(email='autocompletebench@example.com', name='autocomplete bench')
+            names = set()
+            while len(names) < options['entries']:
+                names.add(' '.join([rng.choice(WORDS + FILLER), rng.choice(FILLER), str(rng.randrange(100))]))
+            #a Zipf-like usage: the most used tag is on 1000 recipes, the 1000th on one
+            Tag.objects.bulk_create(
+                [Tag(user=user, tag_name=name, usage_count=1000 // rank) for rank, name in enumerate(names, start=1)],
+                batch_size=2000,
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_tag')
+
+            client = APIClient()
+            client.force_authenticate(user)
+            url = reverse('tags-autocomplete')
+
+            self.stdout.write('{:<10} {:>8} {:>12} {:>14}'.format('query', 'prefix', 'queries ms', 'endpoint ms'))
+            for query in QUERIES:
+                self.stdout.write('{:<10} {:>8} {:>12.2f} {:>14.2f}'.format(
+                    query,
+                    Tag.objects.filter(user=user, tag_name__istartswith=query).count(),
+                    self.time(lambda: Tag.objects.autocomplete(user, query, 10), options['repeat']),
+                    self.time(lambda: client.get(url, {'q': query}), options['repeat']),
+                ))
+
+            self.stdout.write('whole list, {} requests: {:.2f} ms'.format(
+                -(-options['entries'] // 200),
+                self.time(lambda: self.fetch_all(client), 1),
+            ))
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def fetch_all(self, client):
+        """Fetches every page of the tag list"""
+
+        url = reverse('tags-list') + '?page_size=200'
+        while url:
+            url = client.get(url).data['next']
+
+    def time(self, function, repeat):
+        """
+        Runs the function 'repeat' times, after a warm-up run, and returns the median time in ms.
+        """
+        function()
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
@@ -0,0 +1,112 @@
+"""
+Django custom command that benchmarks the bulk Recipes API.
+Creates and then partially updates the same number of recipes, one per
+request (POST /api/recipes/, PATCH /api/recipes/{id}/) and in bulk
+(POST /api/recipes/ and PATCH /api/recipes/bulk/ with lists of recipes),
+through the full request cycle with token authentication.
+The table is seeded with existing recipes (and analyzed) first,
+so that the query plans are those of a populated database.
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_bulk --recipes 1000 --batch 500 --existing 5000
+"""
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.seed import WORDS, seed_dataset
+
+
+class Command(BaseCommand):
+    """django command to benchmark bulk create/update of recipes"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000, help='Number of recipes to create and update.')
+        parser.add_argument('--batch', type=int, default=500, help='Number of recipes per bulk request.')
+        parser.add_argument('--existing', type=int, default=5000, help='Number of recipes to seed first.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the payloads.')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        count, batch = options['recipes'], options['batch']
+
+        with transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(options['existing']))
+            seed_dataset(options['existing'], seed=options['seed'])
+
+            user = get_user_model().objects.create_user(email='bulkbench@example.com', name='bulk bench', password='bench')
+            client = APIClient(SERVER_NAME='localhost')
+            client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+
+            self.stdout.write('{} recipes, {} per bulk request'.format(count, batch))
+            self.stdout.write('{:<8} {:<8} {:>12} {:>12} {:>12}'.format('action', 'path', 'seconds', 'recipes/s', 'queries'))
+
+            payloads = [self.payload() for i in range(count)]
+            ids = self.run('create', 'single', [lambda p=p: client.post(reverse('recipes-list'), p, format='json') for p in payloads])
+            self.run('update', 'single', [
+                lambda pk=pk: client.patch(reverse('recipes-detail', args=[pk]), self.update_payload(), format='json') for pk in ids
+            ])
+
+            chunks = [payloads[i:i + batch] for i in range(0, count, batch)]
+            ids = self.run('create', 'bulk', [lambda c=c: client.post(reverse('recipes-list'), c, format='json') for c in chunks])
+            chunks = [ids[i:i + batch] for i in range(0, count, batch)]
+            self.run('update', 'bulk', [
+                lambda c=c: client.patch(reverse('recipes-bulk_update'), [dict(self.update_payload(), id=pk) for pk in c], format='json')
+                for c in chunks
+            ])
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def payload(self):
+        """A recipe with 3 tags and 6 ingredients, out of a small vocabulary"""
+
+        return {
+            'recipe_title': ' '.join(random.sample(WORDS, 3)).title(),
+            'recipe_description': ' '.join(random.choices(WORDS, k=30)),
+            'recipe_instructions': ' '.join(random.choices(WORDS, k=60)),
+            'tags': [{'tag_name': word} for word in random.sample(WORDS, 3)],
+            'ingredients': [{'ingredient_name': word} for word in random.sample(WORDS, 6)],
+        }
+
+    def update_payload(self):
+        """A new title and new tags"""
+
+        return {
+            'recipe_title': ' '.join(random.sample(WORDS, 3)).title(),
+            'tags': [{'tag_name': word} for word in random.sample(WORDS, 2)],
+        }
+
+    def run(self, action, path, requests):
+        """
+        Sends the requests, prints the throughput and the queries per recipe.
+        Returns the ids of the recipes in the responses.
+        """
+        ids = []
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            for request in requests:
+                response = request()
+                assert response.status_code in (200, 201), response.data
+                data = response.data if isinstance(response.data, list) else [response.data]
+                ids.extend(recipe['id'] for recipe in data)
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write('{:<8} {:<8} {:>12.2f} {:>12.0f} {:>12.2f}'.format(
+            action, path, elapsed, len(ids) / elapsed, len(queries) / len(ids)
+        ))
+        return ids
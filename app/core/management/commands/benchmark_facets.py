@@ -0,0 +1,100 @@
+"""
+Django custom command that benchmarks the facet counts of the recipe lists.
+Seeds a dataset (see core.seed), then times counting the top tags and
+ingredients (Recipe.facets.count_facets) of search results, over their
+'facet_sample' most recent matches as the list does and over all of them, and
+of every recipe, next to the first page of results, and the cached counts
+of every recipe (Recipe.facets.get_facets), in the local memory cache
+without a response cache (the benchmark is the only process).
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_facets --recipes 1000000
+"""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe
+from core.seed import seed_dataset
+from Recipe.facets import FACETS, count_facets, get_facets
+from Recipe.filters import RecipeSearchFilter
+from Recipe.views import RecipeApiViewset
+
+
+SEARCH_TERMS = ['', 'chicken', 'tomato basil', 'spicy curry', 'nothingmatches']
+SEED_CHUNK = 100000 #recipes seeded at a time, so that a million recipes fit in memory
+
+
+class Command(BaseCommand):
+    """django command to benchmark the facet counts"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000, help='Number of recipes to seed.')
+        parser.add_argument('--repeat', type=int, default=10, help='Times to run every query.')
+        parser.add_argument('--size', type=int, default=10, help='Names per facet.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+            for start in range(0, options['recipes'], SEED_CHUNK):
+                seed_dataset(min(SEED_CHUNK, options['recipes'] - start), seed=options['seed'] + start)
+
+            self.stdout.write('{:<16} {:>8} {:>12} {:>12} {:>12} {:>12}'.format(
+                'search', 'matches', 'page ms', 'facets ms', 'all ms', 'cached ms',
+            ))
+            for term in SEARCH_TERMS:
+                self.benchmark(term, options['repeat'], options['size'])
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def benchmark(self, term, repeat, size):
+        """
+        Times the first page of results, and the facet counts of the
+        'facet_sample' most recent results, and of every result.
+        """
+        sample = RecipeApiViewset.facet_sample
+        request = Request(APIRequestFactory().get('/api/recipes/', {'search': term}))
+        search = RecipeSearchFilter()
+        recipes = search.filter_queryset(request, Recipe.objects.defer('search_vector'), None)
+        ordering = search.get_ordering(request, recipes, None)
+        ordered = recipes.order_by(*([ordering] if isinstance(ordering, str) else ordering))
+
+        cached = ''
+        if not term:
+            response_cache = {**settings.RECIPE_RESPONSE_CACHE, 'CACHE': settings.RECIPE_RESPONSE_CACHE['CACHE'] or 'default'}
+            with override_settings(RECIPE_RESPONSE_CACHE=response_cache):
+                cache.clear()
+                get_facets(recipes, list(FACETS), size)
+                cached = '{:.2f}'.format(self.time(lambda: get_facets(recipes, list(FACETS), size), repeat))
+
+        self.stdout.write('{:<16} {:>8} {:>12.2f} {:>12.2f} {:>12.2f} {:>12}'.format(
+            term or '(every recipe)',
+            recipes.count(),
+            self.time(lambda: list(ordered[:20]), repeat),
+            self.time(lambda: count_facets(recipes.order_by('-id'), list(FACETS), size, sample), repeat),
+            self.time(lambda: count_facets(recipes, list(FACETS), size), repeat),
+            cached,
+        ))
+
+    def time(self, query, repeat):
+        """
+        Runs the query 'repeat' times and returns the median time in ms.
+        """
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
@@ -0,0 +1,78 @@
+"""
+Django custom command that benchmarks the JSON renderer and parser of the API
+(core.renderers.ORJSONRenderer, core.parsers.ORJSONParser) against DRF's
+JSONRenderer and JSONParser, on large lists of serialized recipes.
+The recipes are serialized once, like a list response (and a bulk request)
+of every size, then rendered and parsed by both, whose outputs are checked
+to be the same.
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_json --sizes 20 100 1000 --repeat 50
+"""
+
+from io import BytesIO
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from core.seed import seed_dataset
+from Recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """django command to benchmark the orjson renderer and parser against DRF's"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 1000], help='Numbers of recipes per payload.')
+        parser.add_argument('--repeat', type=int, default=50, help='Renders and parses per payload.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(max(options['sizes'])))
+            seed_dataset(max(options['sizes']))
+
+            recipes = Recipe.objects.defer('search_vector').prefetch_related('tags', 'ingredients').order_by('id')
+            recipes = list(recipes[:max(options['sizes'])])
+
+            self.stdout.write('{:>8} {:>10} {:>14} {:>14} {:>9}'.format('recipes', 'KB', 'operation', 'drf ms', 'speedup'))
+            for size in options['sizes']:
+                data = {'next': None, 'previous': None, 'results': RecipeSerializer(recipes[:size], many=True).data}
+                self.compare(size, data, options['repeat'])
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def time(self, function, repeat):
+        """Returns the fastest run of 'function' in milliseconds, with its result"""
+
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000, result
+
+    def compare(self, size, data, repeat):
+        """Times the rendering and the parsing of 'data' by both, and checks their outputs"""
+
+        drf_render, content = self.time(lambda: JSONRenderer().render(data), repeat)
+        orjson_render, orjson_content = self.time(lambda: ORJSONRenderer().render(data), repeat)
+        if orjson_content != content:
+            raise CommandError('The orjson renderer does not render {} recipes as DRF does'.format(size))
+
+        drf_parse, parsed = self.time(lambda: JSONParser().parse(BytesIO(content)), repeat)
+        orjson_parse, orjson_parsed = self.time(lambda: ORJSONParser().parse(BytesIO(content)), repeat)
+        if orjson_parsed != parsed:
+            raise CommandError('The orjson parser does not parse {} recipes as DRF does'.format(size))
+
+        for operation, before, after in [('render', drf_render, orjson_render), ('parse', drf_parse, orjson_parse)]:
+            self.stdout.write('{:>8} {:>10.1f} {:>14} {:>14.3f} {:>8.1f}x'.format(
+                size, len(content) / 1024, operation, before, before / after,
+            ))
@@ -0,0 +1,171 @@
+"""
+Django custom command that measures the latency of the recipe endpoints
+during a login storm, with the passwords hashed on the request threads
+('inline') and on the bounded hashing pool of User.hashing ('pool').
+
+The requests are served by WSGIHandler on a fixed pool of worker threads,
+like a threaded WSGI server. Login clients keep logging in, while reader
+clients fetch recipes one after the other. Logins refused by a full
+hashing pool (429) are retried after '--retry-delay'. Reports the latency
+of the recipe reads, without logins first, and the logins served.
+The rate limits (core.throttling) are lifted, since every client logs
+in with the same email: logins they still refuse are reported apart.
+
+The requests run on their own database connections, so the dataset is
+committed, and deleted at the end. Run it against a development database.
+
+usage: python manage.py benchmark_login --threads 8 --logins 16 --readers 4 --hashing-workers 1
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as databases, transaction
+from django.test import RequestFactory, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from core.seed import seed_dataset
+from core.throttling import unlimited_rates
+from User.hashing import BUSY_DETAIL
+
+
+class Command(BaseCommand):
+    """django command to benchmark the recipe endpoints during a login storm"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500, help='Number of recipes to seed.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the server.')
+        parser.add_argument('--logins', type=int, default=16, help='Concurrent login clients.')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent recipe reading clients.')
+        parser.add_argument('--requests', type=int, default=50, help='Recipe reads per reader.')
+        parser.add_argument('--hashing-workers', type=int, default=settings.LOGIN_HASHING['WORKERS'] or 1, help='Threads of the hashing pool.')
+        parser.add_argument('--max-waiting', type=int, default=settings.LOGIN_HASHING['MAX_WAITING'], help='Logins queued by the hashing pool.')
+        parser.add_argument('--retry-delay', type=float, default=100, help='Milliseconds a client waits before retrying a refused login.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset and requests.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        last_user = get_user_model().objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        try:
+            with transaction.atomic():
+                self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+                seed_dataset(options['recipes'], seed=options['seed'])
+                user = get_user_model().objects.create_user(email='loginbench@example.com', name='login bench', password='loginbench')
+                self.token = Token.objects.create(user=user).key
+            recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+            paths = [
+                ['/api/recipes/{}/'.format(rng.choice(recipe_ids)) for i in range(options['requests'])]
+                for reader in range(options['readers'])
+            ]
+
+            setups = [
+                ('no logins', 0, {'WORKERS': 0, 'MAX_WAITING': 0}),
+                ('inline', options['logins'], {'WORKERS': 0, 'MAX_WAITING': 0}),
+                ('pool', options['logins'], {'WORKERS': options['hashing_workers'], 'MAX_WAITING': options['max_waiting']}),
+            ]
+            self.stdout.write('{:<10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+                'hashing', 'reads/s', 'p50 ms', 'p99 ms', 'logins/s', 'refused', 'throttled',
+            ))
+            request_logger = logging.getLogger('django.request')
+            level = request_logger.level
+            request_logger.setLevel(logging.ERROR) #the refused logins are expected
+            try:
+                unthrottled = {**settings.THROTTLING, 'RATES': unlimited_rates()}
+                for name, logins, hashing in setups:
+                    with override_settings(ALLOWED_HOSTS=['testserver'], LOGIN_HASHING=hashing, THROTTLING=unthrottled):
+                        self.report(name, self.run(paths, logins, options['threads'], options['retry_delay'] / 1000))
+            finally:
+                request_logger.setLevel(level)
+        finally:
+            get_user_model().objects.filter(pk__gt=last_user).delete() #the seeded users, with their recipes
+
+    def run(self, paths, logins, threads, retry_delay):
+        """
+        Serves the reads of 'paths' (one list per reader) and 'logins' login
+        clients, until the readers are done, with 'threads' worker threads.
+        Returns the elapsed time, the latency and status of every read,
+        and the outcome of every login: its status, or 'refused' by a full
+        hashing pool, or 'throttled' by a rate limit.
+        """
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        done = threading.Event()
+
+        def serve(request):
+            #runs on a worker thread, like a request of a threaded WSGI server
+            statuses = []
+            response = handler(request.environ, lambda status, headers: statuses.append(int(status.split()[0])))
+            content = b''.join(response)
+            response.close() #sends request_finished
+            return statuses[0], content
+
+        with ThreadPoolExecutor(threads) as workers:
+            def read(reader_paths):
+                results = []
+                for path in reader_paths:
+                    start = time.perf_counter()
+                    status, content = workers.submit(serve, factory.get(path, HTTP_AUTHORIZATION='Token ' + self.token)).result()
+                    results.append((time.perf_counter() - start, status))
+                return results
+
+            def log_in():
+                outcomes = []
+                while not done.is_set():
+                    request = factory.post('/api/login/', {'email': 'loginbench@example.com', 'password': 'loginbench'})
+                    status, content = workers.submit(serve, request).result()
+                    if status == 429:
+                        outcomes.append('refused' if json.loads(content)['detail'].startswith(BUSY_DETAIL) else 'throttled')
+                        time.sleep(retry_delay)
+                    else:
+                        outcomes.append(status)
+                return outcomes
+
+            with ThreadPoolExecutor(len(paths) + logins) as clients:
+                storm = [clients.submit(log_in) for client in range(logins)]
+                time.sleep(0.5 if logins else 0) #lets the storm start
+                start = time.perf_counter()
+                reads = [result for reader in clients.map(read, paths) for result in reader]
+                elapsed = time.perf_counter() - start
+                done.set()
+                login_statuses = [status for client in storm for status in client.result()]
+
+            #every worker closes its persistent connections
+            barrier = threading.Barrier(threads)
+            def close():
+                barrier.wait()
+                databases.close_all()
+            for future in [workers.submit(close) for thread in range(threads)]:
+                future.result()
+
+        return elapsed, reads, login_statuses
+
+    def report(self, name, run):
+        """Prints the reads/sec, their latency percentiles, the logins served, and those refused"""
+
+        elapsed, reads, logins = run
+        errors = {status for latency, status in reads if status != 200} | {status for status in logins if status not in (200, 'refused', 'throttled')}
+        if errors:
+            raise CommandError('Requests failed with {}'.format(sorted(errors)))
+
+        latencies = sorted(latency for latency, status in reads)
+        self.stdout.write('{:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10} {:>10}'.format(
+            name,
+            len(latencies) / elapsed,
+            statistics.median(latencies) * 1000,
+            latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+            logins.count(200) / elapsed,
+            logins.count('refused'),
+            logins.count('throttled'),
+        ))
@@ -0,0 +1,118 @@
+"""
+Django custom command that benchmarks the overhead of the request metrics
+(core.middleware.MetricsMiddleware). Times the same API requests with and
+without the middleware, interleaved, through the full request cycle,
+then the cost of the middleware, of recording a request and of wrapping
+a query on their own.
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_metrics --requests 500
+"""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.metrics import MetricsRegistry
+from core.middleware import MetricsMiddleware, QueryTimer
+from core.models import Recipe
+from core.seed import seed_dataset
+
+
+METRICS_MIDDLEWARE = 'core.middleware.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    """django command to benchmark the overhead of the request metrics"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and setup.')
+        parser.add_argument('--recipes', type=int, default=2000, help='Number of recipes to seed.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+            seed_dataset(options['recipes'])
+
+            user = get_user_model().objects.create_user(email='metricsbench@example.com', name='metrics bench', password='bench')
+            token = Token.objects.create(user=user).key
+            with_metrics = self.client(token, settings.MIDDLEWARE)
+            without_metrics = self.client(token, [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE])
+
+            urls = [
+                reverse('recipes-list'),
+                reverse('recipes-detail', args=[Recipe.objects.values_list('pk', flat=True).first()]),
+            ]
+            self.stdout.write('{:<24} {:>14} {:>14} {:>10}'.format('endpoint (median ms)', 'no metrics', 'metrics', 'overhead'))
+            for url in urls:
+                timings = {with_metrics: [], without_metrics: []}
+                for i in range(options['requests']):
+                    clients = [with_metrics, without_metrics] if i % 2 else [without_metrics, with_metrics]
+                    for client in clients: #interleaved, in turns, so that drift and warm caches affect both the same
+                        start = time.perf_counter()
+                        client.get(url)
+                        timings[client].append((time.perf_counter() - start) * 1000)
+
+                before, after = statistics.median(timings[without_metrics]), statistics.median(timings[with_metrics])
+                self.stdout.write('{:<24} {:>14.3f} {:>14.3f} {:>9.1f}%'.format(url, before, after, (after - before) / before * 100))
+
+            self.stdout.write('middleware alone: {:.2f} us'.format(self.time_middleware()))
+            self.stdout.write('recording a request: {:.2f} us'.format(self.time_recording()))
+            self.stdout.write('wrapping a query: {:.2f} us'.format(self.time_query_wrapper()))
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def client(self, token, middleware):
+        """
+        A client whose handler loads 'middleware'. The middleware chain
+        is built on the first request, and kept for the next ones.
+        """
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        with override_settings(MIDDLEWARE=middleware):
+            client.get(reverse('recipes-list'))
+        return client
+
+    def time_middleware(self, repeat=20000):
+        """Returns the time the middleware adds to a request that runs no query, in microseconds"""
+
+        request = RequestFactory().get('/')
+        response = HttpResponse(b'x' * 4000)
+        middleware = MetricsMiddleware(lambda request: response)
+
+        start = time.perf_counter()
+        for i in range(repeat):
+            middleware(request)
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    def time_recording(self, repeat=100000):
+        """Returns the time to record a request in the registry, in microseconds"""
+
+        metrics = MetricsRegistry()
+        start = time.perf_counter()
+        for i in range(repeat):
+            metrics.observe_request('recipes-list', 'GET', 200, 0.012, 3, 0.002, 4000)
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    def time_query_wrapper(self, repeat=100000):
+        """Returns the time a QueryTimer adds to a query, in microseconds (a no-op query, so only the wrapper is timed)"""
+
+        def execute(sql, params, many, context):
+            return None
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        for i in range(repeat):
+            timer(execute, 'SELECT 1', None, False, {})
+        return (time.perf_counter() - start) / repeat * 1e6
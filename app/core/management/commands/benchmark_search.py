@@ -0,0 +1,88 @@
+"""
+Django custom command that benchmarks recipe search.
+Seeds a dataset (see core.seed), then times the old SearchFilter (icontains over
+title, description, tags and ingredients) against the full-text search
+of Recipe.filters.RecipeSearchFilter, on the first page of results.
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+usage: python manage.py benchmark_search --recipes 20000
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe
+from core.seed import seed_dataset
+from Recipe.filters import RecipeSearchFilter
+
+
+SEARCH_TERMS = ['chicken', 'tomato basil', 'spicy curry', 'vegan cake', 'nothingmatches']
+
+
+class LegacySearchView:
+    """The search fields of the recipe viewsets, before full-text search"""
+    search_fields = [
+        'recipe_title',
+        'recipe_description',
+        'tags__tag_name',
+        'ingredients__ingredient_name'
+        ]
+    ordering = 'id'
+
+
+class Command(BaseCommand):
+    """django command to benchmark recipe search"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000, help='Number of recipes to seed.')
+        parser.add_argument('--repeat', type=int, default=20, help='Times to run every search.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+            seed_dataset(options['recipes'], seed=options['seed'])
+
+            self.stdout.write('{:<16} {:>8} {:>14} {:>14}'.format('search', 'matches', 'SearchFilter', 'full-text'))
+            for term in SEARCH_TERMS:
+                self.benchmark(term, options['repeat'])
+
+            transaction.set_rollback(True) #leaves the database as it was
+
+    def benchmark(self, term, repeat):
+        """
+        Times the first page of results of both search implementations.
+        """
+        request = Request(APIRequestFactory().get('/api/recipes/', {'search': term}))
+        view = LegacySearchView()
+
+        legacy = SearchFilter().filter_queryset(request, Recipe.objects.all(), view).order_by('id')
+        full_text = RecipeSearchFilter().filter_queryset(request, Recipe.objects.defer('search_vector'), view)
+        full_text = full_text.order_by(*RecipeSearchFilter().get_ordering(request, full_text, view))
+
+        self.stdout.write('{:<16} {:>8} {:>11.2f} ms {:>11.2f} ms'.format(
+            term,
+            full_text.count(),
+            self.time(lambda: list(legacy[:21]), repeat),
+            self.time(lambda: list(full_text[:21]), repeat),
+        ))
+
+    def time(self, query, repeat):
+        """
+        Runs the query 'repeat' times and returns the median time in ms.
+        """
+        timings = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings)
@@ -0,0 +1,97 @@
+"""
+Django custom command that benchmarks a rate limit check (core.throttling),
+in THROTTLING['CACHE']: the time of a check for a search of an authenticated
+user (user, token and address) and of an anonymous one (address only),
+with more and more requests already counted in the window, next to DRF's
+UserRateThrottle, which keeps the timestamp of every request.
+Runs no query: the user and its token are not saved.
+
+usage: python manage.py benchmark_throttling --checks 5000
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.throttling import UserRateThrottle
+
+from core.throttling import KEY_PREFIX, UNLIMITED_RATE, SearchRateThrottle
+
+
+class HistoryRateThrottle(UserRateThrottle):
+    """DRF's throttle, with a budget that is never reached"""
+    rate = UNLIMITED_RATE
+
+
+class Command(BaseCommand):
+    """django command to benchmark the rate limit checks"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=5000, help='Checks timed per setup.')
+
+    def handle(self, *args, **options):
+        cache_alias = settings.THROTTLING['CACHE']
+        cache = caches[cache_alias]
+        self.stdout.write('Cache {!r}: {}'.format(cache_alias, settings.CACHES[cache_alias]['BACKEND']))
+
+        user = get_user_model()(pk=10 ** 9, email='throttlebench@example.com', name='throttle bench')
+        token = Token(key='b' * 40, user=user)
+        factory = RequestFactory()
+        authenticated = Request(factory.get('/api/recipes/', {'search': 'pasta'}))
+        authenticated.user, authenticated.auth = user, token
+        anonymous = Request(factory.get('/api/recipes/', {'search': 'pasta'}))
+        anonymous.user, anonymous.auth = None, None
+
+        rates = {'search': {'user': UNLIMITED_RATE, 'token': UNLIMITED_RATE, 'ip': UNLIMITED_RATE}}
+        self.stdout.write('{:<20} {:>16} {:>16} {:>16}'.format('counted (us/check)', 'authenticated', 'anonymous', 'DRF history'))
+        with override_settings(THROTTLING={**settings.THROTTLING, 'RATES': rates}):
+            for counted in [0, 100, 10000, 100000]:
+                cache.clear()
+                self.count(cache, counted)
+                row = [
+                    self.time_checks(SearchRateThrottle(), authenticated, options['checks']),
+                    self.time_checks(SearchRateThrottle(), anonymous, options['checks']),
+                    self.time_history(caches['default'], authenticated, counted, options['checks']),
+                ]
+                self.stdout.write('{:<20} {:>16.2f} {:>16.2f} {:>16.2f}'.format(counted, *row))
+        cache.clear()
+
+    def count(self, cache, counted):
+        """Sets the counters of the current and previous windows, as if 'counted' requests were made in each"""
+
+        window = int(time.time() // 60)
+        for kind, identity in [('user', str(10 ** 9)), ('ip', '127.0.0.1')]:
+            for index in (window - 1, window):
+                cache.set('{}:search:{}:{}:{}'.format(KEY_PREFIX, kind, identity, index), counted, 120)
+
+    def time_checks(self, throttle, request, checks):
+        """Returns the time of a check, in microseconds"""
+
+        start = time.perf_counter()
+        for i in range(checks):
+            throttle.allow_request(request, None)
+        return (time.perf_counter() - start) / checks * 1e6
+
+    def time_history(self, cache, request, counted, checks):
+        """
+        Returns the time of a check of DRF's throttle, in microseconds, with the
+        timestamps of 'counted' requests in its history (fewer checks, it is slower)
+        """
+        throttle = HistoryRateThrottle()
+        checks = max(checks // 50, 20)
+        key = throttle.get_cache_key(request, None)
+        now = time.time()
+
+        total = 0
+        for i in range(checks):
+            cache.set(key, [now] * counted, 120) #the history stays the same size
+            start = time.perf_counter()
+            throttle.allow_request(request, None)
+            total += time.perf_counter() - start
+        return total / checks * 1e6
@@ -0,0 +1,36 @@
+"""
+Django custom command that processes recipe images
+(resized variants, dimensions and placeholder), see Recipe.images.
+By default only images that were never processed are,
+e.g. the ones uploaded before the image pipeline existed.
+
+usage: python manage.py process_recipe_images [--all]
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from Recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """django command to process recipe images"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Process every image again.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            recipes = recipes.filter(image_thumbnail__isnull=True)
+
+        recipe_ids = list(recipes.order_by('id').values_list('id', flat=True))
+        self.stdout.write('Processing {} recipe images...'.format(len(recipe_ids)))
+
+        for recipe_id in recipe_ids:
+            try:
+                process_recipe_image(recipe_id)
+            except Exception as error:
+                self.stdout.write(self.style.ERROR('Recipe {}: {}'.format(recipe_id, error)))
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,44 @@
+"""
+Django custom command that seeds the database with a synthetic dataset
+of users, tags, ingredients and recipes (see core.seed), for benchmarks
+and for trying the API at a realistic scale.
+
+usage: python manage.py seed_data --recipes 100000 --users 2000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.seed import seed_dataset
+
+
+class Command(BaseCommand):
+    """django command to seed the database with a synthetic dataset"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000, help='Number of recipes.')
+        parser.add_argument('--users', type=int, default=None, help='Number of users (default: one per 50 recipes).')
+        parser.add_argument('--tags', type=int, default=20, help='Number of tags of every user.')
+        parser.add_argument('--ingredients', type=int, default=40, help='Number of ingredients of every user.')
+        parser.add_argument('--password', default=None, help='Password of the seeded users (default: unusable).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Seeding {} recipes...'.format(options['recipes']))
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            counts = seed_dataset(
+                options['recipes'],
+                user_count=options['users'],
+                tags_per_user=options['tags'],
+                ingredients_per_user=options['ingredients'],
+                password=options['password'],
+                seed=options['seed'],
+            )
+
+        for name, count in counts.items():
+            self.stdout.write('{:<20} {:>10}'.format(name, count))
+        self.stdout.write(self.style.SUCCESS('Seeded in {:.1f} s'.format(time.perf_counter() - start)))
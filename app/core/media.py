@@ -0,0 +1,167 @@
+"""
+Serving of the media files: the recipe images and their variants.
+
+The view only checks the request: the file must be a recipe image (they
+are as public as the recipes), under MEDIA_ROOT. Then, with
+settings.MEDIA_SERVING['SENDFILE'] set, it hands the transfer to the
+front-end server, without opening the file:
+- 'x-accel-redirect' (nginx) redirects internally to
+  MEDIA_SERVING['INTERNAL_URL'] + the file name, an 'internal' location
+  aliased to MEDIA_ROOT,
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd) sends the file's path.
+The server then sends the bytes, and handles the Range and conditional
+requests itself, while the worker is free for the next request.
+
+Without a front-end server, the file is streamed with a FileResponse:
+with an ETag and Last-Modified (and 304 responses), and single byte
+ranges ('206 Partial Content', for resumed downloads and seeking).
+Whole files keep the WSGI server's sendfile() path (wsgi.file_wrapper).
+
+Blob files never change, so they are cached for a year, without
+revalidation (see core.blobs).
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+
+from .blobs import IMMUTABLE_CACHE_CONTROL, is_blob_file
+
+
+CACHE_CONTROL = 'public, max-age=3600' #images stored before content addressing
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested range starts after the end of the file"""
+
+
+def parse_range(header, size):
+    """
+    The (start, end) bytes, both included, of the 'Range' header, for a file
+    of 'size' bytes. None if the whole file should be sent: no header, or one
+    that is not a single byte range (which the server may ignore).
+    Raises RangeNotSatisfiable for a range outside of the file.
+    """
+    match = _RANGE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first: #the last 'last' bytes
+        if int(last) == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class FileRange:
+    """
+    File-like object that reads 'length' bytes of the file, from its position.
+    It is no real file, so the WSGI server reads it rather than sendfile() the
+    whole file.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class MediaView(View):
+    """
+    Serves the recipe images and their variants, see core.media.
+    """
+    http_method_names = ['get', 'head']
+
+    def has_permission(self, request, name):
+        """Recipe images are public, like the recipes. Other media files are not served."""
+
+        return name.startswith('images/')
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation: #the path leaves MEDIA_ROOT
+            raise Http404()
+        name = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+        if not self.has_permission(request, name):
+            raise Http404()
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        sendfile = settings.MEDIA_SERVING['SENDFILE']
+        if sendfile:
+            response = HttpResponse(content_type=content_type)
+            if sendfile == 'x-accel-redirect':
+                response['X-Accel-Redirect'] = quote(settings.MEDIA_SERVING['INTERNAL_URL'] + name)
+            else:
+                response['X-Sendfile'] = full_path
+            return self.set_cache_headers(response, name)
+
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            raise Http404()
+        if not os.path.isfile(full_path):
+            raise Http404()
+
+        etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+        last_modified = http_date(stat.st_mtime)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if not_modified is not None:
+            return self.set_validators(self.set_cache_headers(not_modified, name), etag, last_modified)
+
+        byte_range = None
+        if request.META.get('HTTP_IF_RANGE', etag) in (etag, last_modified): #else the file changed: send it whole
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{}'.format(stat.st_size)
+                return response
+
+        file = open(full_path, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+        else:
+            start, end = byte_range
+            file.seek(start)
+            response = FileResponse(FileRange(file, end - start + 1), content_type=content_type, status=206)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, stat.st_size)
+
+        response['Accept-Ranges'] = 'bytes'
+        return self.set_validators(self.set_cache_headers(response, name), etag, last_modified)
+
+    def set_cache_headers(self, response, name):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if is_blob_file(name) else CACHE_CONTROL
+        return response
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        return response
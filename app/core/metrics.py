@@ -0,0 +1,427 @@
+"""
+Per-view request metrics, exposed in the Prometheus text format.
+
+core.middleware.MetricsMiddleware records every request under the name
+of the view it resolved to (e.g. 'recipes-list', 'recipes-img_upload')
+and its method: latency, number of SQL queries, time spent in them,
+and response size. Metrics are kept in memory, per process.
+Recording a request takes a lock and a few additions, so it can stay
+on in production (see 'python manage.py benchmark_metrics').
+
+With several worker processes, a scrape reaches one of them. Like the
+multiprocess mode of the Prometheus client, every process can write
+its metrics to a directory shared by the workers
+(settings.METRICS['MULTIPROCESS_DIR']), at most 'FLUSH_INTERVAL'
+seconds after they change, and /api/metrics/ serves the sum of all
+of them. Without that directory, every series is labelled with the
+pid of the process that serves it, so that the workers' series stay
+apart instead of jumping between them.
+
+The bounded thread pools (see core.pools) record their queueing too:
+tasks running and waiting, rejected tasks, and time waited and run.
+"""
+
+from bisect import bisect_left
+from functools import partial
+from glob import glob
+import json
+import os
+import threading
+
+from django.conf import settings
+
+
+#upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) #seconds
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304) #bytes
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5) #seconds
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their sum.
+    Not thread-safe on its own, the registry holds the lock.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) #the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total):
+        """Adds the bucket counts and sum of another process' histogram"""
+
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += total
+        self.count += sum(counts)
+
+    def cumulative_counts(self):
+        """
+        Yields (upper bound, number of values up to it), as Prometheus expects.
+        """
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    """The metrics of a view and method"""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.query_time = 0
+        self.statuses = {}
+
+
+class PoolMetrics:
+    """The queueing metrics of a bounded pool"""
+
+    def __init__(self):
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.run_time = Histogram(LATENCY_BUCKETS)
+
+
+def _labels(**labels):
+    """
+    Helper function.
+    Formats Prometheus labels, escaped.
+    """
+    return ','.join(
+        '{name}="{value}"'.format(
+            name=name,
+            value=str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'),
+        )
+        for name, value in labels.items()
+    )
+
+
+def _is_running(pid):
+    """
+    Helper function.
+    Whether the process is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: #running, as another user
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, in-process registry of the request metrics of every view.
+    With a 'directory', it writes them there and renders the metrics of
+    every process of the directory. With 'label_pid', the rendered series
+    are labelled with the pid of the process.
+    """
+
+    def __init__(self, directory=None, flush_interval=1, label_pid=False):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.label_pid = label_pid
+        self._views = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+
+    def _changed(self):
+        """Schedules the writing of the metrics to the directory. Called with the lock held"""
+
+        if self.directory and self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def after_fork(self):
+        """
+        Forgets the metrics of the parent process in a forked worker,
+        which writes a file of its own.
+        """
+        self._views = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+
+    def observe_request(self, view, method, status, latency, queries, query_time, response_size=None):
+        """
+        Records a request. 'response_size' is None when it is not known (streamed responses).
+        """
+        with self._lock:
+            metrics = self._views.get((view, method))
+            if metrics is None:
+                metrics = self._views[(view, method)] = ViewMetrics()
+
+            metrics.latency.observe(latency)
+            metrics.queries.observe(queries)
+            metrics.query_time += query_time
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if response_size is not None:
+                metrics.response_size.observe(response_size)
+            self._changed()
+
+    def _pool(self, pool):
+        """The metrics of a pool. Called with the lock held"""
+
+        metrics = self._pools.get(pool)
+        if metrics is None:
+            metrics = self._pools[pool] = PoolMetrics()
+        return metrics
+
+    def pool_task_queued(self, pool):
+        """Records a task submitted to a pool, waiting for a thread"""
+
+        with self._lock:
+            self._pool(pool).waiting += 1
+            self._changed()
+
+    def pool_task_started(self, pool, wait_time):
+        """Records a task that got a thread, after waiting 'wait_time' seconds"""
+
+        with self._lock:
+            metrics = self._pool(pool)
+            metrics.waiting -= 1
+            metrics.running += 1
+            metrics.wait_time.observe(wait_time)
+            self._changed()
+
+    def pool_task_finished(self, pool, run_time):
+        """Records a task that ran for 'run_time' seconds"""
+
+        with self._lock:
+            metrics = self._pool(pool)
+            metrics.running -= 1
+            metrics.run_time.observe(run_time)
+            self._changed()
+
+    def pool_task_rejected(self, pool):
+        """Records a task refused by a full pool"""
+
+        with self._lock:
+            self._pool(pool).rejected += 1
+            self._changed()
+
+    def clear(self):
+        """
+        Drops every recorded metric. The tasks running and waiting
+        in the pools are kept, since they are still there.
+        """
+        with self._lock:
+            self._views.clear()
+            for pool, metrics in self._pools.items():
+                self._pools[pool] = PoolMetrics()
+                self._pools[pool].running, self._pools[pool].waiting = metrics.running, metrics.waiting
+            self._changed()
+
+    def snapshot(self):
+        """The metrics of the registry, as JSON-serializable data"""
+
+        def histogram(histogram):
+            return [histogram.counts, histogram.sum]
+
+        with self._lock:
+            return {
+                'views': [
+                    [view, method, {
+                        'latency': histogram(metrics.latency),
+                        'queries': histogram(metrics.queries),
+                        'response_size': histogram(metrics.response_size),
+                        'query_time': metrics.query_time,
+                        'statuses': list(metrics.statuses.items()),
+                    }]
+                    for (view, method), metrics in self._views.items()
+                ],
+                'pools': [
+                    [pool, {
+                        'running': metrics.running,
+                        'waiting': metrics.waiting,
+                        'rejected': metrics.rejected,
+                        'wait_time': histogram(metrics.wait_time),
+                        'run_time': histogram(metrics.run_time),
+                    }]
+                    for pool, metrics in self._pools.items()
+                ],
+            }
+
+    def merge(self, snapshot, running=True):
+        """
+        Adds the snapshot() of another registry. The tasks running and waiting
+        in the pools of a process that is not 'running' anymore are left out.
+        """
+        with self._lock:
+            for view, method, data in snapshot['views']:
+                metrics = self._views.get((view, method))
+                if metrics is None:
+                    metrics = self._views[(view, method)] = ViewMetrics()
+
+                metrics.latency.merge(*data['latency'])
+                metrics.queries.merge(*data['queries'])
+                metrics.response_size.merge(*data['response_size'])
+                metrics.query_time += data['query_time']
+                for status, count in data['statuses']:
+                    metrics.statuses[status] = metrics.statuses.get(status, 0) + count
+
+            for pool, data in snapshot['pools']:
+                metrics = self._pool(pool)
+                if running:
+                    metrics.running += data['running']
+                    metrics.waiting += data['waiting']
+                metrics.rejected += data['rejected']
+                metrics.wait_time.merge(*data['wait_time'])
+                metrics.run_time.merge(*data['run_time'])
+
+    def flush(self):
+        """Writes the metrics of this process to the directory"""
+
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+        with self._flush_lock: #the latest snapshot is written last
+            path = os.path.join(self.directory, 'metrics_{}.json'.format(os.getpid()))
+            temporary = path + '.tmp'
+            with open(temporary, 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temporary, path) #scrapes never read a partial file
+
+    def collect(self):
+        """
+        Returns a registry with the sum of the metrics of every process of the
+        directory. Those of the processes that exited are kept, as counters
+        are, except for their running and waiting tasks.
+        """
+        collected = MetricsRegistry()
+        for path in glob(os.path.join(self.directory, 'metrics_*.json')):
+            pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except FileNotFoundError: #removed meanwhile
+                continue
+            collected.merge(snapshot, running=_is_running(pid))
+
+        return collected
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        if self.directory:
+            self.flush()
+            return self.collect().render()
+
+        labels = partial(_labels, pid=os.getpid()) if self.label_pid else _labels
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            lines += [
+                '# HELP http_requests_total Requests, per view, method and status code.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (view, method), metrics in views:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append('http_requests_total{{{labels}}} {count}'.format(
+                        labels=labels(view=view, method=method, status=status), count=count,
+                    ))
+
+            histograms = [
+                ('http_request_duration_seconds', 'latency', 'Request latency in seconds.'),
+                ('db_queries_per_request', 'queries', 'SQL queries run by a request.'),
+                ('http_response_size_bytes', 'response_size', 'Response body size in bytes (not streamed responses).'),
+            ]
+            for name, attr, description in histograms:
+                lines += [
+                    '# HELP {name} {description}'.format(name=name, description=description),
+                    '# TYPE {name} histogram'.format(name=name),
+                ]
+                for (view, method), metrics in views:
+                    histogram = getattr(metrics, attr)
+                    for bound, count in histogram.cumulative_counts():
+                        lines.append('{name}_bucket{{{labels}}} {count}'.format(
+                            name=name, labels=labels(view=view, method=method, le=bound), count=count,
+                        ))
+                    series = labels(view=view, method=method)
+                    lines.append('{name}_sum{{{labels}}} {value}'.format(name=name, labels=series, value=histogram.sum))
+                    lines.append('{name}_count{{{labels}}} {value}'.format(name=name, labels=series, value=histogram.count))
+
+            lines += [
+                '# HELP db_query_duration_seconds_total Time spent running SQL queries, in seconds.',
+                '# TYPE db_query_duration_seconds_total counter',
+            ]
+            for (view, method), metrics in views:
+                lines.append('db_query_duration_seconds_total{{{labels}}} {value}'.format(
+                    labels=labels(view=view, method=method), value=metrics.query_time,
+                ))
+
+            lines += self._render_pools(labels)
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_pools(self, labels):
+        """The lines of the pool metrics. Called with the lock held"""
+
+        pools = sorted(self._pools.items())
+        if not pools:
+            return []
+        lines = []
+
+        values = [
+            ('pool_tasks_running', 'gauge', 'running', 'Tasks running on a thread of the pool.'),
+            ('pool_tasks_waiting', 'gauge', 'waiting', 'Tasks waiting for a thread of the pool.'),
+            ('pool_tasks_rejected_total', 'counter', 'rejected', 'Tasks refused because the pool was full.'),
+        ]
+        for name, metric_type, attr, description in values:
+            lines += [
+                '# HELP {name} {description}'.format(name=name, description=description),
+                '# TYPE {name} {metric_type}'.format(name=name, metric_type=metric_type),
+            ]
+            for pool, metrics in pools:
+                lines.append('{name}{{{labels}}} {value}'.format(name=name, labels=labels(pool=pool), value=getattr(metrics, attr)))
+
+        histograms = [
+            ('pool_task_wait_seconds', 'wait_time', 'Time tasks waited for a thread of the pool, in seconds.'),
+            ('pool_task_duration_seconds', 'run_time', 'Time tasks ran on a thread of the pool, in seconds.'),
+        ]
+        for name, attr, description in histograms:
+            lines += [
+                '# HELP {name} {description}'.format(name=name, description=description),
+                '# TYPE {name} histogram'.format(name=name),
+            ]
+            for pool, metrics in pools:
+                histogram = getattr(metrics, attr)
+                for bound, count in histogram.cumulative_counts():
+                    lines.append('{name}_bucket{{{labels}}} {count}'.format(name=name, labels=labels(pool=pool, le=bound), count=count))
+                lines.append('{name}_sum{{{labels}}} {value}'.format(name=name, labels=labels(pool=pool), value=histogram.sum))
+                lines.append('{name}_count{{{labels}}} {value}'.format(name=name, labels=labels(pool=pool), value=histogram.count))
+
+        return lines
+
+
+registry = MetricsRegistry(
+    directory=settings.METRICS['MULTIPROCESS_DIR'],
+    flush_interval=settings.METRICS['FLUSH_INTERVAL'],
+    label_pid=not settings.METRICS['MULTIPROCESS_DIR'],
+)
+os.register_at_fork(after_in_child=registry.after_fork)
@@ -0,0 +1,155 @@
+"""
+Middleware shared by the apps of the project.
+"""
+
+import asyncio
+from contextlib import ExitStack
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import UNRESOLVED_VIEW, registry
+from .staticfiles import StaticFiles
+
+
+class QueryTimer:
+    """
+    Database execute wrapper that counts the queries it runs, and times them.
+    See https://docs.djangoproject.com/en/4.1/topics/db/instrumentation/
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, SQL queries and response size of every request,
+    under the name of the view it resolved to (see core.metrics).
+    Should come first in settings.MIDDLEWARE, so that it times the whole request.
+    Streamed responses are recorded once their headers are ready,
+    without their size.
+    Works under WSGI and ASGI: it must not be the sync middleware that
+    makes Django run the async views (see Recipe.async_views) in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            #marks the instance as async, like MiddlewareMixin does, so that Django awaits it
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def wrap_connections(self, stack, queries):
+        """Installs the query timer on the database connections of the current thread"""
+
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(queries))
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = QueryTimer()
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            self.wrap_connections(stack, queries)
+            response = self.get_response(request)
+
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        """
+        Async version of __call__.
+        Connections belong to threads, and the queries of the request run in the
+        thread sync_to_async gives the request (sync views, and the async ORM),
+        so the query timer is installed on the connections of that thread.
+        """
+        queries = QueryTimer()
+        start = time.perf_counter()
+
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections)(stack, queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    def record(self, request, response, latency, queries):
+        """Records the request in the metrics registry"""
+
+        match = request.resolver_match
+        if response.has_header('Content-Length'):
+            response_size = int(response['Content-Length'])
+        elif not response.streaming:
+            response_size = len(response.content)
+        else:
+            response_size = None
+
+        registry.observe_request(
+            view=match.view_name if match else UNRESOLVED_VIEW,
+            method=request.method,
+            status=response.status_code,
+            latency=latency,
+            queries=queries.count,
+            query_time=queries.time,
+            response_size=response_size,
+        )
+
+
+class StaticFilesMiddleware:
+    """
+    Serves the collected static files (see core.staticfiles), before the
+    rest of the middleware and the URL resolution run. Other requests go on.
+    The files are listed when the worker starts (when Django loads the middleware).
+    Works under WSGI and ASGI, like MetricsMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_files = StaticFiles(settings.STATIC_ROOT, settings.STATIC_URL)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def find(self, request):
+        """The static file the request is for, if any"""
+
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        return self.static_files.find(request.path_info)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        static_file = self.find(request)
+        if static_file is not None:
+            return static_file.response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """Async version of __call__"""
+
+        static_file = self.find(request)
+        if static_file is not None:
+            return static_file.response(request)
+        return await self.get_response(request)
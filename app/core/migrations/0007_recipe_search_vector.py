@@ -0,0 +1,43 @@
+# Generated by Django 4.1 on 2026-10-18 05:37
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+POPULATE_SEARCH_VECTOR = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('english', COALESCE(core_recipe.recipe_title, '')), 'A') ||
+    setweight(to_tsvector('english', COALESCE((
+        SELECT string_agg(core_tag.tag_name, ' ')
+        FROM core_tag
+        INNER JOIN core_recipe_tags ON core_recipe_tags.tag_id = core_tag.id
+        WHERE core_recipe_tags.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector('english', COALESCE((
+        SELECT string_agg(core_ingredient.ingredient_name, ' ')
+        FROM core_ingredient
+        INNER JOIN core_recipe_ingredients ON core_recipe_ingredients.ingredient_id = core_ingredient.id
+        WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+    ), '')), 'C') ||
+    setweight(to_tsvector('english', COALESCE(core_recipe.recipe_description, '')), 'D');
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_VECTOR, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.1 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+#Merges the duplicates of every (user, name) into the oldest one:
+#their recipes are linked to the oldest one instead, then they are deleted.
+#Foreign keys are checked at once, since the table cannot be altered with pending checks.
+MERGE_DUPLICATES = """
+SET CONSTRAINTS ALL IMMEDIATE;
+
+CREATE TEMPORARY TABLE {table}_duplicates ON COMMIT DROP AS
+    SELECT id, keep_id FROM (
+        SELECT id, MIN(id) OVER (PARTITION BY user_id, {name}) AS keep_id FROM {table}
+    ) AS named
+    WHERE id <> keep_id;
+
+INSERT INTO core_recipe_{related} (recipe_id, {fk})
+    SELECT DISTINCT links.recipe_id, duplicates.keep_id
+    FROM core_recipe_{related} AS links
+    INNER JOIN {table}_duplicates AS duplicates ON duplicates.id = links.{fk}
+ON CONFLICT (recipe_id, {fk}) DO NOTHING;
+
+DELETE FROM core_recipe_{related} USING {table}_duplicates AS duplicates
+    WHERE core_recipe_{related}.{fk} = duplicates.id;
+
+DELETE FROM {table} USING {table}_duplicates AS duplicates
+    WHERE {table}.id = duplicates.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            MERGE_DUPLICATES.format(table='core_tag', name='tag_name', related='tags', fk='tag_id'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            MERGE_DUPLICATES.format(table='core_ingredient', name='ingredient_name', related='ingredients', fk='ingredient_id'),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient_name'), name='unique_user_ingredient_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'tag_name'), name='unique_user_tag_name'),
+        ),
+    ]
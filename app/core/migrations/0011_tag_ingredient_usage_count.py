@@ -0,0 +1,101 @@
+# Generated by Django 4.1 on 2026-10-18 07:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+#Counts the recipes linked to every tag/ingredient, with statement triggers on
+#the link table: the links are bulk inserted and deleted (see Recipe.serializers),
+#and deleted by cascades, without any signal per tag/ingredient.
+#The column gets a default, for the raw inserts of UserNamedManager.get_or_create_names.
+COUNT_LINKS = """
+ALTER TABLE {table} ALTER COLUMN usage_count SET DEFAULT 0;
+
+CREATE FUNCTION {table}_count_links() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE {table} SET usage_count = usage_count + links.count
+        FROM (SELECT {fk}, COUNT(*) AS count FROM new_links GROUP BY {fk}) AS links
+        WHERE {table}.id = links.{fk};
+    ELSE
+        UPDATE {table} SET usage_count = GREATEST(usage_count - links.count, 0)
+        FROM (SELECT {fk}, COUNT(*) AS count FROM old_links GROUP BY {fk}) AS links
+        WHERE {table}.id = links.{fk};
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER {table}_links_inserted AFTER INSERT ON core_recipe_{related}
+    REFERENCING NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION {table}_count_links();
+
+CREATE TRIGGER {table}_links_deleted AFTER DELETE ON core_recipe_{related}
+    REFERENCING OLD TABLE AS old_links
+    FOR EACH STATEMENT EXECUTE FUNCTION {table}_count_links();
+
+UPDATE {table} SET usage_count = links.count
+FROM (SELECT {fk}, COUNT(*) AS count FROM core_recipe_{related} GROUP BY {fk}) AS links
+WHERE {table}.id = links.{fk};
+"""
+
+DROP_COUNT_LINKS = """
+DROP TRIGGER {table}_links_inserted ON core_recipe_{related};
+DROP TRIGGER {table}_links_deleted ON core_recipe_{related};
+DROP FUNCTION {table}_count_links();
+ALTER TABLE {table} ALTER COLUMN usage_count DROP DEFAULT;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_timestamps'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ['id']},
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(models.F('user'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('ingredient_name'), name='text_pattern_ops'), name='ingredient_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('ingredient_name', config='simple'), fastupdate=False, name='ingredient_name_words_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(models.F('user'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('tag_name'), name='text_pattern_ops'), name='tag_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('tag_name', config='simple'), fastupdate=False, name='tag_name_words_idx'),
+        ),
+        migrations.RunSQL(
+            COUNT_LINKS.format(table='core_tag', related='tags', fk='tag_id'),
+            reverse_sql=DROP_COUNT_LINKS.format(table='core_tag', related='tags'),
+        ),
+        migrations.RunSQL(
+            COUNT_LINKS.format(table='core_ingredient', related='ingredients', fk='ingredient_id'),
+            reverse_sql=DROP_COUNT_LINKS.format(table='core_ingredient', related='ingredients'),
+        ),
+    ]
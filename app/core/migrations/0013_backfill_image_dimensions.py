@@ -0,0 +1,37 @@
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import migrations
+from django.db.models.functions import Now
+
+
+def backfill_image_dimensions(apps, schema_editor):
+    """
+    Fills the dimension fields of the images stored before they existed (migration 0008).
+    Empty, Django opens every such image whenever its recipe is loaded.
+    Rows are read as values, since loading the instances would open the files too.
+    Images whose file is missing are left empty.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    recipes = Recipe.objects.using(schema_editor.connection.alias)
+    rows = recipes.filter(image_width=None).exclude(image='').exclude(image=None).values_list('pk', 'image')
+
+    for pk, name in rows.iterator():
+        try:
+            with default_storage.open(name) as file:
+                width, height = get_image_dimensions(file, close=True)
+        except OSError:
+            continue
+        if width is not None:
+            #updated_at too, so that cached responses and ETags without the dimensions are renewed
+            recipes.filter(pk=pk).update(image_width=width, image_height=height, updated_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_image_dimensions, migrations.RunPython.noop),
+    ]
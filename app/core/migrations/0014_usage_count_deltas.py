@@ -0,0 +1,87 @@
+from django.db import migrations
+
+
+#The triggers of migration 0011 updated the usage counts of the linked tags/ingredients
+#in the transaction of every recipe write: each write locked the rows of all its tags and
+#ingredients until it committed, in no fixed order, so concurrent writes sharing popular
+#tags waited on each other and could deadlock.
+#The triggers now append the changes to a delta table, which locks nothing but its new rows.
+#The deltas are folded into the counts after the writes commit (see UserNamedManager.fold_usage_counts),
+#one fold at a time (an advisory lock), which locks the rows in id order.
+DEFER_COUNTS = """
+CREATE TABLE {table}_usage_delta (
+    {fk} bigint NOT NULL,
+    delta integer NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION {table}_count_links() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {table}_usage_delta ({fk}, delta)
+        SELECT {fk}, COUNT(*) FROM new_links GROUP BY {fk};
+    ELSE
+        INSERT INTO {table}_usage_delta ({fk}, delta)
+        SELECT {fk}, -COUNT(*) FROM old_links GROUP BY {fk};
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION {table}_fold_usage() RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock('{table}_usage_delta'::regclass::oid::bigint);
+    WITH deltas AS (
+        DELETE FROM {table}_usage_delta RETURNING {fk}, delta
+    ), sums AS (
+        SELECT {fk}, SUM(delta) AS delta FROM deltas GROUP BY {fk}
+    ), locked AS (
+        SELECT {table}.id, sums.delta FROM {table} JOIN sums ON {table}.id = sums.{fk}
+        WHERE sums.delta <> 0
+        ORDER BY {table}.id
+        FOR NO KEY UPDATE OF {table}
+    )
+    UPDATE {table} SET usage_count = GREATEST({table}.usage_count + locked.delta, 0)
+    FROM locked WHERE {table}.id = locked.id;
+END;
+$$;
+"""
+
+#back to the counts updated in the writes' transactions, with the pending deltas folded first
+UNDEFER_COUNTS = """
+SELECT {table}_fold_usage();
+DROP FUNCTION {table}_fold_usage();
+DROP TABLE {table}_usage_delta;
+
+CREATE OR REPLACE FUNCTION {table}_count_links() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE {table} SET usage_count = usage_count + links.count
+        FROM (SELECT {fk}, COUNT(*) AS count FROM new_links GROUP BY {fk}) AS links
+        WHERE {table}.id = links.{fk};
+    ELSE
+        UPDATE {table} SET usage_count = GREATEST(usage_count - links.count, 0)
+        FROM (SELECT {fk}, COUNT(*) AS count FROM old_links GROUP BY {fk}) AS links
+        WHERE {table}.id = links.{fk};
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_backfill_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DEFER_COUNTS.format(table='core_tag', fk='tag_id'),
+            reverse_sql=UNDEFER_COUNTS.format(table='core_tag', fk='tag_id'),
+        ),
+        migrations.RunSQL(
+            DEFER_COUNTS.format(table='core_ingredient', fk='ingredient_id'),
+            reverse_sql=UNDEFER_COUNTS.format(table='core_ingredient', fk='ingredient_id'),
+        ),
+    ]
@@ -1,8 +1,17 @@
-from django.db import models
+import re
+
+from django.db import connections, models, router, transaction
+from django.db.models import F
+from django.db.models.fields.files import ImageFieldFile
+from django.db.models.functions import Greatest, Lower
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorField
 
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 
+from .blobs import blob_digest, blob_name, content_digest, variant_directory
+
 # Create your models here.
 
 class CustomUserManager(BaseUserManager):
@@ -53,10 +62,137 @@ class CustomUserModel(AbstractBaseUser, PermissionsMixin):
 ############################################################
 
 def image_path(instance, filename):
-    """Function to explicitly create a path in MEDIA_ROOT for recipe images"""
+    """
+    Function to explicitly create a path in MEDIA_ROOT for recipe images.
+    Only the images stored before content addressing have such names (see core.blobs).
+    """
     return 'images/{filename}'.format(filename=filename)
 
 
+def image_variant_path(instance, filename):
+    """Function to explicitly create a path in MEDIA_ROOT for the resized variants of recipe images"""
+    return 'images/variants/{filename}'.format(filename=filename)
+
+
+class ImageBlobManager(models.Manager):
+    """
+    Manager for the image blobs, that counts their references,
+    and deletes their files once no recipe uses them.
+    """
+
+    def store(self, content, filename, storage):
+        """
+        References the blob of the content, and writes its file if it is
+        missing. The row is inserted or its count incremented with one
+        'INSERT ... ON CONFLICT DO UPDATE', which waits for a concurrent
+        collect() of the blob to be over, and leaves it referenced, so the
+        file cannot be deleted before the recipe is saved.
+        Returns the storage name of the blob.
+        """
+        digest = content_digest(content)
+        db = router.db_for_write(self.model)
+        quote = connections[db].ops.quote_name
+        table = quote(self.model._meta.db_table)
+
+        with connections[db].cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table} (sha256, name, size, ref_count, created_at) VALUES (%s, %s, %s, 1, NOW()) '
+                'ON CONFLICT (sha256) DO UPDATE SET ref_count = {table}.ref_count + 1 '
+                'RETURNING name'.format(table=table),
+                [digest, blob_name(digest, filename, content), content.size],
+            )
+            name = cursor.fetchone()[0]
+
+        if not storage.exists(name):
+            saved = storage.save(name, content)
+            if saved != name: #written meanwhile, by a concurrent upload of the same content
+                storage.delete(saved)
+        return name
+
+    def release(self, name):
+        """
+        Drops a reference to the blob named 'name'. Once the transaction
+        commits, the blob is collected if no recipe uses it anymore.
+        Images stored before content addressing are not counted, and left alone.
+        """
+        digest = blob_digest(name)
+        if digest is None:
+            return
+
+        self.filter(sha256=digest).update(ref_count=Greatest(F('ref_count') - 1, 0))
+        transaction.on_commit(lambda: self.collect([digest]))
+
+    def collect(self, digests):
+        """
+        Deletes the blobs of the digests that no recipe uses: their files
+        and variants, then their rows. The rows are locked first, and the
+        ones locked by a concurrent store() are skipped.
+        """
+        storage = Recipe._meta.get_field('image').storage
+        with transaction.atomic():
+            for blob in self.select_for_update(skip_locked=True).filter(sha256__in=digests, ref_count=0):
+                directory = variant_directory(blob.sha256)
+                if storage.exists(directory):
+                    for filename in storage.listdir(directory)[1]:
+                        storage.delete('{}/{}'.format(directory, filename))
+                storage.delete(blob.name)
+                blob.delete()
+
+
+class ImageBlob(models.Model):
+    """
+    Image file stored under the SHA-256 of its content, see core.blobs.
+    'ref_count' is the number of recipes that use it.
+    """
+    sha256 = models.CharField(max_length = 64, primary_key = True)
+    name = models.CharField(max_length = 200) #in the storage of Recipe.image
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default = 0)
+    created_at = models.DateTimeField(auto_now_add = True)
+
+    objects = ImageBlobManager()
+
+    def __str__(self):
+        return self.name
+
+
+class BlobImageFieldFile(ImageFieldFile):
+    """
+    The file of a BlobImageField: saving it stores the content as a blob,
+    named after its hash, rather than under its upload name.
+    """
+
+    def save(self, name, content, save=True):
+        self.name = ImageBlob.objects.store(content, name, self.storage)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+
+class BlobImageField(models.ImageField):
+    """
+    Image field whose files are content-addressed blobs, see core.blobs.
+    Saving a new file references its blob: replacing or deleting it must release
+    the blob of the old one (see ImageBlobManager.release).
+    """
+    attr_class = BlobImageFieldFile
+
+    def update_dimension_fields(self, instance, force=False, *args, **kwargs):
+        """
+        Django reads the file of an image whose dimension fields are empty when
+        the instance is loaded: a missing file leaves them empty (see migration
+        0013, which fills them), rather than failing every request that loads it.
+        """
+        try:
+            super().update_dimension_fields(instance, force, *args, **kwargs)
+        except OSError:
+            pass
+
+
 class Recipe(models.Model):
     """
     Recipes Model
@@ -68,20 +204,166 @@ class Recipe(models.Model):
     recipe_instructions = models.TextField()
     tags = models.ManyToManyField('core.Tag', blank = True)
     ingredients = models.ManyToManyField('core.Ingredient', blank = True)
-    image = models.ImageField(upload_to = image_path, height_field = None, width_field = None, max_length=200, blank = True, null = True)
+    image = BlobImageField(upload_to = image_path, height_field = 'image_height', width_field = 'image_width', max_length=200, blank = True, null = True)
+    image_width = models.PositiveIntegerField(null = True, blank = True, editable = False)
+    image_height = models.PositiveIntegerField(null = True, blank = True, editable = False)
+    #resized variants and placeholder of the image, generated in the background by Recipe.images
+    image_thumbnail = models.ImageField(upload_to = image_variant_path, max_length=200, blank = True, null = True, editable = False)
+    image_medium = models.ImageField(upload_to = image_variant_path, max_length=200, blank = True, null = True, editable = False)
+    image_webp = models.ImageField(upload_to = image_variant_path, max_length=200, blank = True, null = True, editable = False)
+    image_placeholder = models.TextField(blank = True, editable = False) #tiny blurred preview, as a data URI
+    search_vector = SearchVectorField(null = True, editable = False) #maintained by core.search, see core.signals
+    created_at = models.DateTimeField(auto_now_add = True)
+    updated_at = models.DateTimeField(auto_now = True) #also bumped when the tags/ingredients change, see core.signals
+
+    class Meta:
+        indexes = [
+            GinIndex(fields = ['search_vector'], name = 'recipe_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.recipe_title
 
 #############################################################
 
-class Tag(models.Model):
+class UserNamedManager(models.Manager):
+    """
+    Manager for the tags and ingredients, whose names are unique per user.
+    The model names its name field in NAME_FIELD (like USERNAME_FIELD of the user model).
+    """
+
+    def get_or_create_names(self, user, names):
+        """
+        Gets or creates the user's objects with the given names, with one statement:
+        the existing rows are selected, and the missing ones inserted with
+        'INSERT ... ON CONFLICT DO NOTHING', on the (user, name) unique index.
+        Concurrent calls with the same names can neither fail nor create duplicates.
+        New rows get their ids in the order of the names, but are inserted in sorted
+        order, so concurrent inserts of the same names wait on each other in the same
+        order and cannot deadlock. Existing rows are not written (nor locked).
+        Returns the objects, in no particular order.
+        """
+        names = list(dict.fromkeys(names)) #removes duplicate names, keeps their order
+        if not names:
+            return []
+
+        db = router.db_for_write(self.model)
+        quote = connections[db].ops.quote_name
+        meta = self.model._meta
+        fields = meta.concrete_fields
+        user_column = quote(meta.get_field('user').column)
+        name_column = quote(meta.get_field(self.model.NAME_FIELD).column)
+        columns = ', '.join(quote(field.column) for field in fields)
+
+        #the sorted subquery is not flattened, so nextval() runs in the order of the names
+        sql = (
+            'WITH named (position, user_id, name) AS (VALUES {values}), '
+            'existing AS (SELECT {columns} FROM {table} WHERE {user_column} = %s AND {name_column} IN (SELECT name FROM named)), '
+            'inserted AS ('
+            'INSERT INTO {table} ({pk_column}, {user_column}, {name_column}) '
+            'SELECT id, user_id, name FROM ('
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) AS id, user_id, name FROM named '
+            'WHERE name NOT IN (SELECT {name_column} FROM existing) ORDER BY position'
+            ') AS numbered ORDER BY name '
+            'ON CONFLICT ({user_column}, {name_column}) DO NOTHING '
+            'RETURNING {columns}'
+            ') '
+            'SELECT {columns} FROM existing UNION ALL SELECT {columns} FROM inserted'
+        ).format(
+            table=quote(meta.db_table),
+            pk_column=quote(meta.pk.column),
+            user_column=user_column,
+            name_column=name_column,
+            columns=columns,
+            values=', '.join(['(%s, %s::bigint, %s)'] * len(names)),
+        )
+        params = [param for position, name in enumerate(names) for param in (position, user.pk, name)]
+        params += [user.pk, meta.db_table, meta.pk.column]
+
+        with connections[db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            if len(rows) < len(names):
+                #a concurrent transaction committed some of the names after this statement started,
+                #so they were neither selected nor inserted: they are visible to the next statement.
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+
+        return [self.model.from_db(db, [field.attname for field in fields], row) for row in rows]
+
+    def fold_usage_counts(self):
+        """
+        Adds the pending changes of the usage counts (appended by the triggers of the
+        link tables, see migration 0014) to the objects, in a transaction of its own.
+        One fold runs at a time, and it locks the objects in id order.
+        """
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db), connections[db].cursor() as cursor:
+            cursor.execute('SELECT {}_fold_usage()'.format(self.model._meta.db_table))
+
+    def autocomplete(self, user, query, limit):
+        """
+        Suggests the user's objects for 'query', the start of a name, case insensitive.
+        The names that start with it come first, most used first: they are found
+        with 'lower(name) LIKE 'query%'' on the (user, lower(name)) index.
+        If there are fewer than 'limit', the names with other words starting
+        with the words of the query follow (e.g. 'red pepper' for 'pep'): they
+        are found with a prefix full-text query, on the GIN index of the names.
+        Returns at most 'limit' dicts with the id, name and usage_count.
+        """
+        name = self.model.NAME_FIELD
+        query = query.lower()
+        named = self.filter(user=user).alias(lower_name=Lower(name)).order_by('-usage_count', 'lower_name')
+        columns = ['id', name, 'usage_count']
+
+        results = list(named.filter(lower_name__startswith=query).values(*columns)[:limit])
+        words = re.findall(r'[^\W_]+', query) #no tsquery syntax
+        if len(results) < limit and words:
+            matches = named.alias(words=SearchVector(name, config='simple')).filter(
+                words=SearchQuery(' & '.join(word + ':*' for word in words), config='simple', search_type='raw')
+            )
+            results += matches.exclude(lower_name__startswith=query).values(*columns)[:limit - len(results)]
+        return results
+
+
+class UsageCountMixin:
+    """
+    Mixin for the tags and ingredients, whose 'usage_count' (the number of
+    recipes linked) is kept by database triggers, see migrations 0011 and 0014.
+    It is folded in after the transaction that changed the links commits.
+    Saving an existing object does not write its (maybe outdated) count back.
+    """
+
+    def save(self, *args, update_fields = None, **kwargs):
+        if update_fields is None and not self._state.adding:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'usage_count']
+        super().save(*args, update_fields = update_fields, **kwargs)
+
+
+#############################################################
+
+class Tag(UsageCountMixin, models.Model):
     """
     Tag model for adding to recipes.
     Intended for authenticated users.
     """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE, related_name = 'tags')
     tag_name = models.CharField(max_length = 100)
+    usage_count = models.PositiveIntegerField(default = 0, editable = False) #recipes linked, kept by database triggers and folded after commit
+
+    NAME_FIELD = 'tag_name'
+    objects = UserNamedManager()
+
+    class Meta:
+        ordering = ['id'] #folding the usage counts rewrites the rows, so the table order is not the creation order
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'tag_name'], name = 'unique_user_tag_name'), #also indexes the lookups by name
+        ]
+        indexes = [
+            #prefix searches of the autocomplete: lower(name) LIKE 'prefix%'
+            models.Index(models.F('user'), OpClass(Lower('tag_name'), name = 'text_pattern_ops'), name = 'tag_name_prefix_idx'),
+            GinIndex(SearchVector('tag_name', config = 'simple'), name = 'tag_name_words_idx', fastupdate = False), #word prefixes of the autocomplete, with no pending list to scan
+        ]
 
     def __str__(self):
         return self.tag_name
@@ -89,13 +371,28 @@ class Tag(models.Model):
 
 #############################################################
 
-class Ingredient(models.Model):
+class Ingredient(UsageCountMixin, models.Model):
     """
     Ingredient model for adding to recipes
     """
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE, related_name = 'ingredients')
     ingredient_name = models.CharField(max_length = 100)
+    usage_count = models.PositiveIntegerField(default = 0, editable = False) #recipes linked, kept by database triggers and folded after commit
+
+    NAME_FIELD = 'ingredient_name'
+    objects = UserNamedManager()
+
+    class Meta:
+        ordering = ['id'] #folding the usage counts rewrites the rows, so the table order is not the creation order
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'ingredient_name'], name = 'unique_user_ingredient_name'), #also indexes the lookups by name
+        ]
+        indexes = [
+            #prefix searches of the autocomplete: lower(name) LIKE 'prefix%'
+            models.Index(models.F('user'), OpClass(Lower('ingredient_name'), name = 'text_pattern_ops'), name = 'ingredient_name_prefix_idx'),
+            GinIndex(SearchVector('ingredient_name', config = 'simple'), name = 'ingredient_name_words_idx', fastupdate = False), #word prefixes of the autocomplete, with no pending list to scan
+        ]
 
     def __str__(self):
         return self.ingredient_name
@@ -0,0 +1,128 @@
+"""
+Full-page cache of the pages that are the same for every visitor, and
+the most requested (by load balancer health checks and crawlers):
+the homepage and the API root.
+
+They are cached with Django's cache_page, in settings.PAGE_CACHE['CACHE'],
+for PAGE_CACHE['TIMEOUT'] seconds, which is also the max-age of their
+Cache-Control header. The key is built from the URL and the request headers
+the view's response varies on: 'Accept' for the API root. Only the JSON
+of the API root is cached: the browsable API page holds a per-user CSRF
+token (and the user's name), so it is 'private', which is never cached.
+The key prefix includes the version of the static files (see
+core.staticfiles), so that after a deploy, no cached page links the
+previous static files.
+
+warm_page_cache() renders them when a worker starts (see app/wsgi.py and
+app/asgi.py), through the whole middleware, so that the first visitors get
+cached pages too.
+"""
+
+from io import BytesIO
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.db import connections
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+
+from rest_framework.routers import APIRootView, DefaultRouter
+
+from .staticfiles import static_version
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'pages'
+
+#path, and the Accept headers the page is requested with
+WARM_PAGES = [
+    ('/', [None]),
+    ('/api/', [None, '*/*', 'application/json']),
+]
+
+
+def cached_page(view):
+    """Decorator that caches the pages of the view, see core.pages"""
+
+    return cache_page(
+        settings.PAGE_CACHE['TIMEOUT'],
+        cache=settings.PAGE_CACHE['CACHE'],
+        key_prefix='{}:{}'.format(KEY_PREFIX, static_version()),
+    )(view)
+
+
+class CachedAPIRootView(APIRootView):
+    """
+    API root whose browsable API page is 'private', so only its JSON is cached.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format == 'api':
+            patch_cache_control(response, private=True)
+        return response
+
+
+class CachedDefaultRouter(DefaultRouter):
+    """
+    DefaultRouter whose API root is cached, rather than
+    reversing the URL of every list on every request.
+    """
+    APIRootView = CachedAPIRootView
+
+    def get_api_root_view(self, api_urls=None):
+        return cached_page(super().get_api_root_view(api_urls))
+
+
+def get_warm_origins():
+    """
+    The origins (scheme and host) the pages are warmed for, since the cached
+    pages are keyed by their absolute URL: PAGE_CACHE['WARM_ORIGINS'], else
+    one per host of ALLOWED_HOSTS (not the patterns), over http.
+    """
+    if settings.PAGE_CACHE['WARM_ORIGINS']:
+        return settings.PAGE_CACHE['WARM_ORIGINS']
+
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return ['http://{}'.format(host) for host in hosts or ['localhost']]
+
+
+def warm_page_cache():
+    """
+    Requests every page of WARM_PAGES for every origin, through the
+    middleware, which caches them. A page that fails is logged and skipped:
+    the worker starts anyway.
+    Returns the number of pages that were rendered.
+    """
+    handler = WSGIHandler()
+    rendered = 0
+    try:
+        for origin in get_warm_origins():
+            url = urlsplit(origin)
+            for path, accepts in WARM_PAGES:
+                for accept in accepts:
+                    environ = {
+                        'REQUEST_METHOD': 'GET',
+                        'PATH_INFO': path,
+                        'SCRIPT_NAME': '',
+                        'SERVER_NAME': url.hostname,
+                        'SERVER_PORT': str(url.port or (443 if url.scheme == 'https' else 80)),
+                        'HTTP_HOST': url.netloc,
+                        'wsgi.url_scheme': url.scheme,
+                        'wsgi.input': BytesIO(),
+                    }
+                    if accept:
+                        environ['HTTP_ACCEPT'] = accept
+                    try:
+                        response = handler.get_response(WSGIRequest(environ))
+                        response.close()
+                        rendered += response.status_code == 200
+                    except Exception:
+                        logger.exception('Could not warm the page cache with %s%s', origin, path)
+    finally:
+        connections.close_all()
+
+    return rendered
@@ -0,0 +1,59 @@
+"""
+Pagination classes shared by every list endpoint of the API.
+"""
+
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+
+
+def positive_int(value, cutoff=None):
+    """
+    The positive integer of a query parameter, at most 'cutoff'.
+    Raises ValueError if the value is not a positive integer.
+    """
+    number = int(value)
+    if number <= 0:
+        raise ValueError('Not a positive integer: {!r}'.format(value))
+    return min(number, cutoff) if cutoff else number
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination over the primary key.
+    Every page is fetched with 'WHERE id > <cursor> ORDER BY id LIMIT n',
+    which walks the primary key index, so there are no OFFSET scans
+    and no COUNT(*) queries, no matter how large the table gets.
+
+    Viewsets can set 'page_size' and 'max_page_size' to override the defaults.
+    Clients can ask for a smaller or bigger page with '?page_size=',
+    but never bigger than the maximum.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Picks up the page size limits of the viewset, if it sets any.
+        """
+        self.page_size = getattr(view, 'page_size', self.page_size)
+        self.max_page_size = getattr(view, 'max_page_size', self.max_page_size)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of paginate_queryset, for the async views.
+        The page is fetched the way the async ORM of Django fetches querysets,
+        in the thread sync_to_async gives the request, so that the cursor
+        logic is not duplicated.
+        """
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_page_size(self, request):
+        """
+        Enforces the maximum page size on the default page size as well.
+        """
+        page_size = super().get_page_size(request)
+        if page_size and self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return page_size
@@ -0,0 +1,33 @@
+"""
+Parsers shared by the apps of the project.
+"""
+
+from io import BytesIO
+
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError: #the stdlib json module of DRF is used instead
+    orjson = None
+
+
+class ORJSONParser(JSONParser):
+    """
+    DRF's JSONParser, decoding UTF-8 bodies with orjson, which is several times
+    faster on large (e.g. bulk) payloads. Whatever orjson rejects (invalid JSON,
+    integers over 64 bits, lone surrogates) is parsed again by DRF's parser,
+    so the parsed data, and the parse errors, stay the same.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return super().parse(BytesIO(content), media_type, parser_context)
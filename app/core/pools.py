@@ -0,0 +1,70 @@
+"""
+Bounded thread pools, for CPU-bound work kept off the request threads
+(e.g. the password hashing of the logins, see User.hashing).
+
+A pool runs at most 'workers' tasks at once, and queues at most
+'max_waiting' more. Beyond that, tasks are refused at once with PoolFull,
+instead of queueing without bound: a burst of such requests then holds
+at most 'workers + max_waiting' request threads, and the other endpoints
+keep theirs. Tasks running and waiting, rejections, and the time tasks
+wait and run are recorded in the metrics (see core.metrics).
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from .metrics import registry
+
+
+class PoolFull(Exception):
+    """The pool already has 'max_waiting' tasks waiting"""
+
+
+class BoundedPool:
+    """
+    Thread pool with a bounded queue. Sync code waits for a task with run(),
+    async code awaits it with arun(), without blocking the event loop.
+    Tasks must not use the database: they run on threads of their own.
+    """
+
+    def __init__(self, name, workers, max_waiting):
+        self.name = name
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + max_waiting)
+
+    def submit(self, function, *args):
+        """
+        Queues function(*args) and returns its future.
+        Raises PoolFull if the pool is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            registry.pool_task_rejected(self.name)
+            raise PoolFull(self.name)
+
+        registry.pool_task_queued(self.name)
+        queued = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            registry.pool_task_started(self.name, started - queued)
+            try:
+                return function(*args)
+            finally:
+                registry.pool_task_finished(self.name, time.perf_counter() - started)
+                self._slots.release()
+
+        return self._executor.submit(task)
+
+    def run(self, function, *args):
+        """Runs function(*args) on the pool, and waits for its result"""
+
+        return self.submit(function, *args).result()
+
+    async def arun(self, function, *args):
+        """Runs function(*args) on the pool, and awaits its result"""
+
+        return await asyncio.wrap_future(self.submit(function, *args))
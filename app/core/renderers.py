@@ -0,0 +1,75 @@
+"""
+Renderers shared by the apps of the project.
+"""
+
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError: #the stdlib json module of DRF is used instead
+    orjson = None
+
+
+#serializes what orjson does not (e.g. lazy translations, querysets), as DRF does
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Encodes data to compact UTF-8 JSON with orjson, byte for byte as DRF's
+    JSONRenderer (with its default settings) does, but for floats: those in
+    exponent notation are written '1e16' instead of '1e+16' (the same number),
+    and NaN/Infinity, that DRF refuses, are written 'null'.
+    Raises TypeError for what orjson can not encode (e.g. integers over 64 bits).
+    """
+    content = orjson.dumps(
+        data,
+        default=_encoder.default,
+        #DRF's encoder formats datetimes ('Z' for UTC), and json converts int keys to strings
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+    #escaped like DRF does, for the JSON to be valid javascript too
+    return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Renders text in the Prometheus text exposition format.
+    Anything else (e.g. error details) is rendered as JSON text.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, str):
+            data = json.dumps(data)
+        return data.encode(self.charset)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    DRF's JSONRenderer, encoding with orjson, which is several times faster
+    on large responses (see dumps). Indented JSON (the browsable API,
+    or 'Accept: application/json; indent=4'), data orjson can not encode,
+    and settings other than DRF's defaults fall back to DRF's encoding.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if orjson is None or not self.is_default_encoding() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            return dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+    def is_default_encoding(self):
+        """Whether the output settings are the ones dumps() matches"""
+        return self.encoder_class is JSONEncoder and not self.ensure_ascii and self.compact and self.strict
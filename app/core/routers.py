@@ -0,0 +1,122 @@
+"""
+Database routing to read replicas.
+
+Reads are sent to a replica only inside replica_reads(), which the API
+viewsets enter for safe (GET, HEAD, OPTIONS) requests, see ReplicaReadsMixin.
+Everything else (writes, other requests, management commands) uses the
+primary ('default'). Once a request writes, its later reads go to the
+primary too, so that it reads its own writes.
+
+Replicas are the aliases in settings.DATABASE_REPLICAS, see settings.py.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+
+PRIMARY = 'default'
+
+_replica_state = ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    """
+    The replica a request reads from, until it writes.
+    """
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.pinned = False #set on the first write, reads go to the primary from then on
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Sends the reads of the block to one replica, picked at random,
+    until the block writes. Does nothing without replicas.
+    Context variables follow sync_to_async, so async views can use it too.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    state = ReplicaState(random.choice(replicas)) if enabled and replicas else None
+
+    token = _replica_state.set(state)
+    try:
+        yield state
+    finally:
+        _replica_state.reset(token)
+
+
+def replica_reads_iterator(iterable):
+    """
+    Iterates 'iterable' in the replica_reads() block it is created in,
+    even once the block exited: the rows of a streamed response are read
+    after the view returned, from the replica the request reads from.
+    """
+    state = _replica_state.get() #now, not when the iteration starts
+
+    def iterate():
+        iterator = iter(iterable)
+        end = object()
+        while True:
+            token = _replica_state.set(state)
+            try:
+                item = next(iterator, end)
+            finally:
+                _replica_state.reset(token) #the server's code between the items is not in the block
+            if item is end:
+                return
+            yield item
+
+    return iterate()
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the apps in 'route_app_labels' to the replica
+    of the current replica_reads() block, and all the writes to the primary.
+    Other apps (e.g. the auth tokens, which are read right after login)
+    always use the primary.
+    """
+    route_app_labels = {'core'}
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if state is None or state.pinned or model._meta.app_label not in self.route_app_labels:
+            return PRIMARY
+
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state is not None:
+            state.pinned = True #read-after-write
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same rows as the primary"""
+
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Replicas are migrated by replication"""
+
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Viewset mixin that reads from a replica for safe requests (see replica_reads).
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(request.method in SAFE_METHODS):
+            return super().dispatch(request, *args, **kwargs)
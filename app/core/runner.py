@@ -0,0 +1,19 @@
+"""
+Test runner of the project.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with the rate limit counters emptied first: their
+    cache (core.throttling) is shared by the processes, so it keeps
+    the requests of the previous runs.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        caches[settings.THROTTLING['CACHE']].clear()
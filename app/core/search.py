@@ -0,0 +1,75 @@
+"""
+PostgreSQL full-text search for recipes.
+
+Every recipe keeps a 'search_vector' column, weighted by
+title (A), tags (B), ingredients (C) and description (D),
+behind a GIN index. The vector is refreshed by the signals
+in core.signals whenever a recipe, or one of its tags or
+ingredients, changes.
+"""
+
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import OuterRef, Subquery
+
+from .models import Ingredient, Recipe, Tag
+
+
+SEARCH_CONFIG = 'english'
+
+SEARCH_TERM_PATTERN = re.compile(r'[^\W_]+')
+
+
+def _names_subquery(model, name_field):
+    """
+    Helper function.
+    Subquery that joins the names of a recipe's tags/ingredients
+    into a single string.
+    """
+    names = (
+        model.objects
+        .filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg(name_field, delimiter=' '))
+        .values('names')
+    )
+    return Subquery(names)
+
+
+def recipe_search_vector():
+    """
+    The weighted search vector expression of a recipe.
+    """
+    return (
+        SearchVector('recipe_title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_names_subquery(Tag, 'tag_name'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names_subquery(Ingredient, 'ingredient_name'), weight='C', config=SEARCH_CONFIG)
+        + SearchVector('recipe_description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids, **fields):
+    """
+    Refreshes the search vector of the given recipes with a single UPDATE.
+    'recipe_ids' can be a list of ids or a queryset of ids.
+    'fields' are other values to set in the same UPDATE.
+    """
+    return Recipe.objects.filter(pk__in=recipe_ids).update(search_vector=recipe_search_vector(), **fields)
+
+
+def build_search_query(text):
+    """
+    Turns the text of a '?search=' parameter into a tsquery.
+    Every word must match, and every word matches as a prefix,
+    so 'chick' finds 'Chicken', like the old icontains search did.
+    Returns None if there is nothing to search for.
+    """
+    terms = SEARCH_TERM_PATTERN.findall(text.lower())
+    if not terms:
+        return None
+
+    raw_query = ' & '.join('{term}:*'.format(term=term) for term in terms)
+    return SearchQuery(raw_query, search_type='raw', config=SEARCH_CONFIG)
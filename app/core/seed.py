@@ -0,0 +1,139 @@
+"""
+Synthetic dataset of users, tags, ingredients and recipes, for benchmarks.
+
+The distributions follow what a recipe site looks like: a few prolific
+users write most of the recipes (Zipf-like), every user has their own
+tags and ingredients, recipes have 0-6 tags and 3-12 ingredients, and
+search words are as rare as in real text (the rest is filler words).
+Everything is written with bulk inserts, and the search vectors are
+built with one UPDATE. See 'python manage.py seed_data'.
+"""
+
+import random
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+
+from .models import Ingredient, Recipe, Tag
+from .search import update_search_vectors
+
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'salmon', 'tofu', 'tomato', 'basil', 'garlic', 'onion', 'lemon',
+    'rice', 'pasta', 'noodles', 'curry', 'soup', 'salad', 'cake', 'bread', 'spicy', 'sweet',
+    'vegan', 'vegetarian', 'french', 'italian', 'chinese', 'mexican', 'quick', 'baked', 'grilled', 'fresh',
+]
+
+#filler words, so that the searched words are as rare as they are in real recipes
+FILLER = [a + b + c for a in 'bdfgklmnprst' for b in ['a', 'e', 'i', 'o', 'u', 'ai', 'ou'] for c in ['n', 'r', 'l', 'sk', 'mble', 'tter']]
+
+BATCH_SIZE = 2000 #rows per INSERT
+
+#number of tags/ingredients of a recipe: weights of 0, 1, 2...
+TAG_COUNT_WEIGHTS = [10, 20, 25, 20, 12, 8, 5]
+INGREDIENT_COUNT_WEIGHTS = [0, 0, 0, 6, 10, 14, 16, 16, 12, 9, 7, 5, 5]
+
+
+def _count(rng, weights, available):
+    """
+    Helper function.
+    Picks a number of tags/ingredients for a recipe, out of the 'available' ones.
+    """
+    return min(rng.choices(range(len(weights)), weights)[0], available)
+
+
+def _text(rng, words, fillers):
+    """
+    Helper function.
+    A shuffled text of 'words' search words and 'fillers' filler words.
+    """
+    text = rng.choices(WORDS, k=words) + rng.choices(FILLER, k=fillers)
+    rng.shuffle(text)
+    return ' '.join(text)
+
+
+def seed_dataset(recipe_count, user_count=None, tags_per_user=20, ingredients_per_user=40, password=None, seed=0):
+    """
+    Bulk inserts a dataset of 'recipe_count' recipes, written by
+    'user_count' users (by default one per 50 recipes).
+    Users get 'password', or an unusable password.
+    Returns the number of rows inserted per model.
+    """
+    rng = random.Random(seed)
+    user_count = user_count or max(recipe_count // 50, 1)
+    run = uuid4().hex[:8] #keeps the emails unique when seeding more than once
+
+    password_hash = make_password(password) #hashed once, on purpose: hashing is slow
+    users = get_user_model().objects.bulk_create(
+        [
+            get_user_model()(email='seed-{run}-{i}@example.com'.format(run=run, i=i), name='seed user {}'.format(i), password=password_hash)
+            for i in range(user_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    tags = Tag.objects.bulk_create(
+        [Tag(user=user, tag_name=word) for user in users for word in rng.sample(WORDS + FILLER, tags_per_user)],
+        batch_size=BATCH_SIZE,
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        [Ingredient(user=user, ingredient_name=word) for user in users for word in rng.sample(WORDS + FILLER, ingredients_per_user)],
+        batch_size=BATCH_SIZE,
+    )
+    user_tags, user_ingredients = {user.id: [] for user in users}, {user.id: [] for user in users}
+    for tag in tags:
+        user_tags[tag.user_id].append(tag)
+    for ingredient in ingredients:
+        user_ingredients[ingredient.user_id].append(ingredient)
+
+    #Zipf-like activity: the n-th user writes about 1/n as many recipes as the first
+    authors = rng.choices(users, weights=[1 / (rank + 1) for rank in range(len(users))], k=recipe_count)
+    recipes = Recipe.objects.bulk_create(
+        [
+            Recipe(
+                user=author,
+                recipe_title=' '.join([rng.choice(WORDS)] + rng.sample(FILLER, rng.randint(1, 3))).title(),
+                recipe_description=_text(rng, rng.randint(1, 3), rng.randint(15, 60)),
+                recipe_instructions=_text(rng, rng.randint(2, 5), rng.randint(40, 200)),
+            )
+            for author in authors
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    tag_links = [
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rng.sample(user_tags[recipe.user_id], _count(rng, TAG_COUNT_WEIGHTS, tags_per_user))
+    ]
+    Recipe.tags.through.objects.bulk_create(tag_links, batch_size=BATCH_SIZE)
+
+    ingredient_links = [
+        Recipe.ingredients.through(recipe_id=recipe.id, ingredient_id=ingredient.id)
+        for recipe in recipes
+        for ingredient in rng.sample(user_ingredients[recipe.user_id], _count(rng, INGREDIENT_COUNT_WEIGHTS, ingredients_per_user))
+    ]
+    Recipe.ingredients.through.objects.bulk_create(ingredient_links, batch_size=BATCH_SIZE)
+    Tag.objects.fold_usage_counts()
+    Ingredient.objects.fold_usage_counts()
+
+    #analyzed before building the vectors, which would otherwise be planned for empty tables
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_recipe, core_tag, core_ingredient, core_recipe_tags, core_recipe_ingredients')
+
+    if recipes:
+        update_search_vectors(Recipe.objects.filter(pk__range=(recipes[0].pk, recipes[-1].pk)).values('pk'))
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_recipe')
+
+    return {
+        'users': len(users),
+        'tags': len(tags),
+        'ingredients': len(ingredients),
+        'recipes': len(recipes),
+        'recipe tags': len(tag_links),
+        'recipe ingredients': len(ingredient_links),
+    }
@@ -0,0 +1,153 @@
+"""
+Signal handlers of the core app.
+They are connected when the app is ready (see CoreConfig.ready).
+"""
+
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import ImageBlob, Ingredient, Recipe, Tag
+from .search import update_search_vectors
+
+
+SEARCH_FIELDS = {'recipe_title', 'recipe_description'}
+
+#Sent with 'recipe_ids' whenever the tags/ingredients of recipes change:
+#links added or removed (also by bulk inserting in the through tables,
+#which does not send m2m_changed), or a linked tag/ingredient renamed or deleted.
+#Also sent for recipes created or updated in bulk, since bulk_create/bulk_update
+#do not send post_save either.
+recipes_relinked = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, update_fields=None, **kwargs):
+    """
+    Refreshes the search vector of a saved recipe,
+    unless none of its searchable fields were saved.
+    """
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+
+    update_search_vectors([instance.pk])
+
+
+@receiver(recipes_relinked)
+def refresh_relinked_recipes(sender, recipe_ids, **kwargs):
+    """
+    Refreshes the search vectors of relinked recipes, and bumps their
+    'updated_at', since their tags/ingredients are part of them.
+    The time is taken here rather than with Now(), which is the start
+    of the transaction, before the recipe's own save.
+    """
+    update_search_vectors(recipe_ids, updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def send_recipes_relinked(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Sends recipes_relinked for the recipes whose tags or ingredients
+    were added, removed or cleared, from either side of the relationship.
+    """
+    if action == 'pre_clear' and reverse:
+        #the links are about to go away, so remember which recipes had them.
+        instance._cleared_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action != 'post_clear' and not pk_set:
+        return #nothing was actually linked or unlinked
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = list(pk_set)
+
+    if recipe_ids:
+        recipes_relinked.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def send_renamed_recipes_relinked(sender, instance, created, **kwargs):
+    """
+    Sends recipes_relinked for the recipes that use
+    a tag or ingredient that was renamed.
+    """
+    if created:
+        return #a new tag/ingredient is not used by any recipe yet
+
+    recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+    if recipe_ids:
+        recipes_relinked.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_deleted_links(sender, instance, **kwargs):
+    """
+    Remembers the recipes that use a tag or ingredient that is being deleted,
+    since the links are gone by the time the deletion is over.
+    """
+    instance._unlinked_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def send_unlinked_recipes_relinked(sender, instance, **kwargs):
+    """
+    Sends recipes_relinked for the recipes that used
+    a deleted tag or ingredient.
+    """
+    recipe_ids = instance.__dict__.pop('_unlinked_recipe_ids', [])
+    if recipe_ids:
+        recipes_relinked.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def fold_usage_counts():
+    """Folds the pending changes of the usage counts of the tags and ingredients"""
+
+    Tag.objects.fold_usage_counts()
+    Ingredient.objects.fold_usage_counts()
+
+
+class UsageCountFold:
+    """On-commit callback that folds the usage counts, pending until it runs"""
+
+    def __init__(self):
+        self.pending = True
+
+    def __call__(self):
+        self.pending = False
+        fold_usage_counts()
+
+
+@receiver(recipes_relinked)
+@receiver(post_delete, sender=Recipe)
+def schedule_usage_count_fold(sender, **kwargs):
+    """
+    Folds the usage count changes of the links once the transaction commits,
+    outside of it, so that the writes never lock the linked tags/ingredients
+    (see migration 0014). Scheduled once per transaction.
+    """
+    using = router.db_for_write(Tag)
+    connection = transaction.get_connection(using)
+    if not any(isinstance(callback[1], UsageCountFold) and callback[1].pending for callback in connection.run_on_commit):
+        transaction.on_commit(UsageCountFold(), using=using)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_image(sender, instance, **kwargs):
+    """
+    Releases the image blob of a deleted recipe,
+    which deletes it once no other recipe uses it.
+    """
+    if instance.image:
+        ImageBlob.objects.release(instance.image.name)
@@ -0,0 +1,239 @@
+"""
+Static files: hashed, precompressed, and served without revalidation.
+
+'python manage.py collectstatic' (with CompressedManifestStaticFilesStorage,
+see settings.STATICFILES_STORAGE) writes every file under a name with the
+hash of its content (e.g. 'Recipe/index.9a8b7c6d5e4f.css'), next to a
+precompressed '.br' and '.gz' copy of the text files, and re-encodes the
+bundled JPEG and PNG images (see settings.STATIC_PIPELINE) before they are
+hashed. The {% static %} tag then renders the hashed names.
+
+StaticFilesMiddleware (see core.middleware) serves STATIC_ROOT: it lists
+the files once, when the worker starts, and answers with the smallest
+encoding the client accepts, 'Vary: Accept-Encoding', an ETag, and a
+Cache-Control header: hashed names never change, so they are cached for
+a year without revalidation, and repeat page loads do not request them.
+"""
+
+import gzip
+import hashlib
+from io import BytesIO
+import json
+import mimetypes
+import os
+import re
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from PIL import Image, ImageOps
+
+from .blobs import IMMUTABLE_CACHE_CONTROL
+
+
+CACHE_CONTROL = 'public, max-age=60' #names without a hash may change
+
+#files that are compressed already
+INCOMPRESSIBLE = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.woff', '.woff2', '.gz', '.br', '.zip')
+IMAGE_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG'}
+
+#Content-Encoding: extension, most compact first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_ZERO_QUALITY = re.compile(r';\s*q=0(\.0*)?\s*$')
+
+_static_version = None
+
+
+def static_version():
+    """
+    Version of the collected static files: a hash of their manifest, read
+    once per worker, like the files. Empty before collectstatic.
+    Keys of cached pages include it, so they never link replaced files.
+    """
+    global _static_version
+    if _static_version is None:
+        try:
+            with open(os.path.join(settings.STATIC_ROOT, ManifestStaticFilesStorage.manifest_name), 'rb') as manifest:
+                _static_version = hashlib.sha1(manifest.read()).hexdigest()[:12]
+        except (OSError, TypeError):
+            _static_version = ''
+    return _static_version
+
+
+def compress(content):
+    """
+    The precompressed copies of the content, by extension: only the ones
+    that save at least 5%, else the client may as well get the original.
+    """
+    compressed = {
+        '.br': brotli.compress(content, quality=11),
+        '.gz': gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    return {extension: data for extension, data in compressed.items() if len(data) < len(content) * 0.95}
+
+
+def reencode_image(content, image_format):
+    """
+    Re-encodes a bundled image: fits it in settings.STATIC_PIPELINE['IMAGE_MAX_SIZE'],
+    without its metadata (but its color profile), as a progressive JPEG
+    or an optimized PNG. Returns None if that is not smaller.
+    """
+    image = Image.open(BytesIO(content))
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    max_size = settings.STATIC_PIPELINE['IMAGE_MAX_SIZE']
+    image.thumbnail((max_size, max_size))
+
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer, format='JPEG', quality=settings.STATIC_PIPELINE['JPEG_QUALITY'],
+            optimize=True, progressive=True, icc_profile=icc_profile,
+        )
+    else:
+        image.save(buffer, format='PNG', optimize=True, icc_profile=icc_profile)
+
+    return buffer.getvalue() if buffer.tell() < len(content) else None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest static files storage that also re-encodes the images
+    before they are hashed, and precompresses the collected files.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError: #not collected yet (the tests, or before collectstatic): the unhashed name
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = {**paths, **self.reencode_images(paths)}
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                for stored_name in (name, hashed_name):
+                    self.precompress(stored_name)
+            yield name, hashed_name, processed
+
+    def reencode_images(self, paths):
+        """
+        Re-encodes the collected copies of the images, which are then hashed instead of their originals.
+        Returns the paths of the re-encoded images.
+        """
+        reencoded = {}
+        for name, (storage, path) in paths.items():
+            image_format = IMAGE_FORMATS.get(os.path.splitext(name)[1].lower())
+            if image_format is None:
+                continue
+
+            with storage.open(path) as original:
+                content = reencode_image(original.read(), image_format)
+            if content is not None:
+                self.delete(name)
+                self._save(name, ContentFile(content))
+                reencoded[name] = (self, name)
+        return reencoded
+
+    def precompress(self, name):
+        """Writes the '.br' and '.gz' copies of a collected file"""
+
+        if name.lower().endswith(INCOMPRESSIBLE):
+            return
+
+        with self.open(name) as file:
+            copies = compress(file.read())
+        for extension, data in copies.items():
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(data))
+
+
+class StaticFile:
+    """
+    A collected file, with its precompressed copies, as served by StaticFiles.
+    """
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+        self.last_modified = http_date(stat.st_mtime)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else CACHE_CONTROL
+        #(Content-Encoding, path, ETag) of the copies that exist, most compact first
+        self.encodings = [
+            (encoding, path + extension, self.etag[:-1] + '-' + encoding + '"')
+            for encoding, extension in ENCODINGS if os.path.exists(path + extension)
+        ]
+
+    def response(self, request):
+        """
+        The response to a GET or HEAD request, in the first encoding
+        that the client accepts, or a 304 for the ETag of that encoding.
+        """
+        accepted = {
+            token.split(';')[0].strip().lower()
+            for token in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+            if not _ZERO_QUALITY.search(token)
+        }
+        encoding, path, etag = next(
+            (copy for copy in self.encodings if copy[0] in accepted),
+            (None, self.path, self.etag),
+        )
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = FileResponse(open(path, 'rb'), content_type=self.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = etag
+        response['Last-Modified'] = self.last_modified
+        response['Cache-Control'] = self.cache_control
+        if self.encodings:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class StaticFiles:
+    """
+    The files of STATIC_ROOT, by URL path, listed once.
+    Files collected later are not seen until the worker restarts.
+    """
+
+    def __init__(self, root, url):
+        self.files = {}
+        if not root or not os.path.isdir(root):
+            return
+
+        url = '/' + url.lstrip('/')
+        immutable = self.hashed_names(root)
+        for directory, dirs, names in os.walk(root):
+            for filename in names:
+                if filename.endswith(tuple(extension for encoding, extension in ENCODINGS)):
+                    continue #served in place of their original
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                self.files[url + name] = StaticFile(path, name in immutable)
+
+    def hashed_names(self, root):
+        """The hashed names of the manifest, whose content never changes"""
+
+        try:
+            with open(os.path.join(root, ManifestStaticFilesStorage.manifest_name)) as manifest:
+                return set(json.load(manifest)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def find(self, path):
+        """The StaticFile of a URL path, or None"""
+
+        return self.files.get(path)
@@ -0,0 +1,191 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.urls import reverse
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import SimpleTestCase, override_settings
+from core.blobs import IMMUTABLE_CACHE_CONTROL, HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler
+from core.models import ImageBlob, Recipe
+
+from PIL import Image
+from io import BytesIO
+from types import SimpleNamespace
+import hashlib
+import importlib
+import os
+import tempfile
+
+
+def create_user(**params):
+    """Helper function to create a user with variable parameters"""
+
+    return get_user_model().objects.create_user(**params)
+
+
+def create_recipe(user, title='Blob recipe'):
+    """Helper function to create a recipe"""
+
+    return Recipe.objects.create(user=user, recipe_title=title, recipe_description='d', recipe_instructions='i')
+
+
+def image_file(color, name='photo.jpg'):
+    """Helper function that returns a JPEG image of one color"""
+
+    buffer = BytesIO()
+    Image.new('RGB', (200, 100), color).save(buffer, format='JPEG')
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+class HashingUploadHandlerTests(SimpleTestCase):
+    """Tests hashing the uploads as they stream in"""
+
+    def receive(self, handler, content):
+        """
+        Helper function.
+        Streams the content to the handler, in 4 chunks, as the multipart parser does.
+        """
+        handler.handle_raw_input(None, {}, len(content), 'boundary')
+        try:
+            handler.new_file('image', 'photo.jpg', 'image/jpeg', len(content))
+        except StopFutureHandlers:
+            pass #the memory handler keeps the file
+
+        size = -(-len(content) // 4)
+        for start in range(0, len(content), size):
+            handler.receive_data_chunk(content[start:start + size], start)
+        return handler.file_complete(len(content))
+
+    def test_uploads_are_hashed(self):
+        """Tests that uploads kept in memory and in a temporary file get the SHA-256 of their content"""
+
+        content = os.urandom(10000)
+        digest = hashlib.sha256(content).hexdigest()
+
+        self.assertEqual(self.receive(HashingMemoryFileUploadHandler(), content).sha256, digest)
+        with self.receive(HashingTemporaryFileUploadHandler(), content) as temporary:
+            self.assertEqual(temporary.sha256, digest)
+
+
+@override_settings(IMAGE_PIPELINE={'ASYNC': False, 'WORKERS': 1})
+class ImageBlobTests(APITestCase):
+    """
+    Tests the content-addressed storage of the recipe images
+    """
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = create_user(email='blobuser@example.com', name='user blob', password='testpass')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+        self.other_recipe = create_recipe(self.user, 'Other blob recipe')
+
+    def upload(self, recipe, image):
+        """
+        Helper function.
+        Uploads the image for the recipe, runs the processing, and returns the reloaded recipe.
+        """
+        url = reverse('recipes-img_upload', kwargs={'pk': recipe.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'image': image}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_image_named_after_its_content(self):
+        """Tests that an upload is stored under the hash of its content, whatever its name"""
+
+        image = image_file('red', name='IMG_0001.JPEG')
+        digest = hashlib.sha256(image.getvalue()).hexdigest()
+        recipe = self.upload(self.recipe, image)
+
+        self.assertEqual(recipe.image.name, 'images/blobs/{}/{}.jpg'.format(digest[:2], digest))
+        self.assertTrue(os.path.exists(recipe.image.path))
+        self.assertEqual(recipe.image_thumbnail.name, 'images/variants/{}/thumb.jpg'.format(digest))
+        self.assertEqual((recipe.image_width, recipe.image_height), (200, 100))
+
+    def test_duplicate_upload_reuses_blob(self):
+        """Tests that the same image uploaded twice is stored once, with its variants"""
+
+        recipe = self.upload(self.recipe, image_file('red', name='a.jpg'))
+        other_recipe = self.upload(self.other_recipe, image_file('red', name='b.jpg'))
+
+        self.assertEqual(other_recipe.image.name, recipe.image.name)
+        self.assertEqual(other_recipe.image_webp.name, recipe.image_webp.name)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+        stored = [name for directory, dirs, names in os.walk(self.media_root.name) for name in names]
+        self.assertEqual(len(stored), 4) #the image and its 3 variants
+
+    def test_blob_deleted_with_last_recipe(self):
+        """Tests that a blob and its variants are deleted once no recipe uses it"""
+
+        recipe = self.upload(self.recipe, image_file('red'))
+        self.upload(self.other_recipe, image_file('red'))
+        paths = [recipe.image.path, recipe.image_thumbnail.path, recipe.image_webp.path]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_recipe.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_replaced_image_released(self):
+        """Tests that replacing an image releases the blob of the old one, but not shared variants"""
+
+        old = self.upload(self.recipe, image_file('red')).image.path
+        shared = self.upload(self.other_recipe, image_file('blue')).image_thumbnail.path
+        self.upload(self.recipe, image_file('blue'))
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(shared))
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+
+    def test_blobs_served_immutable(self):
+        """Tests that the blobs and their variants are served with far-future cache headers"""
+
+        recipe = self.upload(self.recipe, image_file('red'))
+
+        blob = self.client.get(recipe.image.url)
+        variant = self.client.get(recipe.image_thumbnail.url)
+
+        self.assertEqual(blob['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(variant['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+    def test_missing_image_file_loads(self):
+        """Tests that a recipe whose image file is missing, without dimensions, still loads"""
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='images/missing.jpg')
+
+        response = self.client.get(reverse('recipes-detail', args=[self.recipe.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(Recipe.objects.get(pk=self.recipe.pk).image_width)
+
+    def test_dimensions_backfilled(self):
+        """Tests that the migration fills the dimensions of the images stored without them"""
+
+        os.makedirs(os.path.join(self.media_root.name, 'images'))
+        with open(os.path.join(self.media_root.name, 'images', 'old.jpg'), 'wb') as file:
+            file.write(image_file('red').getvalue())
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='images/old.jpg')
+        Recipe.objects.filter(pk=self.other_recipe.pk).update(image='images/missing.jpg')
+
+        migration = importlib.import_module('core.migrations.0013_backfill_image_dimensions')
+        migration.backfill_image_dimensions(apps, SimpleNamespace(connection=connection))
+
+        recipe, other_recipe = Recipe.objects.values_list('image_width', 'image_height').order_by('pk')
+        self.assertEqual(recipe, (200, 100))
+        self.assertEqual(other_recipe, (None, None))
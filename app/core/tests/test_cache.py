@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.cache import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Tests the in-process LRU cache"""
+
+    def test_least_recently_used_is_dropped(self):
+        """Tests that a full cache drops the least recently used entry"""
+
+        lru = LRUCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a') #'b' is now the least recently used
+        lru.set('c', 3)
+
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Tests that entries expire after the ttl"""
+
+        patched_monotonic.return_value = 100
+        lru = LRUCache(max_size=2, ttl=60)
+        lru.set('a', 1)
+
+        patched_monotonic.return_value = 159
+        self.assertEqual(lru.get('a'), 1)
+
+        patched_monotonic.return_value = 160
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
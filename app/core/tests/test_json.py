@@ -0,0 +1,153 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from uuid import UUID
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+
+from core.models import Recipe, Tag
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from User.views import UserLoginApiView
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+
+#text that every JSON encoder escapes differently, if it can
+TRICKY_TEXT = 'Crème brûlée 🍮 "quoted" \\ back/slash \x01\x1f\x7f \u2028\u2029 \ud7ff'
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """Tests that the orjson renderer renders byte for byte as DRF's JSONRenderer"""
+
+    def assertRendersAsDRF(self, data, accepted_media_type=None):
+        self.assertEqual(
+            ORJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_text(self):
+        """Tests the escaping of unicode, control characters and line separators"""
+
+        self.assertRendersAsDRF({'text': TRICKY_TEXT, TRICKY_TEXT: [TRICKY_TEXT]})
+
+    def test_types(self):
+        """Tests the types DRF's encoder converts"""
+
+        self.assertRendersAsDRF({
+            'datetime': datetime(2026, 10, 18, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'naive datetime': datetime(2026, 10, 18, 9, 30),
+            'date': date(2026, 10, 18),
+            'decimal': Decimal('12.50'),
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('This field is required.'),
+            'tuple': (1, 2.5, None, True),
+            'set': {3},
+            'bytes': b'raw',
+            1: 'int key',
+            'floats': [0.1, 1.0, -0.0, 123456789.123],
+        })
+
+    def test_large_integers(self):
+        """Tests that integers orjson can not encode are rendered by DRF's encoder"""
+
+        self.assertRendersAsDRF({'id': 2 ** 70})
+
+    def test_indent(self):
+        """Tests that indented JSON is rendered by DRF's encoder"""
+
+        self.assertRendersAsDRF({'results': [{'id': 1}]}, 'application/json; indent=4')
+
+    def test_none(self):
+        """Tests that no data renders nothing"""
+
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Tests that the orjson parser parses as DRF's JSONParser"""
+
+    def parse(self, parser, content, encoding='utf-8'):
+        return parser.parse(BytesIO(content), parser_context={'encoding': encoding})
+
+    def assertParsesAsDRF(self, content, encoding='utf-8'):
+        self.assertEqual(self.parse(ORJSONParser(), content, encoding), self.parse(JSONParser(), content, encoding))
+
+    def test_parse(self):
+        """Tests parsing text, numbers and nesting"""
+
+        self.assertParsesAsDRF(JSONRenderer().render({'text': TRICKY_TEXT, 'numbers': [1, -2.5, 1e16, 2 ** 70], 'nested': {'a': [None, True]}}))
+
+    def test_other_encodings(self):
+        """Tests that bodies in other encodings are parsed by DRF's parser"""
+
+        self.assertParsesAsDRF('{"name": "Crème"}'.encode('utf-16'), encoding='utf-16')
+
+    def test_parse_errors(self):
+        """Tests that invalid JSON, and NaN, raise the errors of DRF's parser"""
+
+        for content in [b'{"name": ', b'{"value": NaN}', b'']:
+            with self.assertRaises(ParseError) as expected:
+                self.parse(JSONParser(), content)
+            with self.assertRaises(ParseError) as raised:
+                self.parse(ORJSONParser(), content)
+
+            self.assertEqual(str(raised.exception), str(expected.exception))
+
+
+class ORJSONApiTests(APITestCase):
+    """Tests that the API renders and parses with orjson"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='json@example.com', name='json user', password='testpass')
+        self.client.force_authenticate(self.user)
+
+    def test_list_response(self):
+        """Tests that a recipe list is rendered as DRF's JSONRenderer renders it"""
+
+        recipe = Recipe.objects.create(
+            user=self.user, recipe_title=TRICKY_TEXT, recipe_description='d', recipe_instructions='i',
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, tag_name='épicé'))
+
+        response = self.client.get(RECIPE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_create(self):
+        """Tests that JSON bodies are parsed with orjson"""
+
+        payload = {
+            'recipe_title': TRICKY_TEXT,
+            'recipe_description': 'd',
+            'recipe_instructions': 'i',
+            'tags': [{'tag_name': 'épicé'}],
+        }
+        response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.get().recipe_title, TRICKY_TEXT)
+
+    def test_login_view(self):
+        """Tests that the login view renders and parses with orjson"""
+
+        self.assertIn(ORJSONRenderer, UserLoginApiView.renderer_classes)
+        self.assertIn(ORJSONParser, UserLoginApiView.parser_classes)
+
+        self.client.force_authenticate(None)
+        response = self.client.post(reverse('User:login'), {'email': 'json@example.com', 'password': 'testpass'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('token', response.json())
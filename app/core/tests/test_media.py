@@ -0,0 +1,120 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.blobs import IMMUTABLE_CACHE_CONTROL
+
+import os
+import tempfile
+
+
+CONTENT = bytes(range(256)) * 4
+BLOB_NAME = 'images/blobs/ab/{}.jpg'.format('ab' * 32)
+LEGACY_NAME = 'images/old photo.jpg'
+
+
+class MediaViewTests(TestCase):
+    """
+    Tests serving the recipe images
+    """
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media_root.name,
+            MEDIA_SERVING={'SENDFILE': '', 'INTERNAL_URL': '/internal-media/'},
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        for name in [BLOB_NAME, LEGACY_NAME, 'private/secret.txt']:
+            path = os.path.join(self.media_root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    def get(self, name, **headers):
+        """Helper function that requests the media file"""
+
+        return self.client.get(reverse('media', kwargs={'path': name}), **headers)
+
+    def test_file_served(self):
+        """Tests that an image is streamed with its validators and cache headers"""
+
+        blob = self.get(BLOB_NAME)
+        legacy = self.get(LEGACY_NAME)
+
+        self.assertEqual(blob.status_code, 200)
+        self.assertEqual(b''.join(blob.streaming_content), CONTENT)
+        self.assertEqual(blob['Content-Type'], 'image/jpeg')
+        self.assertEqual(blob['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(blob['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', blob)
+        self.assertIn('Last-Modified', blob)
+        self.assertEqual(blob['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(legacy['Cache-Control'], 'public, max-age=3600')
+
+    def test_not_modified(self):
+        """Tests that a request with the ETag of the file gets a 304"""
+
+        etag = self.get(BLOB_NAME)['ETag']
+        response = self.get(BLOB_NAME, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_byte_ranges(self):
+        """Tests that single byte ranges get a 206 with these bytes only"""
+
+        response = self.get(BLOB_NAME, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/{}'.format(len(CONTENT)))
+
+        suffix = self.get(BLOB_NAME, HTTP_RANGE='bytes=-24')
+        self.assertEqual(b''.join(suffix.streaming_content), CONTENT[-24:])
+
+        open_ended = self.get(BLOB_NAME, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(b''.join(open_ended.streaming_content), CONTENT[1000:])
+
+    def test_unsatisfiable_range(self):
+        """Tests that a range after the end of the file gets a 416"""
+
+        response = self.get(BLOB_NAME, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */{}'.format(len(CONTENT)))
+
+    def test_if_range_of_other_version(self):
+        """Tests that a range of another version of the file gets the whole file"""
+
+        response = self.get(BLOB_NAME, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"other"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_other_files_not_served(self):
+        """Tests that only recipe images, under MEDIA_ROOT, are served"""
+
+        self.assertEqual(self.get('private/secret.txt').status_code, 404)
+        self.assertEqual(self.get('images/../private/secret.txt').status_code, 404)
+        self.assertEqual(self.get('images/missing.jpg').status_code, 404)
+
+    def test_x_accel_redirect(self):
+        """Tests that with nginx in front, the transfer is handed to it"""
+
+        with self.settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect', 'INTERNAL_URL': '/internal-media/'}):
+            response = self.get(LEGACY_NAME)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/internal-media/images/old%20photo.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_x_sendfile(self):
+        """Tests that with Apache or lighttpd in front, the transfer is handed to it"""
+
+        with self.settings(MEDIA_SERVING={'SENDFILE': 'x-sendfile', 'INTERNAL_URL': '/internal-media/'}):
+            response = self.get(BLOB_NAME)
+
+        self.assertEqual(response['X-Sendfile'], os.path.join(os.path.abspath(self.media_root.name), BLOB_NAME))
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
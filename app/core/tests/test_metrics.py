@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from core.metrics import Histogram, MetricsRegistry, registry
+
+
+METRICS_URL = reverse('metrics')
+RECIPE_LIST_URL = reverse('recipes-list')
+PID = 'pid="{}",'.format(os.getpid())
+
+
+class HistogramTests(SimpleTestCase):
+    """Tests the histograms and the Prometheus text format"""
+
+    def test_buckets_are_cumulative(self):
+        """Tests that every bucket counts the values up to its bound"""
+
+        histogram = Histogram([1, 5])
+        for value in [0, 1, 3, 7]:
+            histogram.observe(value)
+
+        self.assertEqual(list(histogram.cumulative_counts()), [(1, 2), (5, 3), ('+Inf', 4)])
+        self.assertEqual(histogram.sum, 11)
+        self.assertEqual(histogram.count, 4)
+
+    def test_render(self):
+        """Tests the exposition format of a recorded request"""
+
+        metrics = MetricsRegistry()
+        metrics.observe_request('recipes-list', 'GET', 200, latency=0.02, queries=3, query_time=0.004, response_size=900)
+        text = metrics.render()
+
+        self.assertIn('http_requests_total{view="recipes-list",method="GET",status="200"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="recipes-list",method="GET",le="0.01"} 0', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="recipes-list",method="GET",le="0.025"} 1', text)
+        self.assertIn('db_queries_per_request_sum{view="recipes-list",method="GET"} 3', text)
+        self.assertIn('http_response_size_bytes_bucket{view="recipes-list",method="GET",le="1024"} 1', text)
+        self.assertIn('db_query_duration_seconds_total{view="recipes-list",method="GET"} 0.004', text)
+
+    def test_render_pools(self):
+        """Tests the exposition format of the pool metrics"""
+
+        metrics = MetricsRegistry()
+        for i in range(2):
+            metrics.pool_task_queued('hashing')
+        metrics.pool_task_started('hashing', wait_time=0.02)
+        metrics.pool_task_finished('hashing', run_time=0.3)
+        metrics.pool_task_started('hashing', wait_time=0.3)
+        metrics.pool_task_rejected('hashing')
+        metrics.clear()
+        text = metrics.render()
+
+        self.assertIn('pool_tasks_running{pool="hashing"} 1', text) #kept by clear()
+        self.assertIn('pool_tasks_waiting{pool="hashing"} 0', text)
+        self.assertIn('pool_tasks_rejected_total{pool="hashing"} 0', text)
+        self.assertIn('pool_task_wait_seconds_count{pool="hashing"} 0', text)
+
+        metrics.pool_task_finished('hashing', run_time=0.3)
+        metrics.pool_task_rejected('hashing')
+        text = metrics.render()
+
+        self.assertIn('pool_tasks_running{pool="hashing"} 0', text)
+        self.assertIn('pool_tasks_rejected_total{pool="hashing"} 1', text)
+        self.assertIn('pool_task_duration_seconds_bucket{pool="hashing",le="0.25"} 0', text)
+        self.assertIn('pool_task_duration_seconds_bucket{pool="hashing",le="0.5"} 1', text)
+
+
+class MultiprocessMetricsTests(SimpleTestCase):
+    """Tests the sum of the metrics of the worker processes"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_render_sums_processes(self):
+        """
+        Tests that every process serves the metrics of all of them, with
+        the running tasks of the processes that exited left out.
+        """
+        exited = MetricsRegistry()
+        exited.observe_request('recipes-list', 'GET', 200, latency=0.02, queries=3, query_time=0.004, response_size=900)
+        exited.pool_task_queued('hashing')
+        exited.pool_task_started('hashing', wait_time=0.02)
+        with open(os.path.join(self.directory, 'metrics_{}.json'.format(2 ** 22 + 1)), 'w') as file: #above the largest pid
+            json.dump(exited.snapshot(), file)
+
+        worker = MetricsRegistry(directory=self.directory)
+        worker.observe_request('recipes-list', 'GET', 200, latency=0.3, queries=2, query_time=0.001, response_size=900)
+        worker.observe_request('recipes-list', 'GET', 404, latency=0.01, queries=1, query_time=0.001, response_size=50)
+        worker.pool_task_rejected('hashing')
+        text = worker.render()
+
+        self.assertIn('http_requests_total{view="recipes-list",method="GET",status="200"} 2', text)
+        self.assertIn('http_requests_total{view="recipes-list",method="GET",status="404"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{view="recipes-list",method="GET",le="0.025"} 2', text)
+        self.assertIn('db_queries_per_request_sum{view="recipes-list",method="GET"} 6', text)
+        self.assertIn('pool_tasks_running{pool="hashing"} 0', text)
+        self.assertIn('pool_task_wait_seconds_count{pool="hashing"} 1', text)
+        self.assertIn('pool_tasks_rejected_total{pool="hashing"} 1', text)
+        self.assertEqual(MetricsRegistry(directory=self.directory).collect().render(), text) #as another worker sees them
+
+    def test_pid_label(self):
+        """Tests that without a directory, series can be labelled with the pid"""
+
+        metrics = MetricsRegistry(label_pid=True)
+        metrics.observe_request('recipes-list', 'GET', 200, latency=0.02, queries=3, query_time=0.004)
+
+        self.assertIn('http_requests_total{' + PID + 'view="recipes-list",method="GET",status="200"} 1', metrics.render())
+
+
+class MetricsEndpointTests(APITestCase):
+    """Tests recording requests and the metrics endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+        self.admin = get_user_model().objects.create_superuser(email='admin@example.com', name='admin', password='testpass')
+
+    def test_requests_are_recorded_per_view(self):
+        """
+        Tests that requests are recorded under their view name and method,
+        with the queries they ran.
+        """
+        self.client.get(RECIPE_LIST_URL)
+        self.client.get(RECIPE_LIST_URL + '?search=soup')
+        self.client.get('/not-a-page/')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('http_requests_total{' + PID + 'view="recipes-list",method="GET",status="200"} 2', text)
+        self.assertIn('http_requests_total{' + PID + 'view="<unresolved>",method="GET",status="404"} 1', text)
+        self.assertIn('db_queries_per_request_count{' + PID + 'view="recipes-list",method="GET"} 2', text)
+        self.assertNotIn('db_queries_per_request_sum{' + PID + 'view="recipes-list",method="GET"} 0\n', text)
+
+    def test_metrics_are_admin_only(self):
+        """Tests that only admin users can read the metrics"""
+
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user = get_user_model().objects.create_user(email='user@example.com', name='user', password='testpass')
+        self.client.force_authenticate(user)
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
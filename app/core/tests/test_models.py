@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from core.models import Ingredient, Tag
 
 
 class CustomUserModelTests(TestCase):
@@ -56,4 +57,49 @@ class CustomUserModelTests(TestCase):
         with self.assertRaises(ValueError):
             user = get_user_model().objects.create_user(email = '',
                                                         name = 'test name 4',
-                                                        password = 'testpassword4')
\ No newline at end of file
+                                                        password = 'testpassword4')
+
+
+class UserNamedManagerTests(TestCase):
+    """Tests the upsert of tags and ingredients by name"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email = 'names@example.com',
+                                                         name = 'test name',
+                                                         password = 'testpassword')
+
+    def test_get_or_create_names(self):
+        """
+        Tests that existing names are reused, missing ones are created
+        with ids in the order of the names, and duplicates are ignored.
+        """
+        existing = Tag.objects.create(user = self.user, tag_name = 'Vegan')
+        other_user = get_user_model().objects.create_user(email = 'other@example.com',
+                                                          name = 'other name',
+                                                          password = 'testpassword')
+        Tag.objects.create(user = other_user, tag_name = 'Greek')
+
+        with self.assertNumQueries(1):
+            tags = Tag.objects.get_or_create_names(self.user, ['Vegan', 'Greek', 'Asian', 'Greek'])
+
+        tags = {tag.tag_name: tag for tag in tags}
+        self.assertEqual(set(tags), {'Vegan', 'Greek', 'Asian'})
+        self.assertEqual(tags['Vegan'].id, existing.id)
+        self.assertLess(tags['Greek'].id, tags['Asian'].id)
+        self.assertEqual(Tag.objects.filter(user = self.user).count(), 3)
+        self.assertEqual(tags['Greek'].user_id, self.user.id)
+
+    def test_get_or_create_no_names(self):
+        """Tests that no query runs without names"""
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Ingredient.objects.get_or_create_names(self.user, []), [])
+
+    def test_get_or_create_names_twice(self):
+        """Tests that getting the same names again creates nothing"""
+
+        first = Ingredient.objects.get_or_create_names(self.user, ['Salt', 'Pepper'])
+        second = Ingredient.objects.get_or_create_names(self.user, ['Pepper', 'Salt'])
+
+        self.assertEqual({obj.id for obj in first}, {obj.id for obj in second})
+        self.assertEqual(Ingredient.objects.count(), 2)
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.views.generic import TemplateView
+from core.pages import warm_page_cache
+
+from rest_framework.routers import APIRootView
+
+
+HOME_URL = reverse('Recipe:home')
+API_ROOT_URL = reverse('api-root')
+
+
+class PageCacheTests(TestCase):
+    """
+    Tests the full-page cache of the homepage and the API root
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_homepage_cached(self):
+        """Tests that the homepage is rendered once, then served from the cache"""
+
+        with mock.patch.object(TemplateView, 'get', autospec=True, side_effect=TemplateView.get) as get:
+            first = self.client.get(HOME_URL)
+            second = self.client.get(HOME_URL)
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+        self.assertIn('max-age=600', second['Cache-Control'])
+
+    def test_api_root_cached_per_format(self):
+        """Tests that the JSON of the API root is cached, keyed by the Accept header"""
+
+        with mock.patch.object(APIRootView, 'get', autospec=True, side_effect=APIRootView.get) as get:
+            self.client.get(API_ROOT_URL)
+            json = self.client.get(API_ROOT_URL)
+            html = self.client.get(API_ROOT_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(json['Content-Type'], 'application/json')
+        self.assertIn('recipes', json.json())
+        self.assertIn('Accept', json['Vary'])
+        self.assertIn('max-age=600', json['Cache-Control'])
+        self.assertTrue(html['Content-Type'].startswith('text/html'))
+
+    def test_browsable_api_not_cached(self):
+        """Tests that the browsable API page, with its per-user CSRF token, is never cached"""
+
+        with mock.patch.object(APIRootView, 'get', autospec=True, side_effect=APIRootView.get) as get:
+            self.client.get(API_ROOT_URL, HTTP_ACCEPT='text/html')
+            response = self.client.get(API_ROOT_URL, HTTP_ACCEPT='text/html')
+
+        self.assertEqual(get.call_count, 2)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_warm_page_cache(self):
+        """Tests that warming renders the pages, which are then served from the cache"""
+
+        with self.settings(PAGE_CACHE={'CACHE': 'default', 'TIMEOUT': 600, 'WARM_ORIGINS': ['http://testserver']}), \
+                mock.patch('core.pages.connections'): #not the connection of the test's transaction
+            rendered = warm_page_cache()
+
+        with mock.patch.object(TemplateView, 'get', autospec=True) as home, mock.patch.object(APIRootView, 'get', autospec=True) as api_root:
+            self.assertEqual(self.client.get(HOME_URL).status_code, 200)
+            self.assertEqual(self.client.get(API_ROOT_URL, HTTP_ACCEPT='application/json').status_code, 200)
+
+        self.assertEqual(rendered, 4)
+        home.assert_not_called()
+        api_root.assert_not_called()
@@ -0,0 +1,161 @@
+from unittest import skipUnless
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.models import Recipe, Tag
+from core.routers import ReplicaRouter, replica_reads
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+
+
+class RecordingReplicaRouter(ReplicaRouter):
+    """
+    Records where the reads are routed to, but reads from the primary,
+    since the test database has no replica.
+    """
+    routed = []
+
+    def db_for_read(self, model, **hints):
+        self.routed.append((model, super().db_for_read(model, **hints)))
+        return 'default'
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Tests the routing decisions"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_the_primary_by_default(self):
+        """Tests that reads outside replica_reads() use the primary"""
+
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_use_one_replica(self):
+        """Tests that the reads of a block all go to the same replica"""
+
+        with replica_reads() as state:
+            self.assertIn(state.replica, ['replica_1', 'replica_2'])
+            self.assertEqual(self.router.db_for_read(Recipe), state.replica)
+            self.assertEqual(self.router.db_for_read(Tag), state.replica)
+
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_read_after_write(self):
+        """Tests that reads go to the primary after a write"""
+
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_other_apps_use_the_primary(self):
+        """Tests that the tokens are always read from the primary"""
+
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Token), 'default')
+
+    def test_disabled(self):
+        """Tests that replica_reads(False) keeps the reads on the primary"""
+
+        with replica_reads(False):
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        """Tests that migrations only run on the primary"""
+
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_1'],
+    DATABASE_ROUTERS=['core.tests.test_routers.RecordingReplicaRouter'],
+)
+class ReplicaReadsApiTests(APITestCase):
+    """Tests which requests of the API read from the replicas"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='replica@example.com', name='replica user', password='testpass')
+        self.client.force_authenticate(self.user)
+        RecordingReplicaRouter.routed.clear()
+
+    def routed(self, model):
+        return {database for routed_model, database in RecordingReplicaRouter.routed if routed_model is model}
+
+    def test_safe_requests_read_from_the_replica(self):
+        """Tests that listing recipes reads them from the replica"""
+
+        response = self.client.get(RECIPE_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.routed(Recipe), {'replica_1'})
+
+    def test_export_streams_from_the_replica(self):
+        """Tests that the streamed export reads the recipes from the replica, after the view returned"""
+
+        Recipe.objects.create(user=self.user, recipe_title='Exported', recipe_description='d', recipe_instructions='i')
+        response = self.client.get(reverse('recipes-export'))
+        RecordingReplicaRouter.routed.clear()
+        content = b''.join(response.streaming_content)
+
+        self.assertIn(b'Exported', content)
+        self.assertEqual(self.routed(Recipe), {'replica_1'})
+
+    def test_writes_read_from_the_primary(self):
+        """Tests that a recipe creation reads nothing from the replica"""
+
+        payload = {
+            'recipe_title': 'Replica Recipe',
+            'recipe_description': 'Test description',
+            'recipe_instructions': 'test instructions',
+            'tags': [{'tag_name': 'Vegan'}],
+        }
+        response = self.client.post(RECIPE_LIST_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('replica_1', self.routed(Recipe) | self.routed(Tag))
+
+    def test_other_views_read_from_the_primary(self):
+        """Tests that views without ReplicaReadsMixin read from the primary"""
+
+        self.client.get(reverse('Recipe:home'))
+        self.client.post(reverse('User:login'), {'email': 'replica@example.com', 'password': 'testpass'})
+
+        self.assertNotIn('replica_1', {database for model, database in RecordingReplicaRouter.routed})
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Set DB_REPLICA_HOSTS to a database host, to stand in for a replica.')
+class ReplicaConnectionTests(TransactionTestCase):
+    """
+    Tests reading from a real replica alias. The replica connection can not see the
+    data of a TestCase's transaction, so the data is committed.
+    Run with e.g. 'DB_REPLICA_HOSTS=$DB_HOST python manage.py test core.tests.test_routers'.
+    """
+    databases = '__all__'
+
+    def test_list_from_the_replica(self):
+        """Tests that the recipe list runs its queries on the replica connection"""
+
+        user = get_user_model().objects.create_user(email='replica@example.com', name='replica user', password='testpass')
+        Recipe.objects.create(user=user, recipe_title='Replica', recipe_description='d', recipe_instructions='i')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        for alias in connections:
+            connections[alias].queries_log.clear()
+        with self.settings(DEBUG=True):
+            response = client.get(RECIPE_LIST_URL)
+
+        self.assertEqual(response.data['results'][0]['recipe_title'], 'Replica')
+        replica_queries = sum(len(connections[alias].queries) for alias in settings.DATABASE_REPLICAS)
+        self.assertGreater(replica_queries, 0)
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+
+from core.models import Recipe, Tag
+from core.seed import seed_dataset
+
+
+class SeedDatasetTests(TestCase):
+    """Tests the synthetic dataset used by the benchmarks"""
+
+    def test_seed_dataset(self):
+        """
+        Tests that the requested rows are inserted, and that recipes
+        only use the tags and ingredients of their user.
+        """
+        counts = seed_dataset(200, user_count=5, tags_per_user=8, ingredients_per_user=10)
+
+        self.assertEqual(counts['users'], 5)
+        self.assertEqual(counts['tags'], 40)
+        self.assertEqual(counts['ingredients'], 50)
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertEqual(Recipe.tags.through.objects.count(), counts['recipe tags'])
+        self.assertFalse(Recipe.tags.through.objects.exclude(tag__user=F('recipe__user')).exists())
+        self.assertFalse(Recipe.ingredients.through.objects.exclude(ingredient__user=F('recipe__user')).exists())
+        self.assertFalse(Recipe.objects.filter(search_vector__isnull=True).exists())
+
+    def test_seeding_twice(self):
+        """Tests that the dataset can be seeded more than once"""
+
+        seed_dataset(10)
+        seed_dataset(10)
+
+        self.assertEqual(Recipe.objects.count(), 20)
+
+
+class BenchmarkCommandTests(TestCase):
+    """Smoke tests of the seeding and benchmark commands, on tiny datasets"""
+
+    def test_seed_data(self):
+        """Tests seeding through the command"""
+
+        out = StringIO()
+        call_command('seed_data', recipes=30, users=3, stdout=out)
+
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertIn('Seeded in', out.getvalue())
+
+    def test_benchmark_api(self):
+        """
+        Tests that every scenario of the API benchmark runs,
+        and that the database is left untouched.
+        """
+        out = StringIO()
+        call_command('benchmark_api', recipes=20, repeat=2, stdout=out)
+
+        for scenario in ['list', 'list_sparse', 'list_not_modified', 'list_anonymous', 'detail', 'search', 'create', 'update', 'image_upload']:
+            self.assertIn(scenario, out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_api_not_throttled(self):
+        """Tests that the API benchmark sends more requests than the rate limits allow"""
+
+        rates = {scope: {'user': '1/min', 'ip': '1/min'} for scope in ['search', 'write', 'login', 'upload']}
+        out = StringIO()
+        with self.settings(THROTTLING={**settings.THROTTLING, 'RATES': rates}):
+            call_command('benchmark_api', recipes=10, repeat=3, only=['search', 'create', 'image_upload'], stdout=out)
+
+        self.assertIn('image_upload', out.getvalue())
+
+    def test_benchmark_json(self):
+        """Tests that the JSON benchmark runs, with matching outputs"""
+
+        out = StringIO()
+        call_command('benchmark_json', sizes=[5, 10], repeat=2, stdout=out)
+
+        self.assertIn('render', out.getvalue())
+        self.assertIn('parse', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_autocomplete(self):
+        """Tests that the autocomplete is benchmarked, and that the tags are deleted"""
+
+        out = StringIO()
+        call_command('benchmark_autocomplete', entries=100, repeat=1, stdout=out)
+
+        self.assertIn('endpoint ms', out.getvalue())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_benchmark_facets(self):
+        """Tests that the facets are benchmarked, and that the dataset is rolled back"""
+
+        out = StringIO()
+        call_command('benchmark_facets', recipes=20, repeat=1, stdout=out)
+
+        self.assertIn('(every recipe)', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class AsyncBenchmarkCommandTests(TransactionTestCase):
+    """
+    Smoke tests of the sync/async and login storm benchmarks, whose requests
+    run on their own database connections, so the dataset is committed.
+    """
+
+    def test_benchmark_async(self):
+        """Tests that both servers are benchmarked, and that the dataset is deleted"""
+
+        out = StringIO()
+        call_command('benchmark_async', recipes=20, connections=[2], requests=2, threads=2, client_delay=0, stdout=out)
+
+        self.assertIn('wsgi', out.getvalue())
+        self.assertIn('asgi', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_login(self):
+        """Tests that every hashing setup is benchmarked, and that the dataset is deleted"""
+
+        out = StringIO()
+        call_command('benchmark_login', recipes=20, threads=3, logins=1, readers=1, requests=2, stdout=out)
+
+        for setup in ['no logins', 'inline', 'pool']:
+            self.assertIn(setup, out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
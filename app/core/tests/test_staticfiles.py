@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.blobs import IMMUTABLE_CACHE_CONTROL
+
+import brotli
+import gzip
+import json
+import os
+import tempfile
+
+
+RECIPE_STATIC = os.path.join(settings.BASE_DIR, 'Recipe', 'static')
+
+
+class StaticPipelineTests(TestCase):
+    """
+    Tests collecting the static files (hashed, precompressed, re-encoded)
+    and serving them
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.static_root.cleanup)
+        cls.sources = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.sources.cleanup)
+        os.makedirs(os.path.join(cls.sources.name, 'test'))
+        with open(os.path.join(cls.sources.name, 'test', 'large.css'), 'w') as stylesheet:
+            stylesheet.write(''.join('.card-{} {{ margin: {}px; }}\n'.format(i, i % 10) for i in range(1000)))
+
+        static_settings = override_settings(
+            STATIC_ROOT=cls.static_root.name,
+            STATICFILES_DIRS=[RECIPE_STATIC, cls.sources.name],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'], #not the files of the installed apps
+        )
+        static_settings.enable()
+        cls.addClassCleanup(static_settings.disable)
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.static_root.name, 'staticfiles.json')) as manifest:
+            cls.hashed = json.load(manifest)['paths']
+
+    def get(self, name, **headers):
+        """Helper function that requests the static file"""
+
+        return self.client.get(settings.STATIC_URL + name, **headers)
+
+    def test_hashed_and_precompressed(self):
+        """Tests that the files get hashed names, and the text files precompressed copies"""
+
+        css = self.hashed['test/large.css']
+        path = os.path.join(self.static_root.name, css)
+
+        self.assertRegex(css, r'^test/large\.[0-9a-f]{12}\.css$')
+        with open(path, 'rb') as original, open(path + '.br', 'rb') as br, open(path + '.gz', 'rb') as gz:
+            content = original.read()
+            self.assertEqual(brotli.decompress(br.read()), content)
+            self.assertEqual(gzip.decompress(gz.read()), content)
+        self.assertFalse(os.path.exists(os.path.join(self.static_root.name, self.hashed['media/Recipe/lock.jpg']) + '.gz'))
+
+    def test_images_reencoded(self):
+        """Tests that the bundled images are collected re-encoded, when that makes them smaller"""
+
+        original = os.path.getsize(os.path.join(RECIPE_STATIC, 'media', 'Recipe', 'lock.jpg'))
+        collected = os.path.getsize(os.path.join(self.static_root.name, self.hashed['media/Recipe/lock.jpg']))
+
+        self.assertLess(collected, original)
+
+    def test_encoding_negotiated(self):
+        """Tests that the most compact encoding the client accepts is served"""
+
+        css = self.hashed['test/large.css']
+        br = self.get(css, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        gz = self.get(css, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        identity = self.get(css)
+
+        self.assertEqual(br['Content-Encoding'], 'br')
+        self.assertEqual(gz['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(gzip.decompress(b''.join(gz.streaming_content)), b''.join(identity.streaming_content))
+        self.assertEqual(br['Content-Type'], 'text/css')
+        self.assertEqual(br['Vary'], 'Accept-Encoding')
+        self.assertEqual(len({br['ETag'], gz['ETag'], identity['ETag']}), 3)
+
+    def test_cache_headers(self):
+        """Tests that hashed names are cached forever, other names are revalidated soon"""
+
+        hashed = self.get(self.hashed['media/Recipe/food1.jpg'])
+        unhashed = self.get('media/Recipe/food1.jpg')
+
+        self.assertEqual(hashed.status_code, 200)
+        self.assertEqual(hashed['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(unhashed['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('media/Recipe/missing.jpg').status_code, 404)
+
+    def test_not_modified(self):
+        """Tests that a request with the ETag of the encoding gets a 304"""
+
+        css = self.hashed['test/large.css']
+        etag = self.get(css, HTTP_ACCEPT_ENCODING='br')['ETag']
+
+        self.assertEqual(self.get(css, HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(css, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_homepage_links_hashed_names(self):
+        """Tests that the homepage links the hashed files"""
+
+        cache.clear() #the page cached by other tests, before these files were collected
+        response = self.client.get(reverse('Recipe:home'))
+
+        for name in ['static/Recipe/index.css', 'media/Recipe/food1.jpg', 'media/Recipe/lock.jpg', 'media/Recipe/docs.jpg']:
+            self.assertContains(response, settings.STATIC_URL + self.hashed[name])
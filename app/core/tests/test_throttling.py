@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.throttling import SlidingWindowCounter, check_cache
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+RECIPE_LIST_URL = reverse('recipes-list')
+USER_LIST_URL = reverse('users-list')
+LOGIN_URL = reverse('User:login')
+
+THROTTLING = {
+    'CACHE': 'default',
+    'RATES': {
+        'search': {'user': '3/min', 'token': '5/min', 'ip': '10/min'},
+        'write': {'ip': '2/min'},
+        'login': {'user': '2/min', 'ip': '3/min'},
+        'upload': {'user': '1/min'},
+    },
+}
+
+
+@override_settings(THROTTLING=THROTTLING)
+class ThrottlingTests(TestCase):
+    """
+    Tests the rate limits of the searches, writes, logins and uploads
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='throttled@example.com', name='throttled', password='pass123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+    def test_search_throttled_per_user(self):
+        """Tests that searches are throttled past the user's budget, other reads are not"""
+
+        responses = [self.client.get(RECIPE_LIST_URL, {'search': 'pasta'}) for i in range(4)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200, 429])
+        self.assertGreater(int(responses[-1]['Retry-After']), 0)
+        self.assertEqual(self.client.get(RECIPE_LIST_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(APIClient().get(RECIPE_LIST_URL, {'search': 'pasta'}).status_code, status.HTTP_200_OK) #anonymous, by address
+
+    def test_writes_throttled_per_address(self):
+        """Tests that anonymous writes are throttled per address"""
+
+        client = APIClient()
+        statuses = [
+            client.post(USER_LIST_URL, {'email': 'new{}@example.com'.format(i), 'name': 'new', 'password': 'pass123'}).status_code
+            for i in range(3)
+        ]
+        other_address = client.post(USER_LIST_URL, {'email': 'other@example.com', 'name': 'new', 'password': 'pass123'}, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(other_address.status_code, status.HTTP_201_CREATED)
+
+    def test_logins_throttled_per_email(self):
+        """Tests that the logins of an email are throttled, from any address"""
+
+        client = APIClient()
+        statuses = [
+            client.post(LOGIN_URL, {'email': 'throttled@example.com', 'password': 'wrong'}, REMOTE_ADDR='10.0.0.{}'.format(i)).status_code
+            for i in range(3)
+        ]
+        other_email = client.post(LOGIN_URL, {'email': 'other@example.com', 'password': 'wrong'}, REMOTE_ADDR='10.0.0.9')
+
+        self.assertEqual(statuses, [400, 400, 429])
+        self.assertEqual(other_email.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_uploads_have_their_own_budget(self):
+        """Tests that image uploads are throttled on a budget of their own"""
+
+        url = reverse('recipes-img_upload', args=[0])
+        statuses = [self.client.post(url, {}, format='multipart').status_code for i in range(2)]
+
+        self.assertEqual(statuses, [404, 429])
+        self.assertEqual(self.client.get(RECIPE_LIST_URL, {'search': 'pasta'}).status_code, status.HTTP_200_OK)
+
+    def test_refused_requests_not_counted(self):
+        """Tests that refused requests use no budget, of any identity"""
+
+        rates = {**THROTTLING['RATES'], 'search': {'user': '5/min', 'ip': '3/min'}}
+        with self.settings(THROTTLING={**THROTTLING, 'RATES': rates}):
+            for i in range(6): #3 allowed, 3 refused by the address' budget, after the user's was counted
+                self.client.get(RECIPE_LIST_URL, {'search': 'pasta'})
+
+        rates = {**THROTTLING['RATES'], 'search': {'user': '5/min'}}
+        with self.settings(THROTTLING={**THROTTLING, 'RATES': rates}):
+            response = self.client.get(RECIPE_LIST_URL, {'search': 'pasta'}) #the user's 4th
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SlidingWindowCounterTests(TestCase):
+    """
+    Tests the sliding window estimate of the request rate
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_previous_window_weighted(self):
+        """Tests that the previous window counts for the part of it that still overlaps"""
+
+        counter = SlidingWindowCounter(cache, 60)
+        for i in range(10):
+            counter.hit('key', 600.5) #window 10
+        count, previous, elapsed = counter.hit('key', 660 + 45) #window 11, 3/4 through
+
+        self.assertEqual((count, previous, elapsed), (1, 10, 45))
+        self.assertEqual(counter.estimate(count, previous, elapsed), 10 * 0.25 + 1)
+
+
+class ThrottlingCacheTests(TestCase):
+    """
+    Tests that the counters are kept in a cache shared by the workers
+    """
+    def test_process_local_cache_refused(self):
+        """Tests that a local memory cache, which each worker would count in on its own, is refused"""
+
+        with self.settings(THROTTLING={**THROTTLING, 'CACHE': 'default'}):
+            with self.assertRaises(ImproperlyConfigured):
+                check_cache()
+
+    def test_shared_cache_by_default(self):
+        """Tests that without a cache server, the counters are kept in files"""
+
+        check_cache()
+        self.assertEqual(caches[settings.THROTTLING['CACHE']].__class__.__name__, 'FileBasedCache')
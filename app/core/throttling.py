@@ -0,0 +1,220 @@
+"""
+Rate limits of the hot endpoints, shared by every worker process.
+
+Each throttle has a scope, with a budget of its own (settings.THROTTLING['RATES']):
+- 'search': searches of the recipes ('?search='),
+- 'write': the requests that are not safe (creating, updating, deleting),
+- 'login': the logins, which hash a password,
+- 'upload': the recipe image uploads, which are then encoded.
+A scope limits every identity of the request that it has a rate for:
+- 'user': the authenticated user (for logins, the email that logs in),
+- 'token': the authentication token,
+- 'ip': the client's address (behind proxies, see DRF's NUM_PROXIES).
+The request is throttled (429, with a Retry-After header) as soon as
+one of them is over its budget.
+
+Requests are counted with a sliding window: a counter per identity and
+window (e.g. minute), and the rate is estimated from the current window's
+count and the previous one's, weighted by how much of it still overlaps
+the last 'duration' seconds. Unlike DRF's SimpleRateThrottle, which keeps
+the timestamp of every request and rewrites the list, a check does the same
+work whatever the budget is: an atomic increment and a read per identity,
+in settings.THROTTLING['CACHE']. That cache has to be shared by the
+workers for the budgets to be (memcached, as in docker-compose.yml, or
+redis): with a local memory cache, each worker would count on its own,
+and N workers would allow N times the rates, so the project refuses
+to start with one (see check_cache()).
+See 'python manage.py benchmark_throttling' for the cost of a check.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core.cache import is_process_local
+
+
+KEY_PREFIX = 'throttle'
+
+#seconds of the rate periods, as DRF's rates ('100/min')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+#a budget that no benchmark reaches
+UNLIMITED_RATE = '1000000000/min'
+
+def unlimited_rates():
+    """The rates of settings.THROTTLING, with budgets that are never reached, for the benchmarks"""
+    return {scope: {kind: UNLIMITED_RATE for kind in rates} for scope, rates in settings.THROTTLING['RATES'].items()}
+
+
+def check_cache():
+    """Raises ImproperlyConfigured if the cache of the counters is not shared by the worker processes"""
+
+    alias = settings.THROTTLING['CACHE']
+    if is_process_local(alias):
+        raise ImproperlyConfigured(
+            "THROTTLING['CACHE'] ({!r}) is a {} cache, which every worker process would count in on its own. "
+            "Point THROTTLE_CACHE to a cache shared by the workers (e.g. memcached, or a FileBasedCache).".format(
+                alias, settings.CACHES[alias]['BACKEND'],
+            )
+        )
+
+
+def parse_rate(rate):
+    """The (number of requests, duration in seconds) of a rate such as '100/min', or None"""
+
+    if rate is None:
+        return None
+    number, period = rate.split('/')
+    return int(number), PERIODS[period[0]]
+
+
+class SlidingWindowCounter:
+    """
+    Counts the requests of identities in a Django cache, per window of
+    'duration' seconds, see core.throttling.
+    """
+
+    def __init__(self, cache, duration):
+        self.cache = cache
+        self.duration = duration
+
+    def hit(self, key, now):
+        """
+        Counts a request of the key at 'now'. Returns the count of the current
+        window (this request included), of the previous one, and the seconds
+        elapsed in the current one.
+        """
+        window, elapsed = divmod(now, self.duration)
+        current = '{}:{}'.format(key, int(window))
+        try:
+            count = self.cache.incr(current)
+        except ValueError: #first request of the window
+            if self.cache.add(current, 1, timeout=self.duration * 2): #kept while it is the previous window
+                count = 1
+            else: #another worker added it meanwhile
+                count = self.cache.incr(current)
+
+        previous = self.cache.get('{}:{}'.format(key, int(window) - 1), 0)
+        return count, previous, elapsed
+
+    def estimate(self, count, previous, elapsed):
+        """The estimated number of requests in the last 'duration' seconds"""
+        return previous * (1 - elapsed / self.duration) + count
+
+    def undo(self, key, now):
+        """Uncounts the request of hit(), which was refused: only allowed requests use the budget"""
+
+        try:
+            self.cache.decr('{}:{}'.format(key, int(now // self.duration)))
+        except ValueError: #expired meanwhile
+            pass
+
+
+class ScopedRateThrottle(BaseThrottle):
+    """
+    Throttle of the requests of a scope, per user, token and IP address,
+    see core.throttling.
+    """
+    scope = None
+
+    def applies(self, request, view):
+        """Whether the request uses the budget of the scope"""
+        return True
+
+    def get_rates(self):
+        """The rate of each identity type of the scope"""
+        return settings.THROTTLING['RATES'].get(self.scope, {})
+
+    def get_identities(self, request):
+        """Yields the (identity type, identity) of the request"""
+
+        if request.user and request.user.is_authenticated:
+            yield 'user', str(request.user.pk)
+        if isinstance(request.auth, Token):
+            yield 'token', hashlib.sha256(request.auth.key.encode()).hexdigest()[:16] #the key is a secret
+        yield 'ip', self.get_ident(request)
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        if not self.applies(request, view):
+            return True
+
+        rates = self.get_rates()
+        cache = caches[settings.THROTTLING['CACHE']]
+        now = time.time()
+        counted = []
+        for kind, identity in self.get_identities(request):
+            rate = parse_rate(rates.get(kind))
+            if rate is None:
+                continue
+
+            number, duration = rate
+            counter = SlidingWindowCounter(cache, duration)
+            key = '{}:{}:{}:{}'.format(KEY_PREFIX, self.scope, kind, identity)
+            count, previous, elapsed = counter.hit(key, now)
+            counted.append((counter, key))
+            if counter.estimate(count, previous, elapsed) > number:
+                for counted_counter, counted_key in counted:
+                    counted_counter.undo(counted_key, now)
+                self.wait_time = self.get_wait(number, duration, count - 1, previous, elapsed)
+                return False
+
+        return True
+
+    def get_wait(self, number, duration, current, previous, elapsed):
+        """
+        Seconds until the refused request would be allowed, given the 'current'
+        requests allowed in this window: until enough of the previous window
+        slid out, else until the end of the current one.
+        """
+        if previous and current < number:
+            slide = (1 - (number - 1 - current) / previous) * duration - elapsed
+            return max(min(slide, duration - elapsed), 0)
+        return duration - elapsed
+
+    def wait(self):
+        return self.wait_time
+
+
+class SearchRateThrottle(ScopedRateThrottle):
+    """Throttles the searches ('?search=')"""
+    scope = 'search'
+
+    def applies(self, request, view):
+        return request.method in SAFE_METHODS and bool(request.query_params.get(api_settings.SEARCH_PARAM))
+
+
+class WriteRateThrottle(ScopedRateThrottle):
+    """Throttles the requests that are not safe"""
+    scope = 'write'
+
+    def applies(self, request, view):
+        return request.method not in SAFE_METHODS
+
+
+class LoginRateThrottle(ScopedRateThrottle):
+    """
+    Throttles the logins, per address and per email, so that
+    guessing the password of an account is slow from anywhere.
+    """
+    scope = 'login'
+
+    def get_identities(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if isinstance(email, str) and email:
+            yield 'user', hashlib.sha256(email.strip().lower().encode()).hexdigest()[:16]
+        yield 'ip', self.get_ident(request)
+
+
+class ImageUploadRateThrottle(ScopedRateThrottle):
+    """Throttles the recipe image uploads"""
+    scope = 'upload'
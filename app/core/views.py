@@ -0,0 +1,22 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from User.authentication import CachedTokenAuthentication
+
+from .metrics import registry
+from .renderers import PrometheusRenderer
+
+
+class MetricsView(APIView):
+    """
+    Serves the request metrics of every worker process (see core.metrics),
+    in the Prometheus text format. Admin users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+